@@ -1,8 +1,6 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, Response, stream_with_context, render_template, request, jsonify, redirect, url_for, flash
 from flask_socketio import SocketIO
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 import os
 import logging
 from datetime import datetime
@@ -10,9 +8,35 @@ from dotenv import load_dotenv
 import MetaTrader5 as mt5
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from services.telegram_service import TelegramService
+from services.tick_recorder import TickRecorder
+from services.tick_ingest import TickIngestor
+from services.bar_service import BarCache, TIMEFRAMES
+from services.order_journal import OrderJournal
+from services.terminal_service import TerminalExecutor, TerminalTimeout, LoopLagMonitor
+from services.db_routing import ReadRouter, SessionMonitor, engine_options, loop_session
+from services.http_cache import TableVersions, ResponseCache
+from services.signal_routing import SignalRoutes, parse_strategies
+from services.signal_guard import SignalGuard
+from services.export_service import FORMATS, default_format, stream_export
+from services.replay_service import to_datetime
+from services.summary_service import SummaryService
+from services.account_snapshot_service import AccountSnapshotService
+from services.account_health import AccountHealth, UNREACHABLE_RETCODES
+from services.cluster_service import LeaderLease, socketio_options
+from services.webhook_validator import validate_signal, SignalValidationError
+from services.audit_writer import AuditWriter
+from services.trigger_index import TriggerIndex
+from services.position_book import PositionBook
+from services.profiler_service import ProfilerService
+from services.position_rules import (
+    MARKET_TYPES, is_buy, quote_price, evaluate_tick, calculate_trailing_stop, calculate_profit, initial_status,
+    replaces_pending
+)
 from functools import wraps
-from models import MT5Account, RestrictedSymbol, TradeLog, WebhookLog, Position, Webhook, Log
+from models import db, User, AccountGroup, MT5Account, RestrictedSymbol, TradeLog, WebhookLog, Position, Webhook, Log, DispatchRequest
+import json
 import urllib.parse
 from sqlalchemy_utils import database_exists, create_database
 import pymysql
@@ -25,6 +49,9 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 def get_database_uri():
+    # DATABASE_URL overrides the MySQL settings, e.g. sqlite:///soak.db for the soak harness
+    if os.getenv('DATABASE_URL'):
+        return os.getenv('DATABASE_URL')
     host = os.getenv('MYSQL_HOST')
     port = os.getenv('MYSQL_PORT')
     user = os.getenv('MYSQL_USER')
@@ -77,10 +104,24 @@ if not db_uri:
 
 app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options()
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 
-# Initialize SQLAlchemy
-db = SQLAlchemy(app)
+# Initialize SQLAlchemy; the models are declared on this instance
+db.init_app(app)
+
+# Dashboard reads go to the replica when MYSQL_REPLICA_URI is set
+read_db = ReadRouter(db, app)
+
+# Per-loop session sizes and pool checkout times, reported by /api/health/loop
+session_monitor = SessionMonitor()
+# Committed writes per table; polled API responses are cached against them
+table_versions = TableVersions()
+api_cache = ResponseCache(table_versions)
+signal_routes = SignalRoutes(table_versions)
+with app.app_context():
+    session_monitor.attach(db.engine)
+    table_versions.attach(db.engine)
 
 # Create all tables
 with app.app_context():
@@ -92,7 +133,7 @@ with app.app_context():
         raise
 
 # Initialize extensions
-socketio = SocketIO(app, async_mode='gevent')
+socketio = SocketIO(app, async_mode='gevent', **socketio_options())
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -105,6 +146,30 @@ logger.addHandler(handler)
 
 # Initialize services
 telegram_service = TelegramService()
+terminal = TerminalExecutor(mt5)
+loop_lag_monitor = LoopLagMonitor(socketio.sleep)
+summary = SummaryService()
+account_health = AccountHealth(terminal, mt5)
+account_snapshots = AccountSnapshotService(terminal, mt5, account_health)
+audit_writer = AuditWriter(app, db)
+tick_recorder = TickRecorder()
+tick_ingestor = TickIngestor(terminal, mt5)
+signal_guard = SignalGuard(tick_ingestor)
+bar_cache = BarCache(terminal, mt5)
+position_book = PositionBook()
+profiler = ProfilerService(app, db.session, mt5)
+# One worker keeps fan-outs in signal order; the terminal serializes them anyway
+fanout_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fanout')
+
+
+def lease_engine():
+    # The lease thread has no app context of its own
+    with app.app_context():
+        return db.engine
+
+
+leader = LeaderLease(lease_engine)
+order_journal = OrderJournal(holder=leader.holder)
 
 
 def init_admin_user():
@@ -152,17 +217,6 @@ def check_auth(f):
 
 
 
-class User(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(200), nullable=False)  
-
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
-
 @login_manager.user_loader
 def load_user(user_id):
     return db.session.get(User, int(user_id))
@@ -180,6 +234,8 @@ class DatabaseLoggingHandler(logging.Handler):
         with app.app_context():
             db.session.add(log)
             db.session.commit()
+        if record.levelno >= logging.ERROR:
+            summary.error_logged()
 
 
 # Logger setup
@@ -190,6 +246,8 @@ logger.addHandler(DatabaseLoggingHandler())
 
 def get_order_type(type_str):
     order_types = {
+        "buy": mt5.ORDER_TYPE_BUY,
+        "sell": mt5.ORDER_TYPE_SELL,
         "buy limit": mt5.ORDER_TYPE_BUY_LIMIT,
         "sell limit": mt5.ORDER_TYPE_SELL_LIMIT,
         "buy stop": mt5.ORDER_TYPE_BUY_STOP,
@@ -198,6 +256,7 @@ def get_order_type(type_str):
     return order_types.get(type_str.lower())
 
 
+@terminal.exclusive
 def init_mt5():
     if not mt5.initialize():
         logger.error("MT5 initialization failed")
@@ -246,88 +305,452 @@ def logout():
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
+    received_at = datetime.utcnow()
+    received_ts = time.time()
+    webhook_data = request.get_json(silent=True)
+    formatted_data = None
+    summary.signal_received()
     try:
-        webhook_data = request.get_json()
-        logger.info(f"Received webhook data: {webhook_data}")
-
-        # Format validation and standardization
-        formatted_data = {
-            "password": webhook_data.get("tradekey"),
-            "action": webhook_data.get("action"),
-            "symbol": webhook_data.get("symbol"),
-            "volume": float(webhook_data.get("volume")),
-            "order_type": webhook_data.get("order_type"),
-            "price": float(webhook_data.get("price")),
-            "stop_loss": float(webhook_data.get("stop_loss")),
-            "take_profit": float(webhook_data.get("take_profit"))
-        }
+        # Reject malformed payloads before any DB or MT5 work
+        validate_started = time.perf_counter()
+        formatted_data = validate_signal(webhook_data)
+        signal_guard.latency.record('validate', (time.perf_counter() - validate_started) * 1000)
+        formatted_data['received_at'] = received_ts
+        if formatted_data['sent_at']:
+            # Clamped: TradingView's clock and ours are not perfectly in step
+            signal_guard.latency.record('receive', max(0.0, received_ts - formatted_data['sent_at']) * 1000)
 
         # Validate password
         if formatted_data["password"] != os.getenv("tradekey"):
+            audit_writer.record_webhook(webhook_data, formatted_data, 'rejected', 'Invalid password', received_at)
             return jsonify({"error": "Invalid password"}), 403
 
         # Handle position request
-        return handle_position_request(formatted_data)
+        # Only the lease holder talks to the terminal; other workers queue the signal for it
+        if not leader.is_leader:
+            response = enqueue_position_request(formatted_data)
+            audit_writer.record_webhook(webhook_data, formatted_data, 'queued', received_at=received_at)
+            return response
+
+        response = handle_position_request(formatted_data)
+        result = response.get_json()
+        if result.get('status') == 'success':
+            audit_writer.record_webhook(webhook_data, formatted_data, 'success', received_at=received_at)
+        elif result.get('status') == 'stale':
+            audit_writer.record_webhook(webhook_data, formatted_data, 'stale', result.get('message'), received_at)
+        else:
+            audit_writer.record_webhook(webhook_data, formatted_data, 'error', result.get('message'), received_at)
+        return response
 
-    except ValueError as e:
-        return jsonify({"error": f"Invalid number format: {str(e)}"}), 400
+    except SignalValidationError as e:
+        audit_writer.record_webhook(webhook_data, None, 'rejected', str(e), received_at)
+        return jsonify({"error": "Invalid payload", "details": e.errors}), 400
     except Exception as e:
         logger.error(f"Webhook error: {str(e)}")
+        audit_writer.record_webhook(webhook_data, formatted_data, 'error', str(e), received_at)
         return jsonify({"error": str(e)}), 500
 
-def handle_position_request(data):
+def enqueue_position_request(data):
+    payload = {k: v for k, v in data.items() if k != 'password'}
+    dispatch = DispatchRequest(payload=json.dumps(payload, default=str), status='queued')
+    db.session.add(dispatch)
+    db.session.commit()
+    return jsonify({'status': 'queued', 'dispatch_id': dispatch.id}), 202
+
+
+def dispatch_thread(app):
+    """Run signals queued by non-leader workers, on the leader only."""
+    profiler.register_thread('dispatch')
+    recovery_retry = float(os.getenv('ORDER_JOURNAL_RECOVERY_RETRY', 5))
+    with app.app_context():
+        was_leader = False
+        deferred = 0
+        recover_at = 0
+        while True:
+            try:
+                with loop_session(db, 'dispatch', session_monitor):
+                    if not leader.is_leader:
+                        was_leader = False
+                        time.sleep(1)
+                        continue
+
+                    if not was_leader or (deferred and time.monotonic() >= recover_at):
+                        # Another worker may have crashed mid fan-out while it held the lease,
+                        # or still be finishing one it started before losing it
+                        order_journal.reload()
+                        deferred = recover_order_journal()
+                        recover_at = time.monotonic() + recovery_retry
+                        was_leader = True
+
+                    queued = DispatchRequest.query.filter_by(status='queued').order_by(DispatchRequest.id).limit(20).all()
+                    for dispatch in queued:
+                        if not leader.is_leader:
+                            break
+                        claimed = DispatchRequest.query.filter_by(id=dispatch.id, status='queued').update(
+                            {'status': 'processing', 'worker': leader.holder},
+                            synchronize_session=False
+                        )
+                        db.session.commit()
+                        if not claimed:
+                            continue
+
+                        response = handle_position_request(json.loads(dispatch.payload), wait=True)
+                        result = response.get_json()
+                        dispatch.status = {'success': 'done', 'stale': 'stale'}.get(result.get('status'), 'error')
+                        dispatch.error_message = (result.get('message') or '')[:200] or None
+                        dispatch.processed_at = datetime.utcnow()
+                        db.session.commit()
+
+                if not queued:
+                    time.sleep(0.2)
+
+            except Exception as e:
+                logger.error(f"Dispatch error: {str(e)}")
+                time.sleep(5)
+
+
+def handle_position_request(data, wait=False):
+    """Create the position and fan its order out to every active account.
+
+    The fan-out runs on fanout_executor and streams each account's result
+    over Socket.IO, so the webhook answers without waiting for the slowest
+    broker. Pass wait=True to run it inline (the dispatch thread already
+    runs in the background).
+    """
     try:
+        # Too old, or the market has moved past the signal price: drop it or re-enter as a limit
+        decision, reason = signal_guard.check(data, time.time())
+        if decision == 'drop':
+            response = jsonify({'status': 'stale', 'message': reason})
+            response.status_code = 409
+            return response
+        if decision == 'convert':
+            data = dict(data, order_type=f"{data['order_type']} limit", converted=reason)
+        # Only an accepted market signal has a deadline left to enforce per account
+        origin = signal_guard.origin(data) if decision == 'accept' else None
+
         # Delete existing pending orders for this symbol
-        delete_pending_orders(data['symbol'])
+        delete_pending_orders(data['symbol'], data.get('strategy'))
         
         # Create new position
         position = Position(
             symbol=data['symbol'],
+            strategy=data.get('strategy'),
             type=data['order_type'],
             volume=data['volume'],
             price_open=data['price'],
             sl=data['stop_loss'],
             tp=data['take_profit'],
-            status='Pending'
+            status=initial_status(data['order_type'])
         )
         db.session.add(position)
         db.session.commit()
+        position_book.upsert(position)
+        summary.position_changed(position.symbol, None, position.status)
 
-        # Open positions for all active accounts
-        accounts = MT5Account.query.filter_by(is_active=True).all()
-        for account in accounts:
-            if not is_symbol_restricted(account.id, data['symbol']):
-                open_position_for_account(account, position)
-                
-        return jsonify({'status': 'success'})
+        # Open positions on the accounts that follow this strategy and may trade the symbol
+        account_ids = list(signal_routes.accounts_for(db.session, data.get('strategy'), data['symbol']))
+
+        account_snapshots.track_symbol(position.symbol)
+        journal_id = order_journal.begin(
+            position.id, account_ids, signal={k: v for k, v in data.items() if k != 'password'}
+        )
+        if wait:
+            fan_out_position(position.id, account_ids, journal_id, origin, data.get('received_at'))
+        else:
+            fanout_executor.submit(run_fan_out, position.id, account_ids, journal_id, origin, data.get('received_at'))
+
+        return jsonify({
+            'status': 'success',
+            'position_id': position.id,
+            'journal_id': journal_id,
+            'accounts': len(account_ids),
+            'order_type': data['order_type']
+        })
     except Exception as e:
         logger.error(f"Error handling position: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)})
 
-def delete_pending_orders(symbol):
+
+def run_fan_out(position_id, account_ids, journal_id, origin=None, received_at=None):
+    with app.app_context():
+        try:
+            with loop_session(db, 'fanout', session_monitor):
+                fan_out_position(position_id, account_ids, journal_id, origin, received_at)
+        except Exception as e:
+            logger.error(f"Order fan-out {journal_id} failed: {str(e)}")
+
+
+def fan_out_position(position_id, account_ids, journal_id, origin=None, received_at=None):
+    """Send the order to each account in turn, emitting every result as it completes.
+
+    ``origin`` is the signal's epoch timestamp; accounts reached after its
+    deadline are skipped. ``received_at`` feeds the queue latency stage.
+    """
+    if received_at:
+        # Webhook to fan-out start, including any time in the dispatch queue
+        signal_guard.latency.record('queue', max(0.0, time.time() - received_at) * 1000)
+    started = time.perf_counter()
+    outcomes = []
+    # Until the accounts are loaded a failure leaves every account to the journal's recovery
+    handed_over = True
+    try:
+        position = db.session.get(Position, position_id)
+        accounts = MT5Account.query.filter(MT5Account.id.in_(account_ids)).all() if account_ids else []
+        handed_over = False
+        for account in accounts:
+            if not leader.holds_lease:
+                # Another worker may lead by now and recover the rest from the journal
+                logger.warning(f"Lease lost; handing fan-out {journal_id} over with "
+                               f"{len(accounts) - len(outcomes)} accounts left")
+                handed_over = True
+                break
+            outcome = fill_account(account, position, journal_id, origin)
+            outcomes.append(outcome)
+            socketio.emit('order_result', outcome)
+    finally:
+        if handed_over:
+            order_journal.release(journal_id)
+        else:
+            order_journal.complete(journal_id, compact=leader.holds_lease)
+
+    fills = [o for o in outcomes if o['status'] == 'filled']
+    latencies = [o['latency_ms'] for o in outcomes if o['latency_ms'] is not None]
+    slippages = [o['slippage'] for o in fills if o['slippage'] is not None]
+    signal_guard.latency.record('fan_out', (time.perf_counter() - started) * 1000)
+    report = {
+        'position_id': position_id,
+        'journal_id': journal_id,
+        'symbol': position.symbol,
+        'accounts': len(accounts),
+        'filled': len(fills),
+        'rejected': sum(1 for o in outcomes if o['status'] == 'rejected'),
+        'failed': sum(1 for o in outcomes if o['status'] == 'failed'),
+        'skipped': sum(1 for o in outcomes if o['status'] == 'skipped'),
+        'avg_latency_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+        'max_latency_ms': max(latencies) if latencies else None,
+        'avg_slippage': round(sum(slippages) / len(slippages), 6) if slippages else None,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+    socketio.emit('order_summary', report)
+    return report
+
+
+def fill_account(account, position, journal_id, origin=None):
+    outcome = {
+        'position_id': position.id,
+        'journal_id': journal_id,
+        'account_id': account.id,
+        'login': account.login,
+        'symbol': position.symbol,
+        'status': 'skipped',
+        'ticket': None,
+        'retcode': None,
+        'requested_price': position.price_open,
+        'fill_price': None,
+        'slippage': None,
+        'latency_ms': None,
+        'error': None
+    }
+    active = position_book.get(position.id) if position_book.loaded else position
+    if active is None or active.status not in ('Open', 'Pending'):
+        # A newer signal cancelled this position while earlier accounts were filling
+        outcome['error'] = 'position no longer active'
+        order_journal.result(journal_id, account.id, ok=False, error=outcome['error'])
+        return outcome
+
+    if origin is not None and signal_guard.expired(origin, time.time()):
+        # A slow fan-out can outlive the signal; later accounts would trade on an old price
+        signal_guard.expired_in_fan_out()
+        outcome['error'] = f"signal expired after {signal_guard.age(origin, time.time()):.1f}s"
+        order_journal.result(journal_id, account.id, ok=False, error=outcome['error'])
+        return outcome
+
+    allowed, reason = account_health.allow(account)
+    if not allowed:
+        logger.warning(f"Skipping account {account.login}: {reason}")
+        outcome['error'] = reason
+        order_journal.result(journal_id, account.id, ok=False, error=reason)
+        return outcome
+
+    volume = position.volume * account.volume_coefficient
+    affordable, reason = account_snapshots.can_afford(account, position.symbol, position.type, volume)
+    if not affordable:
+        logger.warning(f"Skipping account {account.login}: {reason}")
+        outcome['error'] = reason
+        order_journal.result(journal_id, account.id, ok=False, error=reason)
+        return outcome
+
+    if terminal.stalled(account_health.timeout):
+        # An earlier account's call timed out and still holds the terminal; don't queue behind it
+        outcome.update(status='failed', error='terminal busy with a timed-out call')
+        order_journal.result(journal_id, account.id, ok=False, error=outcome['error'])
+        return outcome
+
+    try:
+        outcome.update(open_position_for_account(account, position, journal_id))
+        signal_guard.latency.record('order_send', outcome['latency_ms'])
+        if origin is not None:
+            signal_guard.latency.record('signal_to_order', signal_guard.age(origin, time.time()) * 1000)
+        if outcome['retcode'] in UNREACHABLE_RETCODES:
+            account_health.record_failure(account, outcome['error'] or f"retcode {outcome['retcode']}")
+        else:
+            account_health.record_success(account, outcome['latency_ms'])
+        if outcome['status'] == 'filled':
+            account_snapshots.reserve(account.id, position.symbol, position.type, volume)
+    except TerminalTimeout as e:
+        # A started call may still fill; its journal result is written when it returns
+        logger.error(f"Order timed out for account {account.login}: {str(e)}")
+        outcome.update(status='failed', error=str(e))
+        if e.started:
+            account_health.record_failure(account, str(e), timed_out=True)
+    except Exception as e:
+        logger.error(f"Order failed for account {account.login}: {str(e)}")
+        outcome.update(status='failed', error=str(e))
+        account_health.record_failure(account, str(e))
+    return outcome
+
+def delete_pending_orders(symbol, strategy=None):
     try:
-        # Find and delete existing pending orders
+        # Find and delete existing pending orders from the same strategy
         pending_positions = Position.query.filter_by(
             symbol=symbol, 
-            status='Pending'
+            status='Pending',
+            strategy=strategy
         ).all()
-        
+        # The book is ahead of the database; skip orders the loop has already activated
+        book = {record.id: record for record in position_book.for_symbol(symbol)}
+        pending_positions = [p for p in pending_positions if replaces_pending(book.get(p.id, p), symbol, strategy)]
+        if not pending_positions:
+            return
+
         for position in pending_positions:
-            # Close MT5 orders
-            accounts = MT5Account.query.filter_by(is_active=True).all()
-            for account in accounts:
-                close_mt5_position(account, position)
-            
-            # Update database
             position.status = 'Cancelled'
             position.closed_at = datetime.utcnow()
-            
         db.session.commit()
+        for position in pending_positions:
+            position_book.upsert(position)
+            summary.position_changed(position.symbol, 'Pending', 'Cancelled')
+
+        # Removing the MT5 orders runs on the fan-out thread, ahead of the new signal's own fan-out
+        account_ids = list(signal_routes.accounts_for(db.session, strategy, symbol))
+        if account_ids:
+            fanout_executor.submit(run_cancel_orders, [p.id for p in pending_positions], account_ids)
     except Exception as e:
         logger.error(f"Error deleting pending orders: {str(e)}")
         raise
 
-def open_position_for_account(account, position):
+
+def run_cancel_orders(position_ids, account_ids):
+    with app.app_context():
+        try:
+            with loop_session(db, 'fanout', session_monitor):
+                positions = Position.query.filter(Position.id.in_(position_ids)).all()
+                accounts = MT5Account.query.filter(MT5Account.id.in_(account_ids)).all()
+                for position in positions:
+                    for account in accounts:
+                        run_account_call(account, remove_mt5_order, position)
+        except Exception as e:
+            logger.error(f"Cancelling pending orders {position_ids} failed: {str(e)}")
+
+
+def call_account(account, fn, *args):
+    """Run ``fn(account, *args)`` on the terminal thread behind the account's breaker and deadline.
+
+    Returns (True, result), or (False, None) when the breaker or a stalled
+    terminal kept it from running or it failed. Failures are logged and
+    recorded in account_health, never raised, so one bad account cannot
+    abort or stall the others. Recording success is left to the caller,
+    which knows what the result means.
+    """
+    allowed, reason = account_health.allow(account)
+    if not allowed:
+        logger.warning(f"Skipping {fn.__name__} for account {account.login}: {reason}")
+        return False, None
+    if terminal.stalled(account_health.timeout):
+        logger.warning(f"Skipping {fn.__name__} for account {account.login}: terminal busy with a timed-out call")
+        return False, None
+
+    try:
+        return True, terminal.run_with_timeout(account_health.timeout, fn, account, *args)
+    except TerminalTimeout as e:
+        logger.error(f"{fn.__name__} timed out for account {account.login}: {str(e)}")
+        if e.started:
+            account_health.record_failure(account, str(e), timed_out=True)
+    except Exception as e:
+        logger.error(f"{fn.__name__} failed for account {account.login}: {str(e)}")
+        account_health.record_failure(account, str(e))
+    return False, None
+
+
+def run_account_call(account, fn, *args):
+    """Run a per-account order request through call_account.
+
+    ``fn`` returns the order_send result, or None when there was nothing
+    to send. Returns True when the terminal accepted the request.
+    """
+    ran, result = call_account(account, fn, *args)
+    if not ran:
+        return False
+    if result is None:
+        account_health.record_success(account)
+        return True
+    if result.retcode in UNREACHABLE_RETCODES:
+        account_health.record_failure(account, result.comment or f"retcode {result.retcode}")
+    else:
+        account_health.record_success(account)
+    if result.retcode != mt5.TRADE_RETCODE_DONE:
+        logger.warning(f"{fn.__name__} refused for account {account.login}: {result.comment}")
+        return False
+    return True
+
+def open_position_for_account(account, position, journal_id=None):
+    adjusted_volume = position.volume * account.volume_coefficient
+
+    # Limits and stops (including converted stale signals) rest on the terminal at the signal price
+    market = position.type.lower() in MARKET_TYPES
+    request = {
+        "action": mt5.TRADE_ACTION_DEAL if market else mt5.TRADE_ACTION_PENDING,
+        "symbol": position.symbol,
+        "volume": adjusted_volume,
+        "type": get_order_type(position.type),
+        "price": position.price_open,
+        "sl": position.sl,
+        "tp": position.tp,
+        "deviation": 20,
+        "magic": 234000,
+        "comment": f"python script {position.id}",
+        "type_time": mt5.ORDER_TIME_GTC,
+        "type_filling": mt5.ORDER_FILLING_IOC if market else mt5.ORDER_FILLING_RETURN,
+    }
+    result, latency_ms = terminal.run_with_timeout(account_health.timeout, send_account_order, account, request, journal_id)
+
+    filled = result.retcode == mt5.TRADE_RETCODE_DONE
+    fill_price = result.price if filled and result.price else None
+    slippage = None
+    if fill_price is not None and position.price_open:
+        # Positive slippage is a worse price than requested
+        slippage = fill_price - position.price_open if is_buy(position.type) else position.price_open - fill_price
+    fill = {
+        'status': 'filled' if filled else 'rejected',
+        'ticket': result.order if filled else None,
+        'retcode': result.retcode,
+        'fill_price': fill_price,
+        'slippage': round(slippage, 6) if slippage is not None else None,
+        'latency_ms': round(latency_ms, 3),
+        'error': None if filled else result.comment
+    }
+
+    # Log trade
+    log_trade(account.id, position, fill)
+    return fill
+
+
+def send_account_order(account, request, journal_id=None):
+    """Returns (result, order_send latency in ms); raises only when no result came back.
+
+    Runs on the terminal thread; callers go through terminal.run_with_timeout.
+    """
     if not mt5.initialize():
         raise Exception(f"MT5 initialization failed for account {account.login}")
         
@@ -335,40 +758,109 @@ def open_position_for_account(account, position):
         raise Exception(f"MT5 login failed for account {account.login}")
     
     try:
-        adjusted_volume = position.volume * account.volume_coefficient
-        
-        request = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": position.symbol,
-            "volume": adjusted_volume,
-            "type": get_order_type(position.type),
-            "price": position.price_open,
-            "sl": position.sl,
-            "tp": position.tp,
-            "deviation": 20,
-            "magic": 234000,
-            "comment": f"python script {position.id}",
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
-        }
-        
+        if journal_id:
+            order_journal.sending(journal_id, account.id)
+        started = time.perf_counter()
         result = mt5.order_send(request)
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            raise Exception(f"Order failed: {result.comment}")
-            
-        # Log trade
-        log_trade(account.id, position, result)
-        
+        latency_ms = (time.perf_counter() - started) * 1000
+        if journal_id:
+            order_journal.result(
+                journal_id,
+                account.id,
+                ok=result is not None and result.retcode == mt5.TRADE_RETCODE_DONE,
+                ticket=result.order if result is not None else None,
+                retcode=result.retcode if result is not None else None,
+                error=result.comment if result is not None else str(mt5.last_error())
+            )
+        if result is None:
+            raise Exception(f"Order failed: {mt5.last_error()}")
+        return result, latency_ms
+    finally:
+        mt5.shutdown()
+
+def find_journaled_order(account, position):
+    """Look for an order the terminal accepted before we could journal the result.
+
+    Runs on the terminal thread; recovery goes through call_account.
+    """
+    if not mt5.initialize():
+        raise Exception(f"MT5 initialization failed for account {account.login}")
+
+    if not mt5.login(account.login, account.password, account.server):
+        raise Exception(f"MT5 login failed for account {account.login}")
+
+    try:
+        comment = f"python script {position.id}"
+        for item in (mt5.positions_get(symbol=position.symbol) or ()) + (mt5.orders_get(symbol=position.symbol) or ()):
+            if item.comment == comment:
+                return item.ticket
+        return None
     finally:
         mt5.shutdown()
 
+
+def recover_order_journal():
+    """Finish fan-outs that were interrupted by a crash, restart or lost lease.
+
+    Fan-outs still held by a live worker, such as an old leader finishing
+    the send it started before its lease ran out, are left to it. Returns
+    how many were left, so the caller can look again once they are released.
+    """
+    deferred = 0
+    for entry in order_journal.unfinished():
+        if entry['holder'] and leader.holder_alive(entry['holder']):
+            deferred += 1
+            continue
+        position = db.session.get(Position, entry['position_id'])
+        if position is None or position.status not in ('Open', 'Pending'):
+            order_journal.complete(entry['id'], note='position no longer active')
+            continue
+
+        logger.info(f"Recovering order fan-out {entry['id']} for position {position.id}")
+        signal = entry.get('signal') or {}
+        # A converted signal is already a limit at its own price; anything else must still be fresh
+        origin = None if signal.get('converted') else signal_guard.origin(signal)
+        expired = origin is not None and signal_guard.expired(origin, time.time())
+        accounts = MT5Account.query.filter(MT5Account.id.in_(entry['accounts'])).all()
+        order_journal.claim(entry['id'])
+        for account in accounts:
+            outcome = entry['outcomes'].get(account.id)
+            if outcome and outcome['state'] in ('done', 'failed'):
+                continue
+            if not leader.holds_lease:
+                order_journal.release(entry['id'])
+                return deferred + 1
+            try:
+                if outcome and outcome['state'] == 'sending':
+                    checked, ticket = call_account(account, find_journaled_order, position)
+                    if not checked:
+                        # It may have been sent; better a missed order than a doubled one
+                        order_journal.result(entry['id'], account.id, ok=False, error='could not check for a sent order')
+                        continue
+                    account_health.record_success(account)
+                    if ticket:
+                        order_journal.result(entry['id'], account.id, ok=True, ticket=ticket)
+                        continue
+                if expired:
+                    order_journal.result(entry['id'], account.id, ok=False, error='signal expired before recovery')
+                    continue
+                # Breaker, deadline and margin checks as in a live fan-out
+                fill_account(account, position, entry['id'], origin)
+            except Exception as e:
+                logger.error(f"Order recovery failed for account {account.login}: {str(e)}")
+        order_journal.complete(entry['id'], note='recovered')
+    if leader.holds_lease:
+        order_journal.compact()
+    return deferred
+
+
 def update_trailing_stop():
     open_positions = Position.query.filter_by(status='Open').all()
     
     for position in open_positions:
         current_price = get_current_price(position.symbol)
         
-        if position.type.startswith('Buy'):
+        if is_buy(position.type):
             new_sl = calculate_trailing_stop(
                 current_price, 
                 position.price_open, 
@@ -386,31 +878,21 @@ def update_trailing_stop():
         if new_sl != position.sl:
             update_position_sl(position, new_sl)
 
-def calculate_trailing_stop(current_price, open_price, current_sl, direction):
-    trail_points = 100  # Configurable trailing stop distance
-    
-    if direction == 'buy':
-        potential_sl = current_price - trail_points
-        return max(potential_sl, current_sl)
-    else:
-        potential_sl = current_price + trail_points
-        return min(potential_sl, current_sl)
-
 def update_position_sl(position, new_sl):
     try:
         position.sl = new_sl
         db.session.commit()
         
-        # Update SL in MT5
-        accounts = MT5Account.query.filter_by(is_active=True).all()
-        for account in accounts:
-            if not is_symbol_restricted(account.id, position.symbol):
-                update_mt5_position_sl(account, position)
+        # Update SL in MT5 on the accounts the position was routed to
+        account_ids = signal_routes.accounts_for(db.session, position.strategy, position.symbol)
+        for account in MT5Account.query.filter(MT5Account.id.in_(account_ids)).all() if account_ids else []:
+            run_account_call(account, update_mt5_position_sl, position)
     except Exception as e:
         logger.error(f"Error updating SL: {str(e)}")
         raise
 
 def update_mt5_position_sl(account, position):
+    """Returns the order_send result; runs on the terminal thread via run_account_call."""
     if not mt5.initialize():
         raise Exception(f"MT5 initialization failed for account {account.login}")
         
@@ -427,150 +909,68 @@ def update_mt5_position_sl(account, position):
         }
         
         result = mt5.order_send(request)
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            raise Exception(f"Failed to update SL: {result.comment}")
+        if result is None:
+            raise Exception(f"Failed to update SL: {mt5.last_error()}")
+        return result
     finally:
         mt5.shutdown()
 
-def is_symbol_restricted(account_id, symbol):
-    restricted_symbols = RestrictedSymbol.query.filter_by(account_id=account_id).all()
-    return any(restricted.symbol == symbol for restricted in restricted_symbols)
-
-def price_update_thread(app):
-    with app.app_context():
-        while True:
-            try:
-                # Get all active positions
-                positions = Position.query.filter(Position.status.in_(['Open', 'Pending'])).all()
-                
-                price_updates = {}
-                for pos in positions:
-                    symbol_info = mt5.symbol_info(pos.symbol)
-                    if symbol_info is None:
-                        continue
-
-                    price = symbol_info.bid if pos.type.lower().includes('buy') else symbol_info.ask
-                    change = price - pos.price_open
-                    price_updates[pos.symbol] = {
-                        'bid': symbol_info.bid,
-                        'ask': symbol_info.ask,
-                        'change': change
-                    }
-
-                    # Update trailing stop
-                    update_trailing_stop()
-
-                    # Update position status if needed
-                    if pos.status == 'Pending':
-                        # Check if pending order should be activated
-                        if (pos.type == 'Buy Limit' and price <= pos.price_open) or \
-                           (pos.type == 'Sell Limit' and price >= pos.price_open) or \
-                           (pos.type == 'Buy Stop' and price >= pos.price_open) or \
-                           (pos.type == 'Sell Stop' and price <= pos.price_open):
-                            pos.status = 'Open'
-                            db.session.commit()
-                            # Send telegram notification for status change
-                            telegram_service.position_status_changed(pos)
-                    elif pos.status == 'Open':
-                        # Check for SL/TP
-                        if pos.type.startswith('Buy'):
-                            if price <= pos.sl:
-                                pos.status = 'Closed'
-                                pos.price_close = price
-                                pos.profit = (price - pos.price_open) * pos.volume * 100000
-                                # Send telegram notification for status change
-                                telegram_service.position_status_changed(pos)
-                            elif price >= pos.tp:
-                                pos.status = 'Closed'
-                                pos.price_close = price
-                                pos.profit = (price - pos.price_open) * pos.volume * 100000
-                                # Send telegram notification for status change
-                                telegram_service.position_status_changed(pos)
-                        else:  # Sell positions
-                            if price >= pos.sl:
-                                pos.status = 'Closed'
-                                pos.price_close = price
-                                pos.profit = (pos.price_open - price) * pos.volume * 100000
-                                # Send telegram notification for status change
-                                telegram_service.position_status_changed(pos)
-                            elif price <= pos.tp:
-                                pos.status = 'Closed'
-                                pos.price_close = price
-                                pos.profit = (pos.price_open - price) * pos.volume * 100000
-                                # Send telegram notification for status change
-                                telegram_service.position_status_changed(pos)
-
-                # Emit price updates via WebSocket
-                if price_updates:
-                    socketio.emit('price_update', {'prices': price_updates})
-
-                db.session.commit()
-                time.sleep(1)
-
-            except Exception as e:
-                logger.error(f"Price update error: {str(e)}")
-                time.sleep(5)
-
-def log_trade(account_id, position, result):
+def log_trade(account_id, position, fill):
     log = TradeLog(
         account_id=account_id,
         symbol=position.symbol,
-        action='open',
+        action='open' if fill['status'] == 'filled' else 'rejected',
         type=position.type,
         volume=position.volume,
-        price=position.price_open,
+        price=fill['fill_price'] if fill['fill_price'] is not None else position.price_open,
         sl=position.sl,
         tp=position.tp,
-        profit=0  # Initial profit is 0
+        profit=0,  # Initial profit is 0
+        ticket=fill['ticket'],
+        retcode=fill['retcode'],
+        requested_price=position.price_open,
+        slippage=fill['slippage'],
+        latency_ms=fill['latency_ms']
     )
     db.session.add(log)
     db.session.commit()
 
+def closing_price(position):
+    """Bid for closing a buy, ask for a sell; call on the terminal thread."""
+    tick = mt5.symbol_info_tick(position.symbol)
+    return quote_price(position.type, tick.bid, tick.ask)
+
+@terminal.exclusive
 def get_current_price(symbol):
+    if not mt5.initialize():
+        raise Exception("MT5 initialization failed")
     symbol_info = mt5.symbol_info(symbol)
     if symbol_info is None:
         raise Exception(f"Symbol {symbol} not found")
     return symbol_info.bid if symbol_info.bid > 0 else symbol_info.ask
 
-def close_mt5_position(account, position):
+def remove_mt5_order(account, position):
+    """Remove the account's pending order for ``position``; None when it has none left.
+
+    Runs on the terminal thread via run_account_call. Orders are found by
+    the comment they were sent with, since tickets differ per account.
+    """
     if not mt5.initialize():
         raise Exception(f"MT5 initialization failed for account {account.login}")
-        
-    if not mt5.login(account.login, account.password, account.server):
-        raise Exception(f"MT5 login failed for account {account.login}")
-    
-    try:
-        request = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": position.symbol,
-            "volume": position.volume,
-            "type": mt5.ORDER_TYPE_SELL if position.type.startswith('Buy') else mt5.ORDER_TYPE_BUY,
-            "position": position.ticket,
-            "price": mt5.symbol_info_tick(position.symbol).bid
-        }
-        
-        result = mt5.order_send(request)
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            raise Exception(f"Failed to close position: {result.comment}")
-    finally:
-        mt5.shutdown()
-        
+
     if not mt5.login(account.login, account.password, account.server):
         raise Exception(f"MT5 login failed for account {account.login}")
-    
+
     try:
-        request = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": position.symbol,
-            "volume": position.volume,
-            "type": mt5.ORDER_TYPE_SELL if position.type.startswith('Buy') else mt5.ORDER_TYPE_BUY,
-            "position": position.ticket,
-            "price": mt5.symbol_info_tick(position.symbol).bid
-        }
-        
-        result = mt5.order_send(request)
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            raise Exception(f"Failed to close position: {result.comment}")
+        comment = f"python script {position.id}"
+        for order in mt5.orders_get(symbol=position.symbol) or ():
+            if order.comment == comment:
+                result = mt5.order_send({"action": mt5.TRADE_ACTION_REMOVE, "order": order.ticket})
+                if result is None:
+                    raise Exception(f"Failed to remove order {order.ticket}: {mt5.last_error()}")
+                return result
+        # Already filled, expired or never placed on this account
+        return None
     finally:
         mt5.shutdown()
 
@@ -590,52 +990,65 @@ def get_mt5_order_type(order_type):
 @app.route('/')
 @check_auth
 def home():
-    webhooks = Webhook.query.all()
-    positions = Position.query.all()
-    return render_template('home.html', webhooks=webhooks, positions=positions)
+    # Only active positions and the most recent history; totals come from the summary counters
+    limit = int(os.getenv('HOME_HISTORY_LIMIT', 100))
+    webhooks = read_db.query(Webhook).order_by(Webhook.id.desc()).limit(limit).all()
+    positions = read_db.query(Position).filter(Position.status.in_(['Open', 'Pending'])).all()
+    positions += read_db.query(Position).filter_by(status='Closed') \
+        .order_by(Position.closed_at.desc()).limit(limit).all()
+    return render_template('home.html', webhooks=webhooks, positions=positions, summary=summary.snapshot())
+
+
+@app.route('/api/summary')
+def get_summary():
+    return jsonify(summary.snapshot())
 
 
 
 @app.route('/api/position/<int:id>')
 def get_position_details(id):
-    position = Position.query.get_or_404(id)
-    return jsonify({
-        'id': position.id,
-        'timestamp': position.timestamp,
-        'symbol': position.symbol,
-        'ticket': position.ticket,
-        'type': position.type,
-        'volume': position.volume,
-        'price_open': position.price_open,
-        'sl': position.sl,
-        'tp': position.tp,
-        'profit': position.profit,
-        'status': position.status
-    })
+    def build():
+        position = read_db.get_or_404(Position, id)
+        return {
+            'id': position.id,
+            'timestamp': position.created_at,
+            'symbol': position.symbol,
+            'ticket': position.ticket,
+            'type': position.type,
+            'volume': position.volume,
+            'price_open': position.price_open,
+            'sl': position.sl,
+            'tp': position.tp,
+            'profit': position.profit,
+            'status': position.status
+        }
+    return api_cache.respond(f'position/{id}', ('position',), build)
 
 
 @app.route('/api/webhook/<int:id>')
 def get_webhook_details(id):
-    webhook = Webhook.query.get_or_404(id)
-    return jsonify({
-        'id': webhook.id,
-        'timestamp': webhook.timestamp,
-        'action': webhook.action,
-        'symbol': webhook.symbol,
-        'volume': webhook.volume,
-        'order_type': webhook.order_type,
-        'price': webhook.price,
-        'stop_loss': webhook.stop_loss,
-        'take_profit': webhook.take_profit,
-        'expiration': webhook.expiration,
-        'status': webhook.status,
-        'error_message': webhook.error_message
-    })
+    def build():
+        webhook = read_db.get_or_404(Webhook, id)
+        return {
+            'id': webhook.id,
+            'timestamp': webhook.timestamp,
+            'action': webhook.action,
+            'symbol': webhook.symbol,
+            'volume': webhook.volume,
+            'order_type': webhook.order_type,
+            'price': webhook.price,
+            'stop_loss': webhook.stop_loss,
+            'take_profit': webhook.take_profit,
+            'expiration': webhook.expiration,
+            'status': webhook.status,
+            'error_message': webhook.error_message
+        }
+    return api_cache.respond(f'webhook/{id}', ('webhook',), build)
 
 
 @app.route('/webhook/<int:id>/details')
 def webhook_details(id):
-    webhook = Webhook.query.get_or_404(id)
+    webhook = read_db.get_or_404(Webhook, id)
     return jsonify({
         'request': {
             'action': webhook.action,
@@ -652,10 +1065,10 @@ def webhook_details(id):
 
 @app.route('/api/position/<int:id>/details')
 def position_details(id):
-    position = Position.query.get_or_404(id)
+    position = read_db.get_or_404(Position, id)
     return jsonify({
         'id': position.id,
-        'timestamp': position.timestamp,
+        'timestamp': position.created_at,
         'symbol': position.symbol,
         'ticket': position.ticket,
         'type': position.type,
@@ -667,29 +1080,44 @@ def position_details(id):
         'status': position.status
     })
 
+@terminal.exclusive
+def send_terminal_request(build_request):
+    """Initialize the terminal and send one request as a single unit.
+
+    build_request runs on the terminal thread so it can read live quotes.
+    Returns (None, None) when the terminal cannot be initialized.
+    """
+    if not mt5.initialize():
+        return None, None
+    order_request = build_request()
+    return order_request, mt5.order_send(order_request)
+
+
 @app.route('/api/position/<int:ticket>/close', methods=['POST'])
 def close_position(ticket):
     try:
         position = Position.query.filter_by(ticket=ticket).first_or_404()
 
-        if not mt5.initialize():
-            return jsonify({"error": "MT5 initialization failed"}), 500
-
-        request = {
+        close_request, result = send_terminal_request(lambda: {
             "action": mt5.TRADE_ACTION_DEAL,
             "symbol": position.symbol,
             "volume": position.volume,
-            "type": mt5.ORDER_TYPE_SELL if position.type.lower().startswith('buy') else mt5.ORDER_TYPE_BUY,
+            "type": mt5.ORDER_TYPE_SELL if is_buy(position.type) else mt5.ORDER_TYPE_BUY,
             "position": position.ticket,
-            "price": mt5.symbol_info_tick(position.symbol).bid
-        }
-
-        result = mt5.order_send(request)
+            "price": closing_price(position)
+        })
+        if close_request is None:
+            return jsonify({"error": "MT5 initialization failed"}), 500
 
         if result.retcode == mt5.TRADE_RETCODE_DONE:
+            old_status = position.status
             position.status = 'Closed'
-            position.price_close = request['price']
+            position.price_close = close_request['price']
+            position.profit = calculate_profit(position, position.price_close)
+            position.closed_at = datetime.utcnow()
             db.session.commit()
+            position_book.upsert(position)
+            summary.position_changed(position.symbol, old_status, 'Closed', position.profit)
             return jsonify({"success": True})
 
         return jsonify({"error": f"MT5 error: {result.comment}"}), 400
@@ -705,10 +1133,7 @@ def update_position(ticket):
         data = request.get_json()
         position = Position.query.filter_by(ticket=ticket).first_or_404()
 
-        if not mt5.initialize():
-            return jsonify({"error": "MT5 initialization failed"}), 500
-
-        request = {
+        modify_request = {
             "action": mt5.TRADE_ACTION_MODIFY,
             "symbol": position.symbol,
             "position": position.ticket,
@@ -717,15 +1142,18 @@ def update_position(ticket):
             "tp": float(data.get("take_profit", position.tp or 0))
         }
 
-        result = mt5.order_send(request)
+        _, result = send_terminal_request(lambda: modify_request)
+        if result is None:
+            return jsonify({"error": "MT5 initialization failed"}), 500
 
         if result.retcode == mt5.TRADE_RETCODE_DONE:
             # Update position in database
-            position.sl = request["sl"]
-            position.tp = request["tp"]
+            position.sl = modify_request["sl"]
+            position.tp = modify_request["tp"]
             if position.status == "Pending":
-                position.price_open = request["price"]
+                position.price_open = modify_request["price"]
             db.session.commit()
+            position_book.upsert(position)
 
             return jsonify({
                 "success": True,
@@ -750,18 +1178,20 @@ def cancel_position(ticket):
         if position.status != 'Pending':
             return jsonify({"error": "Only pending orders can be cancelled"}), 400
 
-        if not mt5.initialize():
-            return jsonify({"error": "MT5 initialization failed"}), 500
-
         cancel_request = {
             "action": mt5.TRADE_ACTION_REMOVE,
             "order": position.ticket
         }
 
-        result = mt5.order_send(cancel_request)
+        _, result = send_terminal_request(lambda: cancel_request)
+        if result is None:
+            return jsonify({"error": "MT5 initialization failed"}), 500
+
         if result.retcode == mt5.TRADE_RETCODE_DONE:
             position.status = 'Cancelled'
             db.session.commit()
+            position_book.upsert(position)
+            summary.position_changed(position.symbol, 'Pending', 'Cancelled')
             return jsonify({"success": True})
 
         return jsonify({"error": f"MT5 error: {result.comment}"}), 400
@@ -773,24 +1203,89 @@ def cancel_position(ticket):
 
 @app.route('/api/positions')
 def get_positions():
-    positions = Position.query.order_by(Position.timestamp.desc()).all()
-    return jsonify([{
-        'timestamp': p.timestamp,
-        'symbol': p.symbol,
-        'type': p.type,
-        'price_open': p.price_open,
-        'price_close': p.price_close,
-        'sl': p.sl,
-        'tp': p.tp,
-        'profit': p.profit,
-        'status': p.status
-    } for p in positions])
+    def build():
+        positions = read_db.query(Position).order_by(Position.created_at.desc()).all()
+        return [{
+            'timestamp': p.created_at,
+            'symbol': p.symbol,
+            'type': p.type,
+            'price_open': p.price_open,
+            'price_close': p.price_close,
+            'sl': p.sl,
+            'tp': p.tp,
+            'profit': p.profit,
+            'status': p.status
+        } for p in positions]
+    return api_cache.respond('positions', ('position',), build)
+
+
+@app.route('/api/ticks/<symbol>')
+def get_ticks(symbol):
+    limit = request.args.get('limit', 500, type=int)
+    try:
+        ticks = tick_recorder.recent(symbol, max(1, limit))
+    except ValueError as e:
+        logger.error(f"Tick ring error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'symbol': symbol,
+        'ticks': [[float(t['time']), float(t['bid']), float(t['ask'])] for t in ticks]
+    })
+
+
+@app.route('/api/health/loop')
+@login_required
+def loop_health():
+    return jsonify({
+        'event_loop': loop_lag_monitor.stats(),
+        'terminal': terminal.stats(),
+        'ticks': tick_ingestor.stats(),
+        'bars': bar_cache.stats(),
+        'accounts': account_health.stats(),
+        'api_cache': api_cache.stats(),
+        'routing': signal_routes.stats(),
+        'signals': signal_guard.stats(),
+        'database': session_monitor.stats()
+    })
+
+
+@app.route('/api/admin/profile', methods=['POST'])
+@login_required
+def profile_capture():
+    """Profile the price loop or a route for N seconds, e.g. {"target": "/webhook", "seconds": 10}."""
+    if current_user.username != os.getenv('ADMIN_USER'):
+        return jsonify({'error': 'Admin only'}), 403
+
+    data = request.get_json(silent=True) or {}
+    try:
+        capture = profiler.start(
+            data.get('target', 'price_loop'),
+            data.get('seconds', 10),
+            data.get('mode', 'sample')
+        )
+    except (ValueError, RuntimeError) as e:
+        return jsonify({'error': str(e), 'threads': profiler.targets()}), 400
+
+    try:
+        socketio.sleep(capture.seconds)
+    finally:
+        report = profiler.stop(capture)
+
+    if request.args.get('format') == 'collapsed':
+        return Response(report.get('collapsed', ''), mimetype='text/plain')
+    return jsonify(report)
+
+
+@app.route('/api/accounts/state')
+@login_required
+def account_state():
+    return jsonify(account_snapshots.snapshots())
 
 
 @app.route('/positions')
 @login_required
 def positions():
-    positions = Position.query.all()
+    positions = read_db.query(Position).all()
     return render_template('positions.html', positions=positions)
 
 
@@ -798,14 +1293,14 @@ def positions():
 @app.route('/logs')
 @login_required
 def logs():
-    logs = Log.query.all()
+    logs = read_db.query(Log).all()
     return render_template('logs.html', logs=logs)
 
 
 @app.route('/webhooks')
 @login_required
 def webhooks():
-    webhooks = Webhook.query.all()
+    webhooks = read_db.query(Webhook).all()
     return render_template('webhooks.html', webhooks=webhooks)
 
 
@@ -824,7 +1319,8 @@ def add_account():
             login=request.form['login'],
             password=request.form['password'],
             server=request.form['server'],
-            volume_coefficient=float(request.form['volume_coefficient'])
+            volume_coefficient=float(request.form['volume_coefficient']),
+            group_id=request.form.get('group_id', type=int)
         )
         db.session.add(account)
         db.session.commit()
@@ -849,29 +1345,107 @@ def manage_symbols(id):
         return redirect(url_for('accounts'))
     return render_template('manage_symbols.html', account=account)
 
+@app.route('/api/admin/groups', methods=['GET', 'POST'])
+@login_required
+def account_groups():
+    """List groups, or create/update one: {"name": "swing", "strategies": ["trend", "breakout"]}."""
+    if current_user.username != os.getenv('ADMIN_USER'):
+        return jsonify({'error': 'Admin only'}), 403
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        name = (data.get('name') or '').strip()
+        if not name:
+            return jsonify({'error': 'name is required'}), 400
+        strategies = data.get('strategies') or []
+        if isinstance(strategies, str):
+            strategies = [strategies]
+        group = AccountGroup.query.filter_by(name=name).first() or AccountGroup(name=name)
+        group.strategies = ','.join(sorted(parse_strategies(','.join(strategies))))
+        db.session.add(group)
+        db.session.commit()
+
+    groups = AccountGroup.query.order_by(AccountGroup.name).all()
+    return jsonify([{
+        'id': group.id,
+        'name': group.name,
+        'strategies': sorted(parse_strategies(group.strategies)),
+        'accounts': [account.login for account in group.accounts]
+    } for group in groups])
+
+
+@app.route('/api/admin/accounts/<int:id>/group', methods=['POST'])
+@login_required
+def assign_account_group(id):
+    """Move an account into a group by name, or out of any group with {"group": null}."""
+    if current_user.username != os.getenv('ADMIN_USER'):
+        return jsonify({'error': 'Admin only'}), 403
+
+    account = MT5Account.query.get_or_404(id)
+    name = (request.get_json(silent=True) or {}).get('group')
+    group = None
+    if name:
+        group = AccountGroup.query.filter_by(name=name).first()
+        if group is None:
+            return jsonify({'error': f"Unknown group {name}"}), 404
+    account.group_id = group.id if group else None
+    db.session.commit()
+    return jsonify({'account': account.login, 'group': group.name if group else None})
+
+@app.route('/api/export/<table>')
+@login_required
+def export_history(table):
+    """Stream trades or positions, e.g. /api/export/trades?format=parquet&account_id=3&start=2025-01-01."""
+    fmt = request.args.get('format') or default_format()
+    try:
+        start, end = (to_datetime(request.args[key]) if request.args.get(key) else None for key in ('start', 'end'))
+        body = stream_export(
+            read_db.session, table, fmt,
+            account_id=request.args.get('account_id', type=int),
+            start=start,
+            end=end
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    mimetype, extension = FORMATS[fmt]
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={table}.{extension}'}
+    )
+
+@app.route('/api/bars')
+@login_required
+def get_bars():
+    """OHLC bars for a chart, e.g. /api/bars?symbol=EURUSD&timeframe=5m&limit=300."""
+    symbol = request.args.get('symbol', '').strip()
+    timeframe = request.args.get('timeframe', '1m')
+    limit = request.args.get('limit', 300, type=int)
+    if not symbol:
+        return jsonify({'error': 'symbol is required'}), 400
+    if timeframe not in TIMEFRAMES:
+        return jsonify({'error': f"Unknown timeframe {timeframe}; use one of {', '.join(TIMEFRAMES)}"}), 400
+
+    def build():
+        return {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'bars': bar_cache.bars(symbol, timeframe, limit, now=time.time())
+        }
+
+    # No table behind it; the TTL bounds how far behind the forming bar can be
+    return api_cache.respond(f"bars:{symbol}:{timeframe}:{limit}", (), build)
+
 @app.route('/admin/logs')
 @login_required
 def view_logs():
-    trade_logs = TradeLog.query.order_by(TradeLog.created_at.desc()).limit(100)
-    webhook_logs = WebhookLog.query.order_by(WebhookLog.created_at.desc()).limit(100)
+    trade_logs = read_db.query(TradeLog).order_by(TradeLog.created_at.desc()).limit(100)
+    webhook_logs = read_db.query(WebhookLog).order_by(WebhookLog.created_at.desc()).limit(100)
     return render_template('logs.html', trade_logs=trade_logs, webhook_logs=webhook_logs)
 
-def log_trade(account_id, trade_data):
-    log = TradeLog(
-        account_id=account_id,
-        symbol=trade_data['symbol'],
-        action=trade_data['action'],
-        type=trade_data['type'],
-        volume=trade_data['volume'],
-        price=trade_data['price'],
-        sl=trade_data.get('sl'),
-        tp=trade_data.get('tp'),
-        profit=trade_data.get('profit', 0)
-    )
-    db.session.add(log)
-    db.session.commit()
-
 
+@terminal.exclusive
 def check_mt5_positions():
     if not mt5.initialize():
         logger.error("MT5 initialization failed")
@@ -897,91 +1471,228 @@ def check_mt5_positions():
 
 
 def price_update_thread(app):
+    profiler.register_thread('price_loop')
+    trigger_index = TriggerIndex()
+    last_quotes = {}
     with app.app_context():
+        was_leader = False
         while True:
             try:
-                # Get all active positions
-                positions = Position.query.filter(Position.status.in_(['Open', 'Pending'])).all()
-                
-                price_updates = {}
-                for pos in positions:
-                    symbol_info = mt5.symbol_info(pos.symbol)
-                    if symbol_info is None:
+                with loop_session(db, 'price_loop', session_monitor):
+                    if not leader.is_leader:
+                        was_leader = False
+                        time.sleep(1)
                         continue
 
-                    price = symbol_info.bid if pos.type.lower().includes('buy') else symbol_info.ask
-                    change = price - pos.price_open
-                    price_updates[pos.symbol] = {
-                        'bid': symbol_info.bid,
-                        'ask': symbol_info.ask,
-                        'change': change
-                    }
-
-                    # Update position status if needed
-                    if pos.status == 'Pending':
-                        # Check if pending order should be activated
-                        if (pos.type == 'Buy Limit' and price <= pos.price_open) or \
-                           (pos.type == 'Sell Limit' and price >= pos.price_open) or \
-                           (pos.type == 'Buy Stop' and price >= pos.price_open) or \
-                           (pos.type == 'Sell Stop' and price <= pos.price_open):
-                            pos.status = 'Open'
-                            db.session.commit()
-                            # Send telegram notification for status change
-                            telegram_service.position_status_changed(pos)
-                    elif pos.status == 'Open':
-                        # Check for SL/TP
-                        if pos.type.startswith('Buy'):
-                            if price <= pos.sl:
-                                pos.status = 'Closed'
-                                pos.price_close = price
-                                pos.profit = (price - pos.price_open) * pos.volume * 100000
-                                # Send telegram notification for status change
-                                telegram_service.position_status_changed(pos)
-                            elif price >= pos.tp:
-                                pos.status = 'Closed'
-                                pos.price_close = price
-                                pos.profit = (price - pos.price_open) * pos.volume * 100000
-                                # Send telegram notification for status change
-                                telegram_service.position_status_changed(pos)
-                        else:  # Sell positions
-                            if price >= pos.sl:
-                                pos.status = 'Closed'
-                                pos.price_close = price
-                                pos.profit = (pos.price_open - price) * pos.volume * 100000
-                                # Send telegram notification for status change
-                                telegram_service.position_status_changed(pos)
-                            elif price <= pos.tp:
-                                pos.status = 'Closed'
-                                pos.price_close = price
-                                pos.profit = (pos.price_open - price) * pos.volume * 100000
-                                # Send telegram notification for status change
-                                telegram_service.position_status_changed(pos)
-
-                # Emit price updates via WebSocket
-                if price_updates:
-                    socketio.emit('price_update', {'prices': price_updates})
-
-                db.session.commit()
-                time.sleep(1)
+                    if not was_leader:
+                        # Load once per leadership term; after this the loop only reads memory
+                        position_book.load(db.session)
+                        trigger_index = TriggerIndex()
+                        was_leader = True
+
+                    for key in position_book.drain_changes():
+                        record = position_book.get(key)
+                        if record is None:
+                            trigger_index.remove(key)
+                        else:
+                            trigger_index.update(record)
+
+                    price_updates = {}
+                    notifications = []
+                    now = time.time()
+                    tick_ingestor.sync(position_book.symbols(), now)
+                    for symbol in tick_ingestor.due(now):
+                        ticks = tick_ingestor.fetch(symbol, len(position_book.for_symbol(symbol)), now)
+                        if not ticks:
+                            continue
+
+                        # Every tick since the last poll, so levels touched within a second still fire
+                        with position_book.lock:
+                            if not leader.is_leader:
+                                # Stepped down mid-iteration; the book now belongs to the shutdown flush
+                                break
+                            for time_msc, bid, ask in ticks:
+                                tick_recorder.record(symbol, time_msc / 1000, bid, ask)
+                                for key in trigger_index.candidates(symbol, bid, ask):
+                                    pos = position_book.get(key)
+                                    if pos is None:
+                                        continue
+                                    old_status = pos.status
+                                    event = evaluate_tick(pos, bid, ask, closed_at=datetime.utcfromtimestamp(time_msc / 1000))
+                                    if event:
+                                        position_book.mark_dirty(pos)
+                                        trigger_index.update(pos)
+                                        summary.position_changed(pos.symbol, old_status, pos.status, pos.profit)
+                                        notifications.append(pos)
+
+                        bar_cache.record(symbol, ticks, now)
+                        _, bid, ask = ticks[-1]
+                        previous = last_quotes.get(symbol)
+                        last_quotes[symbol] = bid
+                        price_updates[symbol] = {
+                            'bid': bid,
+                            'ask': ask,
+                            'change': bid - previous if previous is not None else 0
+                        }
+
+                    # Send telegram notifications for status changes
+                    for pos in notifications:
+                        telegram_service.position_status_changed(pos)
+
+                    # Emit price updates via WebSocket
+                    if price_updates:
+                        socketio.emit('price_update', {'prices': price_updates})
+
+                # Each symbol polls on its own adaptive interval; wake for the next one due
+                time.sleep(tick_ingestor.sleep_time(time.time()))
 
             except Exception as e:
                 logger.error(f"Price update error: {str(e)}")
                 time.sleep(5)
 
 
+def position_book_thread(app):
+    """Write-behind persistence for the position book, plus a periodic reconcile."""
+    flush_interval = float(os.getenv('POSITION_FLUSH_INTERVAL', 1.0))
+    reconcile_seconds = int(os.getenv('POSITION_RECONCILE_SECONDS', 30))
+    with app.app_context():
+        last_reconcile = time.monotonic()
+        while True:
+            time.sleep(flush_interval)
+            if not leader.is_leader:
+                continue
+            try:
+                with loop_session(db, 'position_book', session_monitor) as session:
+                    position_book.flush(session)
+                    if time.monotonic() - last_reconcile >= reconcile_seconds:
+                        # Closes and edits made through other workers go straight to the database
+                        position_book.reconcile(session)
+                        last_reconcile = time.monotonic()
+            except Exception as e:
+                logger.error(f"Position book flush error: {str(e)}")
+
+
+def account_snapshot_thread(app):
+    with app.app_context():
+        while True:
+            try:
+                if leader.is_leader:
+                    for symbol in position_book.symbols():
+                        account_snapshots.track_symbol(symbol)
+                    with loop_session(db, 'account_snapshot', session_monitor) as session:
+                        accounts = MT5Account.query.filter_by(is_active=True).all()
+                        # Keep the loaded rows usable; the slow terminal calls run without a session
+                        session.expunge_all()
+                    account_snapshots.refresh_all(accounts)
+            except Exception as e:
+                logger.error(f"Account snapshot error: {str(e)}")
+            time.sleep(account_snapshots.interval)
+
+
+def account_health_thread(app):
+    interval = float(os.getenv('ACCOUNT_PROBE_INTERVAL', 5))
+    with app.app_context():
+        while True:
+            try:
+                if leader.is_leader:
+                    with loop_session(db, 'account_health', session_monitor) as session:
+                        accounts = MT5Account.query.filter_by(is_active=True).all()
+                        session.expunge_all()
+                    account_health.forget(a.id for a in accounts)
+                    due = set(account_health.due_probes())
+                    for account in accounts:
+                        if account.id in due:
+                            account_health.probe_account(account)
+            except Exception as e:
+                logger.error(f"Account probe error: {str(e)}")
+            time.sleep(interval)
+
+
+def summary_thread(app):
+    # Counters are per worker; a periodic rebuild folds in changes made by other workers
+    interval = int(os.getenv('SUMMARY_RESYNC_SECONDS', 300))
+    with app.app_context():
+        while True:
+            try:
+                with loop_session(db, 'summary', session_monitor) as session:
+                    summary.rebuild(session)
+            except Exception as e:
+                logger.error(f"Summary rebuild error: {str(e)}")
+            time.sleep(interval)
+
+
+def start_background_workers():
+    # Every worker competes for the lease; the loops idle unless it is held
+    workers = (
+        (leader.run, ()),
+        (price_update_thread, (app,)),
+        (position_book_thread, (app,)),
+        (dispatch_thread, (app,)),
+        (summary_thread, (app,)),
+        (account_snapshot_thread, (app,)),
+        (account_health_thread, (app,)),
+        (audit_writer.run, ())
+    )
+    for target, args in workers:
+        thread = threading.Thread(
+            target=target,
+            args=args,
+            daemon=True
+        )
+        thread.start()
+
+    # Runs on the event loop itself so it measures how long the hub is blocked
+    socketio.start_background_task(loop_lag_monitor.run)
+
+
+def drain_background_workers(timeout=None):
+    """Finish queued orders and write state out before the process exits.
+
+    Called once the server has stopped taking requests. The worker steps
+    down so the loops stop picking up new work, waits for the dispatches
+    and fan-outs it already started, writes the position book and the
+    audit queue, and only then releases the lease, so the next leader
+    loads a complete database.
+    """
+    timeout = timeout or float(os.getenv('SERVER_DRAIN_TIMEOUT', 30))
+    deadline = time.monotonic() + timeout
+    was_leader = leader.is_leader
+    leader.step_down()
+
+    with app.app_context():
+        while time.monotonic() < deadline:
+            with loop_session(db, 'shutdown', session_monitor) as session:
+                processing = session.query(DispatchRequest.id) \
+                    .filter_by(status='processing', worker=leader.holder).count()
+            if not processing:
+                break
+            time.sleep(0.5)
+
+        try:
+            # One fan-out thread, so this runs after every fan-out queued before it
+            fanout_executor.submit(lambda: None).result(timeout=max(deadline - time.monotonic(), 1))
+        except FutureTimeout:
+            logger.warning("Shutdown drain timed out with fan-outs still running; the journal will recover them")
+
+        if was_leader:
+            with loop_session(db, 'shutdown', session_monitor) as session:
+                position_book.flush(session)
+
+    audit_writer.flush()
+    if leader.holds_lease:
+        order_journal.compact()
+    order_journal.close()
+    leader.release()
+    logger.info(f"Drained {leader.holder} in {timeout - (deadline - time.monotonic()):.1f}s")
+
+
 # Update main
 if __name__ == "__main__":
     with app.app_context():
         db.create_all()
         init_admin_user()
 
-    # Start price update thread
-    thread = threading.Thread(
-        target=price_update_thread,
-        args=(app,),
-        daemon=True
-    )
-    thread.start()
+    start_background_workers()
 
     socketio.run(app, host='0.0.0.0', port=5001)
 
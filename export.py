@@ -0,0 +1,47 @@
+import argparse
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from init_db import get_database_uri
+from services.export_service import EXPORT_TABLES, FORMATS, default_format, stream_export
+from services.replay_service import to_datetime
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream trade history to Parquet or gzip CSV')
+    parser.add_argument('table', choices=sorted(EXPORT_TABLES))
+    parser.add_argument('--format', choices=sorted(FORMATS), default=default_format(),
+                        help='parquet needs pyarrow; defaults to csv without it')
+    parser.add_argument('--account', type=int, help='Only rows for this MT5Account id')
+    parser.add_argument('--start', help='Only rows created at or after this time (ISO)')
+    parser.add_argument('--end', help='Only rows created before this time (ISO)')
+    parser.add_argument('--chunk-size', type=int, help='Rows per keyset page (EXPORT_CHUNK_ROWS, default 5000)')
+    parser.add_argument('--output', help='Output file; defaults to <table>.<extension>')
+    args = parser.parse_args()
+
+    output = args.output or f"{args.table}.{FORMATS[args.format][1]}"
+    engine = create_engine(get_database_uri())
+    written = 0
+    try:
+        with Session(engine) as session, open(output, 'wb') as f:
+            for data in stream_export(
+                session, args.table, args.format,
+                account_id=args.account,
+                start=to_datetime(args.start) if args.start else None,
+                end=to_datetime(args.end) if args.end else None,
+                chunk_size=args.chunk_size
+            ):
+                f.write(data)
+                written += len(data)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        engine.dispose()
+    print(f"Wrote {written} bytes to {output}")
+
+
+if __name__ == '__main__':
+    main()
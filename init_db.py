@@ -1,14 +1,18 @@
-import mysql.connector
+import argparse
+import json
 import os
+import sys
 from dotenv import load_dotenv
-from flask import Flask
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from sqlalchemy_utils import database_exists, create_database
-from flask_sqlalchemy import SQLAlchemy
+
+from services.migrations import migrate, check_query_plans
 
 load_dotenv()
 
 def get_database_uri():
+    if os.getenv('DATABASE_URL'):
+        return os.getenv('DATABASE_URL')
     return f"mysql+mysqlconnector://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}:{os.getenv('MYSQL_PORT')}/{os.getenv('MYSQL_DATABASE')}"
 
 def init_database():
@@ -17,33 +21,32 @@ def init_database():
         if not database_exists(uri):
             create_database(uri)
             print(f"Created database {os.getenv('MYSQL_DATABASE')}")
-        
+
         engine = create_engine(uri)
-        with engine.connect() as conn:
-            with open('schema.sql', 'r') as f:
-                queries = f.read().split(';')
-                for query in queries:
-                    if query.strip():
-                        conn.execute(text(query))
-                conn.commit()
-        
+        try:
+            applied = migrate(engine)
+        finally:
+            engine.dispose()
+        if applied:
+            print(f"Applied migrations {applied}")
+
         return uri
     except Exception as e:
         print(f"Database initialization error: {e}")
         return None
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri()
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-# Initialize extensions
-db = SQLAlchemy()
-# Initialize extensions
-db.init_app(app)
-
-with app.app_context():
-    db.create_all()
-
 if __name__ == '__main__':
-    init_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Create or migrate the database')
+    parser.add_argument('--check-plans', action='store_true',
+                        help='EXPLAIN the hot queries and exit non-zero if one no longer uses its index')
+    args = parser.parse_args()
+
+    if init_database() is None:
+        sys.exit(1)
+    if args.check_plans:
+        engine = create_engine(get_database_uri())
+        results = check_query_plans(engine)
+        engine.dispose()
+        for result in results:
+            print(json.dumps(result, default=str))
+        sys.exit(0 if all(r['uses_index'] for r in results) else 1)
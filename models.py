@@ -1,5 +1,6 @@
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -7,7 +8,21 @@ db = SQLAlchemy()
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db
+    password_hash = db.Column(db.String(200), nullable=False)
+
+    def set_password(self, password):
+        self.password_hash = generate_password_hash(password)
+
+    def check_password(self, password):
+        return check_password_hash(self.password_hash, password)
+
+class AccountGroup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    # Comma-separated strategy tags the group follows; empty or '*' follows every signal
+    strategies = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    accounts = db.relationship('MT5Account', backref='group', lazy=True)
 
 class MT5Account(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -17,6 +32,7 @@ class MT5Account(db.Model):
     name = db.Column(db.String(100))
     volume_coefficient = db.Column(db.Float, default=1.0)
     is_active = db.Column(db.Boolean, default=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('account_group.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     restricted_symbols = db.relationship('RestrictedSymbol', backref='account', lazy=True)
 
@@ -27,6 +43,8 @@ class RestrictedSymbol(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class TradeLog(db.Model):
+    __table_args__ = (db.Index('ix_trade_log_account_created', 'account_id', 'created_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, db.ForeignKey('mt5_account.id'), nullable=False)
     symbol = db.Column(db.String(20))
@@ -37,6 +55,12 @@ class TradeLog(db.Model):
     sl = db.Column(db.Float)
     tp = db.Column(db.Float)
     profit = db.Column(db.Float)
+    # Fill details for the order this row records
+    ticket = db.Column(db.BigInteger)
+    retcode = db.Column(db.Integer)
+    requested_price = db.Column(db.Float)
+    slippage = db.Column(db.Float)
+    latency_ms = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class WebhookLog(db.Model):
@@ -45,10 +69,18 @@ class WebhookLog(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Position(db.Model):
+    __table_args__ = (
+        db.Index('ix_position_status_symbol', 'status', 'symbol'),
+        db.Index('ix_position_account_id', 'account_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    account_id = db.Column(db.Integer, db.ForeignKey('mt5_account.id'), nullable=False)
+    # A signal-level position fans out to every account, so it has no single owner
+    account_id = db.Column(db.Integer, db.ForeignKey('mt5_account.id'), nullable=True)
     ticket = db.Column(db.Integer, unique=True)
     symbol = db.Column(db.String(20), nullable=False)
+    # Strategy tag of the signal that opened it; None for untagged signals
+    strategy = db.Column(db.String(50))
     type = db.Column(db.String(20))
     volume = db.Column(db.Float)
     price_open = db.Column(db.Float)
@@ -69,6 +101,8 @@ class AppSettings(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Log(db.Model):
+    __table_args__ = (db.Index('ix_log_timestamp_level', 'timestamp', 'level'),)
+
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     level = db.Column(db.String(20))
@@ -87,4 +121,19 @@ class Webhook(db.Model):
     take_profit = db.Column(db.Float)
     expiration = db.Column(db.DateTime)  # Added for pending orders
     status = db.Column(db.String(20))
-    error_message = db.Column(db.String(200))
\ No newline at end of file
+    error_message = db.Column(db.String(200))
+
+class Lease(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100))
+    expires_at = db.Column(db.DateTime)
+
+
+class DispatchRequest(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='queued')
+    worker = db.Column(db.String(100))
+    error_message = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+from services.replay_service import (
+    ReplayEngine, load_webhook_file, load_webhook_logs, load_tick_file, compare_results, to_datetime
+)
+
+load_dotenv()
+
+
+def get_database_uri():
+    return f"mysql+pymysql://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}:{os.getenv('MYSQL_PORT')}/{os.getenv('MYSQL_DATABASE')}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded webhooks and ticks through the position rules')
+    parser.add_argument('--ticks', required=True, help='CSV file with time,symbol,bid,ask')
+    parser.add_argument('--webhooks', help='JSON-lines WebhookLog export; read from the database when omitted')
+    parser.add_argument('--start', help='Only replay webhooks from this time (ISO)')
+    parser.add_argument('--end', help='Only replay webhooks before this time (ISO)')
+    parser.add_argument('--trailing', action='store_true', help='Apply trailing stops while replaying')
+    parser.add_argument('--output', help='Write the result as JSON to this file')
+    parser.add_argument('--compare', help='Previous result JSON to diff against')
+    args = parser.parse_args()
+
+    start = to_datetime(args.start) if args.start else None
+    end = to_datetime(args.end) if args.end else None
+
+    if args.webhooks:
+        webhooks = load_webhook_file(args.webhooks)
+        webhooks = [w for w in webhooks if (not start or w[0] >= start) and (not end or w[0] < end)]
+    else:
+        webhooks = load_webhook_logs(create_engine(get_database_uri()), start, end)
+    ticks = load_tick_file(args.ticks)
+
+    started = time.perf_counter()
+    result = ReplayEngine(trailing=args.trailing).run(webhooks, ticks).to_dict()
+    elapsed = time.perf_counter() - started
+
+    print(f"Replayed {result['stats']['webhooks']} webhooks and {result['stats']['ticks']} ticks in {elapsed:.2f}s")
+    print(f"Positions: {len(result['positions'])}  Events: {result['stats']['events']}")
+    print(f"Realized P&L: {result['realized_pnl']:.2f}  Unrealized P&L: {result['unrealized_pnl']:.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        diff = compare_results(baseline, result)
+        print(f"Realized P&L: {diff['realized_pnl'][0]:.2f} -> {diff['realized_pnl'][1]:.2f}")
+        for change in diff['changes']:
+            print(json.dumps(change))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+# Production entry point: a tuned gevent WSGI server with graceful drain and reload.
+#   python serve.py
+# SIGTERM stops accepting connections, lets in-flight requests and queued
+# orders finish, then exits. SIGHUP starts a replacement process on the same
+# port; once it is listening it tells this one to drain, so a reload never
+# refuses a connection or drops a webhook.
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import gevent
+from gevent import socket as gsocket
+from gevent.event import Event
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIHandler, WSGIServer
+
+try:
+    from geventwebsocket.handler import WebSocketHandler
+except ImportError:  # pragma: no cover - optional; Socket.IO falls back to long-polling
+    WebSocketHandler = WSGIHandler
+
+from app import app, drain_background_workers, init_admin_user, start_background_workers
+
+logger = logging.getLogger('serve')
+
+REPLACES_ENV = 'SERVE_REPLACES_PID'
+
+
+class ServingHandler(WebSocketHandler):
+    """Counts in-flight HTTP requests and closes keep-alive connections left idle."""
+
+    def handle(self):
+        if self.server.keepalive_timeout:
+            self.socket.settimeout(self.server.keepalive_timeout)
+        super().handle()
+
+    def handle_one_response(self):
+        if self.environ.get('HTTP_UPGRADE', '').lower() == 'websocket':
+            # Open as long as the dashboard is; not something a drain waits for
+            return super().handle_one_response()
+        self.server.in_flight += 1
+        try:
+            return super().handle_one_response()
+        finally:
+            self.server.in_flight -= 1
+
+
+class ServingServer(WSGIServer):
+    """WSGIServer with a connection cap and a drain that waits for requests, not WebSockets.
+
+    At SERVER_MAX_CONNECTIONS open connections the server stops accepting
+    and new ones wait in the kernel's listen backlog instead of being
+    refused.
+    """
+    handler_class = ServingHandler
+
+    def __init__(self, listener, application, max_connections, keepalive_timeout, **kwargs):
+        super().__init__(listener, application, spawn=Pool(max_connections), **kwargs)
+        self.keepalive_timeout = keepalive_timeout
+        self.in_flight = 0
+
+    def drain(self, timeout):
+        self.close()
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            gevent.sleep(0.1)
+        if self.in_flight:
+            logger.warning(f"Closing {self.in_flight} requests still running after {timeout:g}s")
+        self.pool.kill(block=True, timeout=1)
+
+
+def listen(host, port, backlog):
+    """Listening socket that a replacement process can bind alongside this one."""
+    sock = gsocket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def notify_systemd(**fields):
+    """sd_notify(3) without libsystemd; does nothing outside a Type=notify unit."""
+    address = os.getenv('NOTIFY_SOCKET')
+    if not address:
+        return
+    if address.startswith('@'):
+        address = '\0' + address[1:]
+    message = '\n'.join(f"{key}={value}" for key, value in fields.items()).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.sendto(message, address)
+
+
+def spawn_replacement():
+    logger.info("Reload requested; starting a replacement process")
+    subprocess.Popen([sys.executable] + sys.argv, env=dict(os.environ, **{REPLACES_ENV: str(os.getpid())}))
+
+
+def main():
+    host = os.getenv('SERVER_HOST', '0.0.0.0')
+    port = int(os.getenv('SERVER_PORT', 5001))
+    backlog = int(os.getenv('SERVER_BACKLOG', 1024))
+    max_connections = int(os.getenv('SERVER_MAX_CONNECTIONS', 1000))
+    keepalive_timeout = float(os.getenv('SERVER_KEEPALIVE_TIMEOUT', 75))
+    drain_timeout = float(os.getenv('SERVER_DRAIN_TIMEOUT', 30))
+    access_log = logging.getLogger('serve.access') if os.getenv('SERVER_ACCESS_LOG', '1') == '1' else None
+
+    with app.app_context():
+        init_admin_user()
+
+    server = ServingServer(
+        listen(host, port, backlog), app,
+        max_connections=max_connections,
+        keepalive_timeout=keepalive_timeout,
+        log=access_log
+    )
+
+    stopping = Event()
+    gevent.signal_handler(signal.SIGTERM, stopping.set)
+    gevent.signal_handler(signal.SIGINT, stopping.set)
+    if hasattr(signal, 'SIGHUP'):
+        gevent.signal_handler(signal.SIGHUP, spawn_replacement)
+
+    start_background_workers()
+    server.start()
+    logger.info(f"Serving on {host}:{port} (pid {os.getpid()}, max {max_connections} connections, backlog {backlog})")
+
+    # Systemd follows the replacement from here; the old process drains on its own
+    notify_systemd(MAINPID=os.getpid(), READY=1)
+    replaces = os.environ.pop(REPLACES_ENV, None)
+    if replaces:
+        os.kill(int(replaces), signal.SIGTERM)
+
+    stopping.wait()
+    logger.info(f"Draining pid {os.getpid()}")
+    server.drain(drain_timeout)
+    # Blocking waits run on the hub's thread pool rather than stalling the event loop
+    gevent.get_hub().threadpool.apply(drain_background_workers, (drain_timeout,))
+
+
+if __name__ == "__main__":
+    main()
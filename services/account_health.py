@@ -0,0 +1,161 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Broker answers that mean the account could not be reached, not that the order was refused
+UNREACHABLE_RETCODES = (10012, 10031)
+
+
+class AccountBreaker:
+    __slots__ = ('account_id', 'login', 'state', 'failures', 'cooldown', 'opened_at',
+                 'last_error', 'last_latency_ms', 'trips', 'skipped')
+
+    def __init__(self, account_id, login, cooldown):
+        self.account_id = account_id
+        self.login = login
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = cooldown
+        self.opened_at = None
+        self.last_error = None
+        self.last_latency_ms = None
+        self.trips = 0
+        self.skipped = 0
+
+    def to_dict(self, now):
+        return {
+            'login': self.login,
+            'state': self.state,
+            'failures': self.failures,
+            'retry_in': round(max(0.0, self.opened_at + self.cooldown - now), 1) if self.state == OPEN else None,
+            'last_error': self.last_error,
+            'last_latency_ms': self.last_latency_ms,
+            'trips': self.trips,
+            'skipped': self.skipped
+        }
+
+
+class AccountHealth:
+    """Per-account circuit breakers for the order fan-out.
+
+    ACCOUNT_BREAKER_FAILURES consecutive failures (a timeout counts at
+    once) open an account's breaker, and the fan-out skips it without
+    touching the terminal. Open breakers are not retried by live orders:
+    the probe loop logs in once the cooldown has passed, and a successful
+    probe moves the breaker to half-open so the next real order decides
+    between closed and open again. Each failed probe doubles the cooldown
+    up to ACCOUNT_BREAKER_MAX_COOLDOWN.
+    """
+
+    def __init__(self, terminal, mt5_module, threshold=None, cooldown=None, max_cooldown=None, timeout=None):
+        self.terminal = terminal
+        self.mt5 = mt5_module
+        self.threshold = threshold or int(os.getenv('ACCOUNT_BREAKER_FAILURES', 3))
+        self.cooldown = cooldown or float(os.getenv('ACCOUNT_BREAKER_COOLDOWN', 30))
+        self.max_cooldown = max_cooldown or float(os.getenv('ACCOUNT_BREAKER_MAX_COOLDOWN', 600))
+        self.timeout = timeout or float(os.getenv('ACCOUNT_ORDER_TIMEOUT', 10))
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def _breaker(self, account):
+        breaker = self._breakers.get(account.id)
+        if breaker is None:
+            breaker = self._breakers[account.id] = AccountBreaker(account.id, account.login, self.cooldown)
+        return breaker
+
+    def allow(self, account):
+        """(allowed, reason) for sending a live order to ``account``."""
+        with self._lock:
+            breaker = self._breaker(account)
+            if breaker.state != OPEN:
+                return True, None
+            breaker.skipped += 1
+            return False, f"circuit open after {breaker.failures} failures: {breaker.last_error}"
+
+    def record_success(self, account, latency_ms=None):
+        with self._lock:
+            breaker = self._breaker(account)
+            if breaker.state != CLOSED:
+                logger.info(f"Account {account.login} recovered; circuit closed")
+            breaker.state = CLOSED
+            breaker.failures = 0
+            breaker.cooldown = self.cooldown
+            breaker.opened_at = None
+            if latency_ms is not None:
+                breaker.last_latency_ms = latency_ms
+
+    def record_failure(self, account, error, timed_out=False):
+        with self._lock:
+            breaker = self._breaker(account)
+            breaker.failures += 1
+            breaker.last_error = error
+            # A half-open trial gets one chance; a hang is not worth waiting on twice
+            if breaker.state == HALF_OPEN or timed_out or breaker.failures >= self.threshold:
+                self._trip(breaker, time.monotonic())
+
+    def _trip(self, breaker, now):
+        if breaker.state != OPEN:
+            breaker.trips += 1
+            logger.warning(f"Account {breaker.login} circuit opened: {breaker.last_error}")
+        breaker.state = OPEN
+        breaker.opened_at = now
+
+    def due_probes(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [b.account_id for b in self._breakers.values()
+                    if b.state == OPEN and now - b.opened_at >= b.cooldown]
+
+    def _login(self, account):
+        mt5 = self.mt5
+        if not mt5.initialize():
+            raise Exception(f"MT5 initialization failed for account {account.login}")
+        try:
+            if not mt5.login(account.login, account.password, account.server):
+                raise Exception(f"MT5 login failed for account {account.login}")
+            if mt5.account_info() is None:
+                raise Exception(f"No account info for {account.login}: {mt5.last_error()}")
+        finally:
+            mt5.shutdown()
+
+    def probe_account(self, account):
+        try:
+            self.terminal.run_with_timeout(self.timeout, self._login, account)
+        except Exception as e:
+            with self._lock:
+                breaker = self._breaker(account)
+                breaker.last_error = f"probe: {e}"
+                breaker.cooldown = min(self.max_cooldown, breaker.cooldown * 2)
+                breaker.opened_at = time.monotonic()
+            logger.info(f"Probe failed for account {account.login}: {e}")
+            return False
+        with self._lock:
+            breaker = self._breaker(account)
+            if breaker.state == OPEN:
+                breaker.state = HALF_OPEN
+        logger.info(f"Probe succeeded for account {account.login}; circuit half-open")
+        return True
+
+    def forget(self, account_ids):
+        """Drop breakers for accounts that are gone or deactivated."""
+        keep = set(account_ids)
+        with self._lock:
+            for account_id in [a for a in self._breakers if a not in keep]:
+                del self._breakers[account_id]
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            breakers = list(self._breakers.values())
+            return {
+                'open': sum(1 for b in breakers if b.state == OPEN),
+                'half_open': sum(1 for b in breakers if b.state == HALF_OPEN),
+                'accounts': {b.account_id: b.to_dict(now) for b in breakers}
+            }
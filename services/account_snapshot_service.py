@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+
+from services.position_rules import is_buy
+from services.terminal_service import TerminalTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class AccountSnapshotService:
+    """Background snapshots of account state for pre-trade margin checks.
+
+    A refresher logs into each account on a schedule and records balance,
+    equity and free margin, plus order_calc_margin for one lot of every
+    symbol we trade. Margin is linear in volume, so that per-lot figure
+    covers any volume. The fan-out then checks an order against memory
+    instead of finding out from a failed order_send.
+
+    Each login goes through the account's breaker in ``health``, with the
+    same deadline as an order: accounts with an open breaker are skipped,
+    and a hung login trips the breaker instead of holding up the rest.
+    """
+
+    def __init__(self, terminal, mt5_module, health, interval=None, max_age=None, safety=None):
+        self.terminal = terminal
+        self.mt5 = mt5_module
+        self.health = health
+        self.interval = interval or int(os.getenv('ACCOUNT_SNAPSHOT_INTERVAL', 30))
+        self.max_age = max_age or int(os.getenv('ACCOUNT_SNAPSHOT_MAX_AGE', 120))
+        # Only skip when the shortfall is clear; quotes move between snapshot and order
+        self.safety = safety or float(os.getenv('MARGIN_SAFETY_FACTOR', 1.05))
+        self.symbol_ttl = 86400
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._margins = {}
+        self._symbols = {}
+
+    def track_symbol(self, symbol):
+        with self._lock:
+            self._symbols[symbol] = time.time()
+
+    def tracked_symbols(self):
+        cutoff = time.time() - self.symbol_ttl
+        with self._lock:
+            for symbol in [s for s, seen in self._symbols.items() if seen < cutoff]:
+                del self._symbols[symbol]
+            return list(self._symbols)
+
+    def _read_account(self, account, symbols):
+        mt5 = self.mt5
+        if not mt5.initialize():
+            raise Exception(f"MT5 initialization failed for account {account.login}")
+        if not mt5.login(account.login, account.password, account.server):
+            raise Exception(f"MT5 login failed for account {account.login}")
+        try:
+            info = mt5.account_info()
+            if info is None:
+                raise Exception(f"No account info for {account.login}: {mt5.last_error()}")
+            margins = {}
+            for symbol in symbols:
+                tick = mt5.symbol_info_tick(symbol)
+                if tick is None:
+                    continue
+                buy = mt5.order_calc_margin(mt5.ORDER_TYPE_BUY, symbol, 1.0, tick.ask)
+                sell = mt5.order_calc_margin(mt5.ORDER_TYPE_SELL, symbol, 1.0, tick.bid)
+                margins[symbol] = (buy, sell)
+            return {
+                'balance': info.balance,
+                'equity': info.equity,
+                'margin_free': info.margin_free,
+                'leverage': info.leverage,
+                'currency': info.currency
+            }, margins
+        finally:
+            mt5.shutdown()
+
+    def refresh_account(self, account, symbols=None):
+        symbols = self.tracked_symbols() if symbols is None else symbols
+        snapshot, margins = self.terminal.run_with_timeout(self.health.timeout, self._read_account, account, symbols)
+        snapshot['taken_at'] = time.time()
+        with self._lock:
+            self._snapshots[account.id] = snapshot
+            for symbol, (buy, sell) in margins.items():
+                self._margins[(account.id, symbol)] = (buy, sell)
+        return snapshot
+
+    def refresh_all(self, accounts):
+        symbols = self.tracked_symbols()
+        for account in accounts:
+            allowed, _ = self.health.allow(account)
+            if not allowed:
+                # The probe loop decides when it is back
+                continue
+            if self.terminal.stalled(self.health.timeout):
+                logger.warning("Skipping account snapshots: terminal busy with a timed-out call")
+                return
+            try:
+                self.refresh_account(account, symbols)
+            except TerminalTimeout as e:
+                logger.warning(f"Account snapshot timed out for {account.login}: {str(e)}")
+                if e.started:
+                    self.health.record_failure(account, str(e), timed_out=True)
+            except Exception as e:
+                logger.warning(f"Account snapshot failed for {account.login}: {str(e)}")
+                self.health.record_failure(account, str(e))
+            else:
+                self.health.record_success(account)
+
+    def required_margin(self, account_id, symbol, order_type, volume):
+        with self._lock:
+            per_lot = self._margins.get((account_id, symbol))
+        if per_lot is None:
+            return None
+        margin = per_lot[0] if is_buy(order_type) else per_lot[1]
+        return None if margin is None else margin * volume
+
+    def can_afford(self, account, symbol, order_type, volume):
+        """(ok, reason). Only says no when a fresh snapshot shows the order cannot fit."""
+        with self._lock:
+            snapshot = self._snapshots.get(account.id)
+        if snapshot is None or time.time() - snapshot['taken_at'] > self.max_age:
+            return True, None
+        margin = self.required_margin(account.id, symbol, order_type, volume)
+        if margin is None:
+            return True, None
+        if margin * self.safety > snapshot['margin_free']:
+            return False, f"needs {margin:.2f} margin, {snapshot['margin_free']:.2f} free"
+        return True, None
+
+    def reserve(self, account_id, symbol, order_type, volume):
+        """Charge a filled order against the snapshot until the next refresh."""
+        margin = self.required_margin(account_id, symbol, order_type, volume)
+        if margin is None:
+            return
+        with self._lock:
+            snapshot = self._snapshots.get(account_id)
+            if snapshot is not None:
+                snapshot['margin_free'] -= margin
+
+    def snapshots(self):
+        with self._lock:
+            return {account_id: dict(snapshot) for account_id, snapshot in self._snapshots.items()}
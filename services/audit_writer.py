@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models import Webhook, WebhookLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """Persists the webhook audit trail off the signal path.
+
+    Requests only enqueue a record; a background thread inserts them in
+    batches (one executemany and one commit per batch). If the queue is
+    full, records are dropped and counted rather than slowing down a signal.
+    """
+
+    def __init__(self, app, db, batch_size=None, flush_interval=None, max_queue=None):
+        self.app = app
+        self.db = db
+        self.batch_size = batch_size or int(os.getenv('AUDIT_BATCH_SIZE', 200))
+        self.flush_interval = flush_interval or float(os.getenv('AUDIT_FLUSH_INTERVAL', 0.5))
+        self._queue = queue.Queue(maxsize=max_queue or int(os.getenv('AUDIT_QUEUE_SIZE', 10000)))
+        self.written = 0
+        self.dropped = 0
+
+    def record_webhook(self, payload, signal=None, status='accepted', error=None, received_at=None):
+        received_at = received_at or datetime.utcnow()
+        signal = signal or {}
+        # Never persist the shared secret
+        if isinstance(payload, dict):
+            payload = {k: v for k, v in payload.items() if k != 'tradekey'}
+
+        try:
+            self._queue.put_nowait((
+                {
+                    'timestamp': received_at,
+                    'action': signal.get('action'),
+                    'symbol': signal.get('symbol'),
+                    'volume': signal.get('volume'),
+                    'order_type': signal.get('order_type'),
+                    'price': signal.get('price'),
+                    'stop_loss': signal.get('stop_loss'),
+                    'take_profit': signal.get('take_profit'),
+                    'expiration': signal.get('expiration'),
+                    'status': status,
+                    'error_message': error[:200] if error else None
+                },
+                # WebhookLog is the replayable signal history, so rejected requests stay out of it
+                None if status == 'rejected' else {
+                    'payload': json.dumps(payload, default=str),
+                    'created_at': received_at
+                }
+            ))
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, first=None):
+        batch = [first] if first is not None else []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                self.db.session.execute(insert(Webhook.__table__), [webhook for webhook, _ in batch])
+                logs = [log for _, log in batch if log is not None]
+                if logs:
+                    self.db.session.execute(insert(WebhookLog.__table__), logs)
+                self.db.session.commit()
+                self.written += len(batch)
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error(f"Audit write failed for {len(batch)} webhooks: {str(e)}")
+            finally:
+                self.db.session.remove()
+
+    def run(self):
+        while True:
+            first = self._queue.get()
+            self._write(self._drain(first))
+
+    def flush(self):
+        """Write everything queued so far; used on shutdown."""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'written': self.written, 'dropped': self.dropped}
@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAMES = {'1m': 60, '5m': 300, '1h': 3600}
+TERMINAL_TIMEFRAMES = {'1m': 'TIMEFRAME_M1', '5m': 'TIMEFRAME_M5', '1h': 'TIMEFRAME_H1'}
+BAR_FIELDS = ('time', 'open', 'high', 'low', 'close', 'ticks')
+
+
+class BarSeries:
+    """Bars of one symbol and timeframe, oldest first, as [time, open, high, low, close, ticks] lists."""
+
+    __slots__ = ('seconds', 'bars', 'fed_at', 'filled_at')
+
+    def __init__(self, seconds, history):
+        self.seconds = seconds
+        self.bars = deque(maxlen=history)
+        # App clock times of the last tick folded in and the last terminal backfill
+        self.fed_at = None
+        self.filled_at = None
+
+    def add(self, ts, price):
+        start = int(ts) - int(ts) % self.seconds
+        last = self.bars[-1] if self.bars else None
+        if last is not None and start < last[0]:
+            return
+        if last is not None and start == last[0]:
+            last[2] = max(last[2], price)
+            last[3] = min(last[3], price)
+            last[4] = price
+            last[5] += 1
+        else:
+            self.bars.append([start, price, price, price, price, 1])
+
+    def merge(self, rates, fetched_at):
+        """Lay terminal bars under the tick-built ones.
+
+        The terminal saw every tick of a shared bar, so its open wins; high
+        and low combine, and the close is ours only when a tick arrived
+        after the terminal was asked.
+        """
+        own = {bar[0]: bar for bar in self.bars}
+        merged = []
+        for rate in rates:
+            start = int(rate['time'])
+            bar = [start, float(rate['open']), float(rate['high']), float(rate['low']),
+                   float(rate['close']), int(rate['tick_volume'])]
+            mine = own.pop(start, None)
+            if mine is not None:
+                bar[2] = max(bar[2], mine[2])
+                bar[3] = min(bar[3], mine[3])
+                if self.fed_at is not None and self.fed_at > fetched_at and mine is self.bars[-1]:
+                    bar[4] = mine[4]
+            merged.append(bar)
+        last_start = merged[-1][0] if merged else None
+        merged.extend(bar for start, bar in sorted(own.items()) if last_start is None or start > last_start)
+        self.bars = deque(merged, maxlen=self.bars.maxlen)
+
+
+class BarCache:
+    """OHLC bars for the dashboard charts, built from ticks the price loop already fetched.
+
+    A (symbol, timeframe) series is filled from copy_rates_from the first
+    time it is asked for. After that the price loop's ticks extend it, so
+    charts are served from memory instead of a terminal call per request.
+    The price loop only watches symbols with positions; a series that
+    stops receiving ticks for longer than one bar is backfilled again on
+    its next request. At most BAR_CACHE_SERIES series are kept, least
+    recently requested evicted first, each holding the last BAR_HISTORY bars.
+    """
+
+    def __init__(self, terminal, mt5_module, max_series=None, history=None):
+        self.terminal = terminal
+        self.mt5 = mt5_module
+        self.max_series = max_series or int(os.getenv('BAR_CACHE_SERIES', 64))
+        self.history = history or int(os.getenv('BAR_HISTORY', 500))
+        self._lock = threading.Lock()
+        self._series = OrderedDict()
+        self.backfills = 0
+        self.evictions = 0
+
+    def record(self, symbol, ticks, now=None):
+        """Fold (time_msc, bid, ask) ticks into the cached series of ``symbol``; bars are on bid."""
+        with self._lock:
+            for timeframe in TIMEFRAMES:
+                series = self._series.get((symbol, timeframe))
+                if series is None:
+                    continue
+                for time_msc, bid, _ in ticks:
+                    series.add(time_msc / 1000, bid)
+                series.fed_at = now or time.time()
+
+    def _read_rates(self, symbol, timeframe):
+        # One unit on the terminal thread; the per-account calls leave the terminal shut down
+        if not self.mt5.initialize():
+            logger.error(f"MT5 initialization failed reading {symbol} rates: {self.mt5.last_error()}")
+            return None
+        # Rates are stamped in terminal server time; anchor on its latest quote rather than our clock
+        tick = self.mt5.symbol_info_tick(symbol)
+        if tick is None:
+            return None
+        return self.mt5.copy_rates_from(symbol, getattr(self.mt5, TERMINAL_TIMEFRAMES[timeframe]), tick.time, self.history)
+
+    def _backfill(self, series, symbol, timeframe, now):
+        rates = self.terminal.run(self._read_rates, symbol, timeframe)
+        with self._lock:
+            series.filled_at = now
+            self.backfills += 1
+            if rates is None or len(rates) == 0:
+                logger.warning(f"No {timeframe} rates for {symbol} from the terminal")
+                return
+            series.merge(rates, now)
+
+    def bars(self, symbol, timeframe, limit=None, now=None):
+        """The newest ``limit`` bars as dicts, oldest first."""
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe {timeframe}; use one of {', '.join(TIMEFRAMES)}")
+        now = now or time.time()
+        key = (symbol, timeframe)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = BarSeries(TIMEFRAMES[timeframe], self.history)
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._series.move_to_end(key)
+            updated = max(series.fed_at or 0, series.filled_at or 0)
+            stale = series.filled_at is None or now - updated > series.seconds
+
+        if stale:
+            self._backfill(series, symbol, timeframe, now)
+
+        with self._lock:
+            bars = list(series.bars)
+        if limit:
+            bars = bars[-limit:]
+        return [dict(zip(BAR_FIELDS, bar)) for bar in bars]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'series': len(self._series),
+                'backfills': self.backfills,
+                'evictions': self.evictions
+            }
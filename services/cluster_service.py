@@ -0,0 +1,176 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import socketio
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import Lease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """DB-backed lease so exactly one worker runs the price loop and order dispatch.
+
+    The holder renews every ttl/3 seconds. It considers itself leader only
+    until two renewal intervals have passed without a successful renewal, which
+    is before any other worker can take the expired row over.
+    """
+
+    def __init__(self, get_engine, name='primary', ttl=None):
+        self.get_engine = get_engine
+        self.name = name
+        self.ttl = ttl or int(os.getenv('LEADER_LEASE_TTL', 15))
+        self.renew_interval = self.ttl / 3
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._valid_until = 0
+        self._held_until = 0
+        self._stopped = threading.Event()
+
+    @property
+    def is_leader(self):
+        return time.monotonic() < self._valid_until
+
+    @property
+    def holds_lease(self):
+        """True until another worker could have taken the lease over.
+
+        Unlike is_leader this survives step_down(), so orders a draining
+        worker already started may finish, but only while no other worker
+        can be sending them too.
+        """
+        return time.monotonic() < self._held_until
+
+    def holder_alive(self, holder):
+        """Whether the worker with lease holder id ``holder`` may still be running.
+
+        Only processes on this host can be checked (kill(pid, 0), so POSIX
+        only); a holder elsewhere, or an earlier process with our own pid,
+        counts as gone.
+        """
+        if holder == self.holder:
+            return True
+        host, _, rest = holder.partition(':')
+        pid = rest.partition(':')[0]
+        if os.name != 'posix' or host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def renew(self):
+        started = time.monotonic()
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        table = Lease.__table__
+        engine = self.get_engine()
+
+        with engine.begin() as conn:
+            result = conn.execute(
+                update(table)
+                .where(table.c.name == self.name)
+                .where(or_(table.c.holder == self.holder, table.c.expires_at < now))
+                .values(holder=self.holder, expires_at=expires_at)
+            )
+            acquired = result.rowcount == 1
+            exists = acquired or conn.execute(select(table.c.name).where(table.c.name == self.name)).first()
+
+        if not exists:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(table).values(name=self.name, holder=self.holder, expires_at=expires_at))
+                acquired = True
+            except IntegrityError:
+                acquired = False
+
+        was_leader = self.is_leader
+        if self._stopped.is_set():
+            # step_down() ran while this renewal was in flight
+            return False
+        self._valid_until = started + self.ttl - self.renew_interval if acquired else 0
+        self._held_until = self._valid_until
+        if acquired and not was_leader:
+            logger.info(f"Acquired '{self.name}' lease as {self.holder}")
+        elif was_leader and not acquired:
+            logger.warning(f"Lost '{self.name}' lease held by {self.holder}")
+        return acquired
+
+    def step_down(self):
+        """Stop renewing and stop acting as leader, but keep the row until release().
+
+        The loops go idle straight away while no other worker can take over
+        yet, so state can be written out before the next leader loads it.
+        """
+        self._stopped.set()
+        self._valid_until = 0
+
+    def release(self):
+        self._valid_until = 0
+        self._held_until = 0
+        table = Lease.__table__
+        with self.get_engine().begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.c.name == self.name)
+                .where(table.c.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+            )
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.renew()
+            except Exception as e:
+                logger.error(f"Lease renewal error: {str(e)}")
+            self._stopped.wait(self.renew_interval)
+
+    def stop(self):
+        self._stopped.set()
+
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """In-process stand-in for a Socket.IO message queue.
+
+    Every server created with this manager in the same process receives the
+    others' events, which lets tests run several "workers" side by side.
+    """
+    name = 'local'
+    _subscribers = {}
+
+    def initialize(self):
+        if not self.write_only:
+            self._queue = self.server.eio.create_queue()
+            LocalPubSubManager._subscribers.setdefault(self.channel, []).append(self._queue)
+        super().initialize()
+
+    def _publish(self, data):
+        for queue in list(LocalPubSubManager._subscribers.get(self.channel, [])):
+            queue.put(data)
+
+    def _listen(self):
+        while True:
+            yield self._queue.get()
+
+
+def socketio_options():
+    """SocketIO kwargs for relaying events across workers.
+
+    SOCKETIO_MESSAGE_QUEUE takes a redis:// (or other Kombu) URL in production,
+    or local:// for the in-process stand-in. Unset means a single worker.
+    """
+    url = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+    if not url:
+        return {}
+    if url.startswith('local://'):
+        return {'client_manager': LocalPubSubManager(channel='flask-socketio')}
+    return {'message_queue': url}
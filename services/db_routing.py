@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import abort, g
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+
+def engine_options():
+    """Pool settings shared by the primary and replica engines.
+
+    pool_recycle stays below MySQL's wait_timeout and pre-ping replaces
+    connections the server dropped, instead of failing the next query with
+    "MySQL server has gone away".
+    """
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 280)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() != 'false',
+    }
+
+
+class ReadRouter:
+    """Sends read-only dashboard queries to a replica when one is configured.
+
+    Without MYSQL_REPLICA_URI every read falls back to the primary session,
+    so callers can use it unconditionally.
+    """
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self.engine = None
+        self._sessionmaker = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        uri = os.getenv('MYSQL_REPLICA_URI')
+        if uri:
+            self.engine = create_engine(uri, **engine_options())
+            self._sessionmaker = sessionmaker(bind=self.engine)
+            logger.info("Routing dashboard reads to the replica database")
+        app.teardown_appcontext(self._close_session)
+
+    def _close_session(self, exc=None):
+        session = g.pop('read_session', None)
+        if session is not None:
+            session.close()
+
+    @property
+    def session(self):
+        if self._sessionmaker is None:
+            return self.db.session
+        if 'read_session' not in g:
+            g.read_session = self._sessionmaker()
+        return g.read_session
+
+    def query(self, *entities):
+        return self.session.query(*entities)
+
+    def get_or_404(self, model, ident):
+        instance = self.session.get(model, ident)
+        if instance is None:
+            abort(404)
+        return instance
+
+
+class SessionMonitor:
+    """Identity-map size per background loop and how long pool connections stay checked out."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._loops = {}
+        self._held = deque(maxlen=window)
+        self.pool = None
+
+    def attach(self, engine):
+        self.pool = engine.pool
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop('checked_out_at', None) if connection_record is not None else None
+        if started is not None:
+            self._held.append(time.perf_counter() - started)
+
+    def record(self, name, size):
+        with self._lock:
+            loop = self._loops.setdefault(name, {'ticks': 0, 'last_size': 0, 'max_size': 0})
+            loop['ticks'] += 1
+            loop['last_size'] = size
+            loop['max_size'] = max(loop['max_size'], size)
+
+    def stats(self):
+        held = sorted(self._held)
+        with self._lock:
+            loops = {name: dict(loop) for name, loop in self._loops.items()}
+        return {
+            'loops': loops,
+            'checkout': {
+                'samples': len(held),
+                'p50_ms': round(held[len(held) // 2] * 1000, 3) if held else 0,
+                'p95_ms': round(held[int(len(held) * 0.95)] * 1000, 3) if held else 0,
+                'max_ms': round(held[-1] * 1000, 3) if held else 0,
+                'checked_out': self.pool.checkedout() if self.pool is not None else 0
+            }
+        }
+
+
+@contextmanager
+def loop_session(db, name, monitor=None):
+    """One tick of a background loop as its own unit of work.
+
+    Background threads keep one app context for their whole life, so
+    without this the scoped session (and every object it has loaded)
+    would live forever too. Commits on success, rolls back on error, and
+    always removes the session so the next tick starts with an empty
+    identity map and no connection held.
+    """
+    session = db.session
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        if monitor is not None:
+            monitor.record(name, len(session.identity_map))
+        db.session.remove()
@@ -0,0 +1,156 @@
+import csv
+import gzip
+import io
+import os
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Integer, select
+
+from models import Position, TradeLog
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional; exports fall back to gzip CSV
+    pa = None
+
+EXPORT_TABLES = {
+    'trades': TradeLog.__table__,
+    'positions': Position.__table__,
+}
+
+FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'csv': ('application/gzip', 'csv.gz'),
+}
+
+
+def default_format():
+    return 'parquet' if pa is not None else 'csv'
+
+
+def iter_chunks(session, table, account_id=None, start=None, end=None, chunk_size=None):
+    """Yield lists of row tuples in id order, one keyset page at a time.
+
+    Each page is a fresh ``id > last`` query, so no cursor or OFFSET stays
+    open across pages and only one page is ever held in memory. ``start``
+    is inclusive and ``end`` exclusive, both on created_at.
+    """
+    chunk_size = chunk_size or int(os.getenv('EXPORT_CHUNK_ROWS', 5000))
+    query = select(*table.columns).order_by(table.c.id).limit(chunk_size)
+    if account_id is not None:
+        query = query.where(table.c.account_id == account_id)
+    if start is not None:
+        query = query.where(table.c.created_at >= start)
+    if end is not None:
+        query = query.where(table.c.created_at < end)
+
+    last_id = 0
+    while True:
+        rows = session.execute(query.where(table.c.id > last_id)).all()
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+class DrainBuffer:
+    """Write-only file object whose contents are taken out after every chunk."""
+
+    def __init__(self):
+        self._parts = []
+        self._written = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._written += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._written
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_type(column):
+    if isinstance(column.type, (Integer, BigInteger)):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    return pa.string()
+
+
+def _encode_parquet(table, chunks):
+    schema = pa.schema([(c.name, _arrow_type(c)) for c in table.columns])
+    sink = DrainBuffer()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    for rows in chunks:
+        columns = list(zip(*rows))
+        # One row group per keyset page
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_csv(table, chunks):
+    sink = DrainBuffer()
+    compressed = gzip.GzipFile(fileobj=sink, mode='wb')
+    text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    writer.writerow([c.name for c in table.columns])
+    for rows in chunks:
+        writer.writerows([_csv_value(v) for v in row] for row in rows)
+        text.flush()
+        yield sink.drain()
+    text.close()
+    yield sink.drain()
+
+
+def _non_empty(encoded):
+    for data in encoded:
+        if data:
+            yield data
+
+
+def stream_export(session, name, fmt=None, account_id=None, start=None, end=None, chunk_size=None):
+    """Encoded bytes of one export table, produced chunk by chunk.
+
+    Arguments are checked here, before anything is queried, so a bad
+    request fails before a streaming response has started.
+    """
+    if name not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table {name}; use one of {', '.join(EXPORT_TABLES)}")
+    fmt = fmt or default_format()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt}; use one of {', '.join(FORMATS)}")
+    if fmt == 'parquet' and pa is None:
+        raise ValueError('Parquet export needs pyarrow; install it or use format=csv')
+    table = EXPORT_TABLES[name]
+    chunks = iter_chunks(session, table, account_id, start, end, chunk_size)
+    return _non_empty(_encode_parquet(table, chunks) if fmt == 'parquet' else _encode_csv(table, chunks))
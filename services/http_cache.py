@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+from sqlalchemy import event
+
+
+class TableVersions:
+    """Per-table change counters, bumped when a transaction that wrote the table commits.
+
+    Counting at commit rather than at execute means a reader that sees
+    the new version also sees the new rows. Counters are per process;
+    writes made by another worker only show up through ResponseCache's TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def attach(self, engine):
+        event.listen(engine, 'after_cursor_execute', self._on_execute)
+        event.listen(engine, 'commit', self._on_commit)
+        event.listen(engine, 'rollback', self._on_rollback)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not (context.isinsert or context.isupdate or context.isdelete) or context.compiled is None:
+            return
+        table = getattr(context.compiled.statement, 'table', None)
+        if table is not None:
+            conn.info.setdefault('written_tables', set()).add(table.name)
+
+    def _on_commit(self, conn):
+        tables = conn.info.pop('written_tables', None)
+        if tables:
+            self.bump(*tables)
+
+    def _on_rollback(self, conn):
+        conn.info.pop('written_tables', None)
+
+    def bump(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def version(self, *tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+
+class CachedBody:
+    __slots__ = ('version', 'built_at', 'etag', 'body', 'gzipped')
+
+    def __init__(self, version, built_at, etag, body):
+        self.version = version
+        self.built_at = built_at
+        self.etag = etag
+        self.body = body
+        self.gzipped = None
+
+
+class ResponseCache:
+    """Serialized JSON bodies for polled endpoints, keyed by the versions of the tables they read.
+
+    While none of those tables has committed a change (and the entry is
+    younger than API_CACHE_TTL) a request is answered without touching
+    the database: 304 when the client's If-None-Match matches, otherwise
+    the stored body. ETags are a hash of the body, so a rebuild that finds
+    the same data keeps the client's copy valid. Bodies of at least
+    API_GZIP_MIN_BYTES go out gzip-compressed to clients that accept it.
+    """
+
+    def __init__(self, versions, ttl=None, max_entries=None, gzip_min_bytes=None):
+        self.versions = versions
+        self.ttl = ttl or float(os.getenv('API_CACHE_TTL', 5))
+        self.max_entries = max_entries or int(os.getenv('API_CACHE_ENTRIES', 512))
+        self.gzip_min_bytes = gzip_min_bytes or int(os.getenv('API_GZIP_MIN_BYTES', 1024))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.not_modified = 0
+        self.builds = 0
+
+    def _entry(self, key, tables, build):
+        version = self.versions.version(*tables)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version and now - entry.built_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        body = current_app.json.response(build()).get_data()
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        with self._lock:
+            self.builds += 1
+            if entry is not None and entry.etag == etag:
+                # Same content; keep the compressed copy
+                entry.version, entry.built_at = version, now
+            else:
+                entry = CachedBody(version, now, etag, body)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, key, tables, build):
+        """Response for ``key``; ``build`` returns the JSON-able data and only runs on a miss."""
+        entry = self._entry(key, tables, build)
+        compress = len(entry.body) >= self.gzip_min_bytes and 'gzip' in request.accept_encodings
+        # Each encoding is its own representation, so it gets its own tag
+        etag = f"{entry.etag}-gz" if compress else entry.etag
+
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if request.if_none_match.contains(etag):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status=304, headers=headers)
+
+        if not compress:
+            return Response(entry.body, mimetype='application/json', headers=headers)
+        if entry.gzipped is None:
+            entry.gzipped = gzip.compress(entry.body, compresslevel=6)
+        headers['Content-Encoding'] = 'gzip'
+        return Response(entry.gzipped, mimetype='application/json', headers=headers)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'not_modified': self.not_modified,
+                'builds': self.builds
+            }
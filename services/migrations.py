@@ -0,0 +1,171 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, inspect, select, text
+
+from models import db, AccountGroup, MT5Account, Position, TradeLog, Log
+
+logger = logging.getLogger(__name__)
+
+version_metadata = MetaData()
+
+schema_version = Table(
+    'schema_version', version_metadata,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def create_tables(conn):
+    db.metadata.create_all(conn)
+
+
+def _add_columns(conn, model, names):
+    table = model.__table__
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    preparer = conn.dialect.identifier_preparer
+    for name in names:
+        if name in existing:
+            continue
+        conn.execute(text(
+            f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN "
+            f"{preparer.quote(name)} {table.c[name].type.compile(dialect=conn.dialect)}"
+        ))
+
+
+def trade_log_fill_columns(conn):
+    _add_columns(conn, TradeLog, ('ticket', 'retcode', 'requested_price', 'slippage', 'latency_ms'))
+
+
+def position_account_nullable(conn):
+    inspector = inspect(conn)
+    account_id = next(c for c in inspector.get_columns('position') if c['name'] == 'account_id')
+    if account_id['nullable']:
+        return
+    preparer = conn.dialect.identifier_preparer
+    if conn.dialect.name == 'mysql':
+        conn.execute(text(f"ALTER TABLE {preparer.quote('position')} MODIFY account_id INTEGER NULL"))
+    elif conn.dialect.name == 'sqlite':
+        # SQLite cannot alter a column; rebuild the table from the model and copy the rows across
+        columns = [c['name'] for c in inspector.get_columns('position') if c['name'] in Position.__table__.c]
+        for index in inspector.get_indexes('position'):
+            conn.execute(text(f"DROP INDEX {preparer.quote(index['name'])}"))
+        conn.execute(text('ALTER TABLE position RENAME TO _position_old'))
+        Position.__table__.create(conn)
+        names = ', '.join(preparer.quote(c) for c in columns)
+        conn.execute(text(f"INSERT INTO position ({names}) SELECT {names} FROM _position_old"))
+        conn.execute(text('DROP TABLE _position_old'))
+    else:
+        logger.warning(f"Cannot relax position.account_id on {conn.dialect.name}; change it by hand")
+
+
+# Declared on the models too, so create_all builds them on a fresh database
+HOT_INDEXES = (
+    ('ix_position_status_symbol', Position.__table__, ('status', 'symbol')),
+    ('ix_position_account_id', Position.__table__, ('account_id',)),
+    ('ix_trade_log_account_created', TradeLog.__table__, ('account_id', 'created_at')),
+    ('ix_log_timestamp_level', Log.__table__, ('timestamp', 'level')),
+)
+
+
+def hot_query_indexes(conn):
+    inspector = inspect(conn)
+    for name, table, columns in HOT_INDEXES:
+        # Matched by name: MySQL drops the implicit foreign key index once ours covers the column
+        if name not in {index['name'] for index in inspector.get_indexes(table.name)}:
+            Index(name, *(table.c[c] for c in columns)).create(conn)
+
+
+def account_groups(conn):
+    AccountGroup.__table__.create(conn, checkfirst=True)
+    # Added without a foreign key constraint; SQLite cannot add one to an existing table
+    _add_columns(conn, MT5Account, ('group_id',))
+    _add_columns(conn, Position, ('strategy',))
+
+
+MIGRATIONS = (
+    (1, 'create_tables', create_tables),
+    (2, 'trade_log_fill_columns', trade_log_fill_columns),
+    (3, 'position_account_nullable', position_account_nullable),
+    (4, 'hot_query_indexes', hot_query_indexes),
+    (5, 'account_groups', account_groups),
+)
+
+
+def current_version(conn):
+    version_metadata.create_all(conn)
+    return conn.execute(select(schema_version.c.version).order_by(schema_version.c.version.desc())).scalar() or 0
+
+
+def migrate(engine):
+    """Apply every migration newer than the recorded version; returns the versions applied.
+
+    Each step checks what is already there before changing anything, so a
+    database created by create_all, or a second worker racing this one, is
+    safe to migrate.
+    """
+    with engine.begin() as conn:
+        version = current_version(conn)
+    applied = []
+    for number, name, step in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            if conn.execute(select(schema_version.c.version).where(schema_version.c.version == number)).first() is None:
+                conn.execute(schema_version.insert().values(version=number, name=name, applied_at=datetime.utcnow()))
+        logger.info(f"Applied migration {number} {name}")
+        applied.append(number)
+    return applied
+
+
+def hot_queries():
+    """The queries the loops and dashboard run most, with the index each should use."""
+    day_start = datetime.utcnow() - timedelta(days=1)
+    return (
+        ('active_positions', 'ix_position_status_symbol',
+         select(Position).where(Position.status.in_(('Open', 'Pending')))),
+        ('pending_for_symbol', 'ix_position_status_symbol',
+         select(Position).where(Position.status == 'Pending', Position.symbol == 'EURUSD')),
+        ('closed_today', 'ix_position_status_symbol',
+         select(Position.id).where(Position.status == 'Closed', Position.closed_at >= day_start)),
+        ('account_positions', 'ix_position_account_id',
+         select(Position).where(Position.account_id == 1)),
+        ('account_trades', 'ix_trade_log_account_created',
+         select(TradeLog).where(TradeLog.account_id == 1).order_by(TradeLog.created_at.desc()).limit(100)),
+        ('errors_today', 'ix_log_timestamp_level',
+         select(Log.id).where(Log.timestamp >= day_start, Log.level == 'ERROR')),
+    )
+
+
+def explain(conn, statement):
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    return [dict(row._mapping) for row in conn.exec_driver_sql(prefix + compiled.string, params)]
+
+
+def _uses_index(dialect, plan, index):
+    if dialect == 'sqlite':
+        return any(index in row['detail'] for row in plan)
+    # MySQL may still scan a near-empty table, so it is enough that the index is a candidate
+    return any(index in (row.get('possible_keys') or '').split(',') or row.get('key') == index for row in plan)
+
+
+def check_query_plans(engine):
+    """EXPLAIN each hot query; a result with ``uses_index`` False is a regression."""
+    results = []
+    with engine.connect() as conn:
+        for name, index, statement in hot_queries():
+            plan = explain(conn, statement)
+            results.append({
+                'query': name,
+                'index': index,
+                'uses_index': _uses_index(conn.dialect.name, plan, index),
+                'plan': plan
+            })
+    return results
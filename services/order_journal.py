@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Never written to disk: the journal outlives the request and is copied on every compaction
+CREDENTIAL_KEYS = frozenset(('password', 'tradekey'))
+
+
+def _redact(signal):
+    if not isinstance(signal, dict):
+        return signal
+    return {k: v for k, v in signal.items() if k not in CREDENTIAL_KEYS}
+
+
+class OrderJournal:
+    """Append-only record of order fan-outs, written before and after each order_send.
+
+    Every line is a JSON event:
+      intent   - a signal is about to be sent to a list of accounts
+      sending  - order_send is about to be called for one account
+      result   - order_send returned (ok or failed) for one account
+      claim    - another worker took an unfinished fan-out over to recover it
+      release  - the worker running a fan-out stopped before finishing it
+      complete - the fan-out finished; nothing left to recover
+
+    After a crash only intents without a 'complete' event need attention,
+    so recovery work is proportional to what was in flight. Each open
+    fan-out names the ``holder`` running it (None once released), so a
+    worker recovering the file can leave alone what another live worker
+    is still sending.
+    """
+
+    def __init__(self, path=None, fsync=None, holder=None):
+        self.path = path or os.getenv('ORDER_JOURNAL_PATH', os.path.join('instance', 'order_journal.log'))
+        if fsync is None:
+            fsync = os.getenv('ORDER_JOURNAL_FSYNC', 'true').lower() != 'false'
+        self.fsync = fsync
+        self.holder = holder
+        self.compact_after = int(os.getenv('ORDER_JOURNAL_COMPACT_AFTER', 1000))
+        self._lock = threading.Lock()
+        self._open = {}
+        self._completed_since_compact = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+        self._open_fd()
+
+    def _open_fd(self):
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self._inode = os.fstat(self._fd).st_ino
+
+    def _replaced(self):
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            intact = data.rfind(b'\n') + 1
+            if intact < len(data):
+                # A torn final line from a crash mid-write; everything before it is intact
+                logger.warning("Truncating partial order journal line")
+                f.truncate(intact)
+
+        for line in data[:intact].splitlines():
+            self._apply(json.loads(line))
+
+    def _apply(self, event):
+        kind = event['type']
+        if kind == 'intent':
+            self._open[event['id']] = {
+                'id': event['id'],
+                'position_id': event['position_id'],
+                # Also scrubs entries written before credentials were stripped, on the next compaction
+                'signal': _redact(event.get('signal')),
+                'accounts': event['accounts'],
+                'holder': event.get('holder'),
+                'created_at': event['ts'],
+                'outcomes': {}
+            }
+            return
+
+        entry = self._open.get(event['id'])
+        if entry is None:
+            return
+        if kind == 'sending':
+            entry['outcomes'][int(event['account_id'])] = {'state': 'sending'}
+        elif kind == 'result':
+            entry['outcomes'][int(event['account_id'])] = {
+                'state': 'done' if event['ok'] else 'failed',
+                'ticket': event.get('ticket'),
+                'retcode': event.get('retcode'),
+                'error': event.get('error')
+            }
+        elif kind == 'claim':
+            entry['holder'] = event['holder']
+        elif kind == 'release':
+            entry['holder'] = None
+        elif kind == 'complete':
+            del self._open[event['id']]
+
+    def _write(self, event):
+        event['ts'] = time.time()
+        line = (json.dumps(event, default=str) + '\n').encode()
+        with self._lock:
+            if self._replaced():
+                # Another worker compacted the file; appending to the old one would lose the event
+                os.close(self._fd)
+                self._open_fd()
+            os.write(self._fd, line)
+            if self.fsync:
+                os.fsync(self._fd)
+            self._apply(event)
+
+    def begin(self, position_id, account_ids, signal=None):
+        journal_id = uuid.uuid4().hex
+        self._write({
+            'type': 'intent',
+            'id': journal_id,
+            'position_id': position_id,
+            'accounts': list(account_ids),
+            'holder': self.holder,
+            'signal': _redact(signal)
+        })
+        return journal_id
+
+    def claim(self, journal_id):
+        """Take over an unfinished fan-out, e.g. to recover it after its holder died."""
+        self._write({'type': 'claim', 'id': journal_id, 'holder': self.holder})
+
+    def release(self, journal_id):
+        """Hand an unfinished fan-out back for the next leader to recover."""
+        self._write({'type': 'release', 'id': journal_id})
+
+    def sending(self, journal_id, account_id):
+        self._write({'type': 'sending', 'id': journal_id, 'account_id': account_id})
+
+    def result(self, journal_id, account_id, ok, ticket=None, retcode=None, error=None):
+        self._write({
+            'type': 'result',
+            'id': journal_id,
+            'account_id': account_id,
+            'ok': ok,
+            'ticket': ticket,
+            'retcode': retcode,
+            'error': error
+        })
+
+    def complete(self, journal_id, note=None, compact=True):
+        """Pass compact=False from a worker that may no longer be the only writer."""
+        self._write({'type': 'complete', 'id': journal_id, 'note': note})
+        self._completed_since_compact += 1
+        if compact and self._completed_since_compact >= self.compact_after:
+            self.compact()
+
+    def unfinished(self):
+        with self._lock:
+            return [dict(entry, outcomes=dict(entry['outcomes'])) for entry in self._open.values()]
+
+    def compact(self):
+        """Rewrite the journal keeping only unfinished fan-outs.
+
+        The file is re-read first so events other workers appended are kept.
+        Skipped, returning False, while another worker still holds an open
+        fan-out: it would go on appending to the replaced file.
+        """
+        with self._lock:
+            self._open = {}
+            self._load()
+            busy = [entry['id'] for entry in self._open.values() if entry['holder'] not in (None, self.holder)]
+            if busy:
+                logger.info(f"Not compacting the order journal; {len(busy)} fan-outs are held by other workers")
+                return False
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                for entry in self._open.values():
+                    f.write(json.dumps({
+                        'type': 'intent',
+                        'id': entry['id'],
+                        'position_id': entry['position_id'],
+                        'accounts': entry['accounts'],
+                        'holder': entry['holder'],
+                        'signal': entry['signal'],
+                        'ts': entry['created_at']
+                    }, default=str) + '\n')
+                    for account_id, outcome in entry['outcomes'].items():
+                        if outcome['state'] == 'sending':
+                            event = {'type': 'sending', 'id': entry['id'], 'account_id': account_id}
+                        else:
+                            event = {
+                                'type': 'result',
+                                'id': entry['id'],
+                                'account_id': account_id,
+                                'ok': outcome['state'] == 'done',
+                                'ticket': outcome['ticket'],
+                                'retcode': outcome['retcode'],
+                                'error': outcome['error']
+                            }
+                        f.write(json.dumps(event, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            os.close(self._fd)
+            self._open_fd()
+            self._completed_since_compact = 0
+            return True
+
+    def reload(self):
+        """Re-read the file, picking up entries another worker wrote."""
+        with self._lock:
+            os.close(self._fd)
+            self._open = {}
+            self._load()
+            self._open_fd()
+
+    def close(self):
+        os.close(self._fd)
@@ -0,0 +1,189 @@
+import threading
+import time
+
+from sqlalchemy import bindparam, or_, update
+
+from models import Position
+
+ACTIVE_STATUSES = ('Open', 'Pending')
+# Columns the price loop changes; everything else is fixed once the row exists
+WRITE_FIELDS = ('status', 'price_close', 'sl', 'tp', 'profit', 'closed_at')
+
+
+class LivePosition:
+    __slots__ = (
+        'id', 'account_id', 'ticket', 'symbol', 'strategy', 'type', 'volume', 'price_open',
+        'price_close', 'sl', 'tp', 'profit', 'status', 'created_at', 'closed_at'
+    )
+
+    def __init__(self, source):
+        for name in self.__slots__:
+            setattr(self, name, getattr(source, name, None))
+
+    def copy_from(self, source):
+        for name in self.__slots__:
+            setattr(self, name, getattr(source, name, None))
+
+    def differs_from(self, source):
+        return any(getattr(self, name) != getattr(source, name, None) for name in self.__slots__)
+
+    def to_mapping(self):
+        mapping = {name: getattr(self, name) for name in WRITE_FIELDS}
+        mapping['b_id'] = self.id
+        return mapping
+
+
+class PositionBook:
+    """Authoritative in-memory view of Open/Pending positions for the price loop.
+
+    Loaded once when this worker becomes leader, kept current by the
+    webhook and order paths through upsert(), and persisted write-behind:
+    the loop mutates records under ``lock`` and marks them dirty, and
+    flush() writes all dirty rows with one executemany. Writes only touch
+    rows that are still active in the database, so a close made elsewhere
+    is never overwritten.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._by_id = {}
+        self._by_ticket = {}
+        self._by_symbol = {}
+        self._dirty = set()
+        self._changes = set()
+        self._touched = {}
+        self.loaded = False
+
+    def _index(self, record):
+        self._by_id[record.id] = record
+        if record.ticket is not None:
+            self._by_ticket[record.ticket] = record
+        self._by_symbol.setdefault(record.symbol, {})[record.id] = record
+
+    def _unindex(self, record):
+        self._by_id.pop(record.id, None)
+        if record.ticket is not None and self._by_ticket.get(record.ticket) is record:
+            del self._by_ticket[record.ticket]
+        symbol_positions = self._by_symbol.get(record.symbol)
+        if symbol_positions is not None:
+            symbol_positions.pop(record.id, None)
+            if not symbol_positions:
+                del self._by_symbol[record.symbol]
+
+    def load(self, session):
+        rows = session.query(Position).filter(Position.status.in_(ACTIVE_STATUSES)).all()
+        with self.lock:
+            self._changes.update(self._by_id)
+            self._by_id, self._by_ticket, self._by_symbol = {}, {}, {}
+            self._dirty.clear()
+            self._touched = {}
+            for row in rows:
+                self._index(LivePosition(row))
+            self._changes.update(self._by_id)
+            self.loaded = True
+        return len(rows)
+
+    def reconcile(self, session):
+        """Fold in changes other workers made directly in the database."""
+        started = time.monotonic()
+        rows = {row.id: row for row in session.query(Position).filter(Position.status.in_(ACTIVE_STATUSES))}
+        with self.lock:
+            # Upserts that landed after the SELECT are newer than its rows
+            recent = {key for key, touched in self._touched.items() if touched >= started}
+            self._touched = {key: self._touched[key] for key in recent}
+            for key, record in list(self._by_id.items()):
+                if key in self._dirty or key in recent:
+                    continue
+                row = rows.get(key)
+                if row is None:
+                    self._unindex(record)
+                    self._changes.add(key)
+                elif record.differs_from(row):
+                    self._unindex(record)
+                    record.copy_from(row)
+                    self._index(record)
+                    self._changes.add(key)
+            for key, row in rows.items():
+                if key not in self._by_id and key not in recent:
+                    self._index(LivePosition(row))
+                    self._changes.add(key)
+
+    def upsert(self, position):
+        """Apply a committed ORM change made by the webhook or order paths."""
+        if not self.loaded:
+            # Only the leader's book is in use; load() picks everything up later
+            return
+        with self.lock:
+            record = self._by_id.get(position.id)
+            if record is not None:
+                self._unindex(record)
+            self._dirty.discard(position.id)
+            self._touched[position.id] = time.monotonic()
+            if position.status in ACTIVE_STATUSES:
+                if record is None:
+                    record = LivePosition(position)
+                else:
+                    record.copy_from(position)
+                self._index(record)
+            self._changes.add(position.id)
+
+    def mark_dirty(self, record):
+        # Callers hold self.lock while mutating the record
+        self._dirty.add(record.id)
+
+    def drain_changes(self):
+        with self.lock:
+            changes, self._changes = self._changes, set()
+            return changes
+
+    def get(self, key):
+        return self._by_id.get(key)
+
+    def by_ticket(self, ticket):
+        return self._by_ticket.get(ticket)
+
+    def for_symbol(self, symbol):
+        with self.lock:
+            return list(self._by_symbol.get(symbol, {}).values())
+
+    def symbols(self):
+        with self.lock:
+            return list(self._by_symbol)
+
+    def active(self):
+        with self.lock:
+            return list(self._by_id.values())
+
+    def flush(self, session):
+        with self.lock:
+            keys = [k for k in self._dirty if k in self._by_id]
+            mappings = [self._by_id[k].to_mapping() for k in keys]
+            self._dirty.clear()
+        if not mappings:
+            return 0
+
+        table = Position.__table__
+        statement = update(table) \
+            .where(table.c.id == bindparam('b_id')) \
+            .where(or_(*(table.c.status == status for status in ACTIVE_STATUSES))) \
+            .values({name: bindparam(name) for name in WRITE_FIELDS})
+        try:
+            session.execute(statement, mappings)
+            session.commit()
+        except Exception:
+            session.rollback()
+            with self.lock:
+                self._dirty.update(keys)
+            raise
+
+        # Closed/cancelled records are persisted now and can leave the book
+        with self.lock:
+            for key in keys:
+                record = self._by_id.get(key)
+                if record is not None and key not in self._dirty and record.status not in ACTIVE_STATUSES:
+                    self._unindex(record)
+        return len(mappings)
+
+    def stats(self):
+        with self.lock:
+            return {'positions': len(self._by_id), 'symbols': len(self._by_symbol), 'dirty': len(self._dirty)}
@@ -0,0 +1,108 @@
+from datetime import datetime
+
+# Profit is reported in account currency for standard FX lots
+CONTRACT_SIZE = 100000
+
+# Filled on send; every other order type rests until its level is reached
+MARKET_TYPES = ('buy', 'sell')
+
+ACTIVATION_RULES = {
+    'buy limit': lambda price, level: price <= level,
+    'sell limit': lambda price, level: price >= level,
+    'buy stop': lambda price, level: price >= level,
+    'sell stop': lambda price, level: price <= level,
+}
+
+
+def is_buy(order_type):
+    return (order_type or '').lower().startswith('buy')
+
+
+def quote_price(order_type, bid, ask):
+    # Buy positions are valued on the bid, sell positions on the ask
+    return bid if is_buy(order_type) else ask
+
+
+def initial_status(order_type):
+    """Status of a position created from a signal."""
+    return 'Open' if (order_type or '').lower() in MARKET_TYPES else 'Pending'
+
+
+def replaces_pending(position, symbol, strategy):
+    """Whether a new signal for ``symbol`` from ``strategy`` cancels ``position``.
+
+    Only orders of the same strategy that are still waiting are replaced.
+    """
+    return position.status == 'Pending' and position.symbol == symbol and position.strategy == strategy
+
+
+def should_activate(position, price):
+    rule = ACTIVATION_RULES.get((position.type or '').lower())
+    return rule is not None and rule(price, position.price_open)
+
+
+def exit_reason(position, price):
+    if is_buy(position.type):
+        if position.sl and price <= position.sl:
+            return 'Stop Loss'
+        if position.tp and price >= position.tp:
+            return 'Take Profit'
+    else:
+        if position.sl and price >= position.sl:
+            return 'Stop Loss'
+        if position.tp and price <= position.tp:
+            return 'Take Profit'
+    return None
+
+
+def calculate_profit(position, price):
+    if is_buy(position.type):
+        return (price - position.price_open) * position.volume * CONTRACT_SIZE
+    return (position.price_open - price) * position.volume * CONTRACT_SIZE
+
+
+def calculate_trailing_stop(current_price, open_price, current_sl, direction, trail_points=100):
+    if direction == 'buy':
+        potential_sl = current_price - trail_points
+        return max(potential_sl, current_sl)
+    else:
+        potential_sl = current_price + trail_points
+        return min(potential_sl, current_sl)
+
+
+def close_position(position, price, closed_at=None):
+    position.status = 'Closed'
+    position.price_close = price
+    position.profit = calculate_profit(position, price)
+    position.closed_at = closed_at or datetime.utcnow()
+
+
+def evaluate_tick(position, bid, ask, trailing=False, closed_at=None):
+    """Apply one quote to a Pending/Open position.
+
+    Returns the event that happened ('activated', 'Stop Loss',
+    'Take Profit', 'trailed') or None, mutating the position in place.
+    Shared by the live price loop and the replay harness.
+    """
+    price = quote_price(position.type, bid, ask)
+
+    if position.status == 'Pending':
+        if should_activate(position, price):
+            position.status = 'Open'
+            return 'activated'
+    elif position.status == 'Open':
+        reason = exit_reason(position, price)
+        if reason:
+            close_position(position, price, closed_at)
+            return reason
+        if trailing and position.sl:
+            new_sl = calculate_trailing_stop(
+                price,
+                position.price_open,
+                position.sl,
+                'buy' if is_buy(position.type) else 'sell'
+            )
+            if new_sl != position.sl:
+                position.sl = new_sl
+                return 'trailed'
+    return None
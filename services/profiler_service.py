@@ -0,0 +1,262 @@
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from werkzeug.exceptions import HTTPException
+
+
+class CallTimer:
+    """Times calls to selected functions by swapping in wrappers.
+
+    Wrappers exist only while a capture runs; uninstall() puts the original
+    attributes back, so nothing is measured (or slowed down) otherwise.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._patched = []
+        self.timings = {}
+
+    def _wrap(self, label, fn):
+        timings, lock = self.timings, self._lock
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with lock:
+                    entry = timings.setdefault(label, [0, 0.0, 0.0])
+                    entry[0] += 1
+                    entry[1] += elapsed
+                    entry[2] = max(entry[2], elapsed)
+        return timed
+
+    def patch(self, owner, name, label):
+        had_own = name in vars(owner)
+        original = getattr(owner, name)
+        setattr(owner, name, self._wrap(label, original))
+        self._patched.append((owner, name, original, had_own))
+
+    def patch_module(self, module, prefix):
+        for name in dir(module):
+            attr = getattr(module, name)
+            if name.startswith('_') or inspect.isclass(attr) or not callable(attr):
+                continue
+            self.patch(module, name, f"{prefix}.{name}")
+
+    def uninstall(self):
+        for owner, name, original, had_own in reversed(self._patched):
+            if had_own:
+                setattr(owner, name, original)
+            else:
+                delattr(owner, name)
+        self._patched = []
+
+    def report(self):
+        with self._lock:
+            return {
+                label: {
+                    'calls': count,
+                    'total_ms': round(total * 1000, 3),
+                    'avg_ms': round(total / count * 1000, 3),
+                    'max_ms': round(worst * 1000, 3)
+                }
+                for label, (count, total, worst) in sorted(self.timings.items(), key=lambda item: -item[1][1])
+            }
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse(frame):
+    """Root-first 'file:function;...' stack, the collapsed format flame graph tools read."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class Capture:
+    def __init__(self, target, mode, seconds):
+        self.target = target
+        self.mode = mode
+        self.seconds = seconds
+        self.started_at = time.time()
+        self.stacks = Counter()
+        self.samples = 0
+        self.timer = CallTimer()
+        self.profile = None
+        self.view = None
+        self.original_view = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+
+class ProfilerService:
+    """Admin-triggered profiling of the price loop or a single route.
+
+    ``sample`` mode polls the target's stack from a separate native thread
+    (the price loop thread, or the request thread filtered to frames that
+    are inside the route's view function) and aggregates collapsed stacks.
+    ``cprofile`` mode, for routes only, wraps the view function in a
+    cProfile for the duration. Both time every ``mt5.*`` call and
+    ``db.session.commit``. All hooks are installed on start() and removed
+    on stop(); nothing runs when no capture is active.
+    """
+
+    def __init__(self, app, session, mt5_module, interval=None, max_seconds=None):
+        self.app = app
+        self.session = session
+        self.mt5 = mt5_module
+        self.interval = interval or float(os.getenv('PROFILER_SAMPLE_INTERVAL', 0.005))
+        self.max_seconds = max_seconds or int(os.getenv('PROFILER_MAX_SECONDS', 60))
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._active = None
+
+    def register_thread(self, name):
+        """Called from a long-running thread so it can be targeted by name."""
+        self._threads[name] = threading.get_ident()
+
+    def targets(self):
+        return sorted(self._threads)
+
+    def _resolve_view(self, path):
+        adapter = self.app.url_map.bind('localhost')
+        for method in ('GET', 'POST'):
+            try:
+                endpoint, _ = adapter.match(path, method=method)
+                return endpoint
+            except HTTPException:
+                continue
+        raise ValueError(f"No route matches {path}")
+
+    def start(self, target, seconds, mode='sample'):
+        if mode not in ('sample', 'cprofile'):
+            raise ValueError(f"Unknown profiling mode {mode}")
+        seconds = max(1, min(int(seconds), self.max_seconds))
+        with self._lock:
+            if self._active is not None:
+                raise RuntimeError('A profiling capture is already running')
+            capture = self._active = Capture(target, mode, seconds)
+
+        try:
+            if target in self._threads:
+                if mode != 'sample':
+                    raise ValueError('Threads can only be profiled in sample mode')
+                thread_ident, code = self._threads[target], None
+            elif target.startswith('/'):
+                capture.view = self._resolve_view(target)
+                view = self.app.view_functions[capture.view]
+                thread_ident, code = threading.main_thread().ident, inspect.unwrap(view).__code__
+                if mode == 'cprofile':
+                    self._wrap_view(capture, view)
+            else:
+                raise ValueError(f"Unknown profiling target {target}")
+
+            capture.timer.patch_module(self.mt5, 'mt5')
+            capture.timer.patch(self.session, 'commit', 'db.session.commit')
+            if mode == 'sample':
+                capture._sampler = threading.Thread(
+                    target=self._sample, args=(capture, thread_ident, code), daemon=True
+                )
+                capture._sampler.start()
+        except Exception:
+            self._teardown(capture)
+            raise
+        return capture
+
+    def _wrap_view(self, capture, view):
+        capture.profile = cProfile.Profile()
+        depth = [0]
+
+        @functools.wraps(view)
+        def profiled(*args, **kwargs):
+            # Greenlets share the thread, so overlapping requests share one profile
+            depth[0] += 1
+            if depth[0] == 1:
+                capture.profile.enable()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+                if depth[0] == 0:
+                    capture.profile.disable()
+
+        capture.original_view = view
+        self.app.view_functions[capture.view] = profiled
+
+    def _sample(self, capture, thread_ident, code):
+        deadline = time.monotonic() + capture.seconds
+        while not capture._stop.is_set() and time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_ident)
+            if frame is not None:
+                if code is None:
+                    capture.stacks[collapse(frame)] += 1
+                else:
+                    # Keep only the part of the stack below the route's view function
+                    inner = frame
+                    while inner is not None and inner.f_code is not code:
+                        inner = inner.f_back
+                    if inner is not None:
+                        labels = []
+                        walk = frame
+                        while walk is not inner.f_back:
+                            labels.append(frame_label(walk))
+                            walk = walk.f_back
+                        capture.stacks[';'.join(reversed(labels))] += 1
+                capture.samples += 1
+            del frame
+            time.sleep(self.interval)
+
+    def _teardown(self, capture):
+        capture._stop.set()
+        if capture._sampler is not None:
+            capture._sampler.join()
+        capture.timer.uninstall()
+        if capture.original_view is not None:
+            self.app.view_functions[capture.view] = capture.original_view
+        with self._lock:
+            if self._active is capture:
+                self._active = None
+
+    def stop(self, capture, top=50):
+        self._teardown(capture)
+        report = {
+            'target': capture.target,
+            'mode': capture.mode,
+            'seconds': round(time.time() - capture.started_at, 3),
+            'calls': capture.timer.report()
+        }
+        if capture.mode == 'sample':
+            report['samples'] = capture.samples
+            report['stacks'] = [
+                {'stack': stack, 'count': count} for stack, count in capture.stacks.most_common(top)
+            ]
+            report['collapsed'] = '\n'.join(f"{stack} {count}" for stack, count in capture.stacks.most_common())
+        else:
+            out = io.StringIO()
+            try:
+                pstats.Stats(capture.profile, stream=out).sort_stats('cumulative').print_stats(top)
+            except TypeError:
+                # No request hit the route during the capture
+                pass
+            report['profile'] = out.getvalue()
+        return report
+
+    @property
+    def active(self):
+        return self._active
@@ -0,0 +1,239 @@
+import csv
+import heapq
+import json
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from models import WebhookLog
+from services.position_rules import quote_price, evaluate_tick, calculate_profit, initial_status, replaces_pending
+from services.webhook_validator import validate_signal
+
+logger = logging.getLogger(__name__)
+
+# Event ordering when a webhook and a tick share a timestamp: the signal
+# is handled first, as it would be when it lands between two polls.
+WEBHOOK_EVENT = 0
+TICK_EVENT = 1
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+    value = str(value).strip()
+    try:
+        return to_datetime(float(value))
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+class SimulatedClock:
+    def __init__(self, start=None):
+        self.now = start
+
+    def advance_to(self, moment):
+        if self.now is None or moment > self.now:
+            self.now = moment
+        return self.now
+
+
+class ReplayPosition:
+    def __init__(self, id, signal, created_at):
+        self.id = id
+        self.symbol = signal['symbol']
+        self.strategy = signal.get('strategy')
+        self.type = signal['order_type']
+        self.volume = signal['volume']
+        self.price_open = signal['price']
+        self.price_close = None
+        self.sl = signal['stop_loss']
+        self.tp = signal['take_profit']
+        self.profit = None
+        self.status = initial_status(self.type)
+        self.created_at = created_at
+        self.opened_at = created_at if self.status == 'Open' else None
+        self.closed_at = None
+        self.close_reason = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'symbol': self.symbol,
+            'strategy': self.strategy,
+            'type': self.type,
+            'volume': self.volume,
+            'price_open': self.price_open,
+            'price_close': self.price_close,
+            'sl': self.sl,
+            'tp': self.tp,
+            'profit': self.profit,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'opened_at': self.opened_at.isoformat() if self.opened_at else None,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None,
+            'close_reason': self.close_reason
+        }
+
+
+class ReplayResult:
+    def __init__(self, positions, last_quotes, stats):
+        self.positions = positions
+        self.last_quotes = last_quotes
+        self.stats = stats
+
+    @property
+    def realized_pnl(self):
+        return sum(p.profit or 0 for p in self.positions if p.status == 'Closed')
+
+    @property
+    def unrealized_pnl(self):
+        total = 0
+        for p in self.positions:
+            quote = self.last_quotes.get(p.symbol)
+            if p.status == 'Open' and quote:
+                total += calculate_profit(p, quote_price(p.type, *quote))
+        return total
+
+    def to_dict(self):
+        return {
+            'stats': self.stats,
+            'realized_pnl': self.realized_pnl,
+            'unrealized_pnl': self.unrealized_pnl,
+            'positions': [p.to_dict() for p in self.positions]
+        }
+
+
+class ReplayEngine:
+    """Feed recorded webhooks and ticks through the live decision rules.
+
+    Time comes from the recorded events, so a full day replays as fast as
+    the rules can be evaluated.
+    """
+
+    def __init__(self, trailing=False):
+        self.trailing = trailing
+
+    def run(self, webhooks, ticks):
+        clock = SimulatedClock()
+        positions = []
+        live = {}
+        last_quotes = {}
+        stats = {'webhooks': 0, 'rejected': 0, 'ticks': 0, 'events': {}}
+
+        webhook_events = ((t, WEBHOOK_EVENT, i, payload) for i, (t, payload) in enumerate(webhooks))
+        tick_events = ((t, TICK_EVENT, i, (symbol, bid, ask)) for i, (t, symbol, bid, ask) in enumerate(ticks))
+
+        for moment, kind, _, data in heapq.merge(webhook_events, tick_events):
+            now = clock.advance_to(moment)
+
+            if kind == WEBHOOK_EVENT:
+                stats['webhooks'] += 1
+                try:
+                    signal = validate_signal(data)
+                except ValueError as e:
+                    stats['rejected'] += 1
+                    logger.warning(f"Replay skipped invalid payload at {now}: {e}")
+                    continue
+
+                # Mirror handle_position_request: a new signal cancels its strategy's pending orders on the symbol
+                active = live.get(signal['symbol'], [])
+                for pos in active:
+                    if replaces_pending(pos, signal['symbol'], signal.get('strategy')):
+                        pos.status = 'Cancelled'
+                        pos.closed_at = now
+                live[signal['symbol']] = [p for p in active if p.status != 'Cancelled']
+
+                position = ReplayPosition(len(positions) + 1, signal, now)
+                positions.append(position)
+                live.setdefault(position.symbol, []).append(position)
+                continue
+
+            symbol, bid, ask = data
+            stats['ticks'] += 1
+            last_quotes[symbol] = (bid, ask)
+            active = live.get(symbol)
+            if not active:
+                continue
+
+            for pos in active:
+                event = evaluate_tick(pos, bid, ask, trailing=self.trailing, closed_at=now)
+                if event is None:
+                    continue
+                stats['events'][event] = stats['events'].get(event, 0) + 1
+                if event == 'activated':
+                    pos.opened_at = now
+                elif pos.status == 'Closed':
+                    pos.close_reason = event
+
+            live[symbol] = [p for p in active if p.status in ('Open', 'Pending')]
+
+        return ReplayResult(positions, last_quotes, stats)
+
+
+def load_webhook_file(path):
+    """Read webhooks from a JSON-lines export of WebhookLog ({created_at, payload})."""
+    webhooks = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            payload = row['payload']
+            if isinstance(payload, str):
+                payload = json.loads(payload)
+            webhooks.append((to_datetime(row['created_at']), payload))
+    webhooks.sort(key=lambda w: w[0])
+    return webhooks
+
+
+def load_webhook_logs(engine, start=None, end=None):
+    query = select(WebhookLog.created_at, WebhookLog.payload).order_by(WebhookLog.created_at)
+    if start:
+        query = query.where(WebhookLog.created_at >= start)
+    if end:
+        query = query.where(WebhookLog.created_at < end)
+
+    webhooks = []
+    with engine.connect() as conn:
+        for created_at, payload in conn.execute(query):
+            try:
+                webhooks.append((created_at, json.loads(payload)))
+            except (TypeError, ValueError):
+                logger.warning(f"Skipping unreadable webhook payload from {created_at}")
+    return webhooks
+
+
+def load_tick_file(path):
+    """Read ticks from a CSV with time,symbol,bid,ask columns (time as epoch or ISO)."""
+    ticks = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            ticks.append((to_datetime(row['time']), row['symbol'], float(row['bid']), float(row['ask'])))
+    ticks.sort(key=lambda t: t[0])
+    return ticks
+
+
+def compare_results(baseline, candidate):
+    """Diff two replay results (as dicts) position by position."""
+    changes = []
+    base_positions = {p['id']: p for p in baseline['positions']}
+    for pos in candidate['positions']:
+        before = base_positions.get(pos['id'])
+        if before is None:
+            changes.append({'id': pos['id'], 'change': 'added', 'after': pos})
+            continue
+        fields = [k for k in ('status', 'price_close', 'profit', 'sl', 'close_reason') if before.get(k) != pos.get(k)]
+        if fields:
+            changes.append({
+                'id': pos['id'],
+                'change': 'modified',
+                'fields': {k: [before.get(k), pos.get(k)] for k in fields}
+            })
+    return {
+        'realized_pnl': [baseline['realized_pnl'], candidate['realized_pnl']],
+        'unrealized_pnl': [baseline['unrealized_pnl'], candidate['unrealized_pnl']],
+        'changes': changes
+    }
@@ -0,0 +1,142 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from services.position_rules import MARKET_TYPES, is_buy
+
+logger = logging.getLogger(__name__)
+
+DECISION_COUNTS = {'accept': 'accepted', 'drop': 'dropped', 'convert': 'converted'}
+
+
+class StageLatency:
+    """Rolling latency percentiles per pipeline stage, in milliseconds."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples = {}
+
+    def record(self, stage, ms):
+        if ms is None:
+            return
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self._window)
+            samples.append(ms)
+
+    def stats(self):
+        with self._lock:
+            stages = {stage: sorted(samples) for stage, samples in self._samples.items()}
+        report = {}
+        for stage, samples in stages.items():
+            if not samples:
+                continue
+            report[stage] = {
+                'count': len(samples),
+                'p50_ms': round(samples[len(samples) // 2], 3),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+                'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+                'max_ms': round(samples[-1], 3)
+            }
+        return report
+
+
+class SignalGuard:
+    """Refuses to trade on signals that are too old or whose price has moved on.
+
+    A signal's age runs from its origin timestamp (``sent_at`` in the
+    payload, else when we received it). Past SIGNAL_MAX_AGE seconds, or
+    when the live quote is more than SIGNAL_MAX_DRIFT (a fraction of the
+    signal price) worse than the price TradingView sent, the signal is
+    stale. SIGNAL_STALE_ACTION decides what happens then: ``drop`` refuses
+    it, ``convert`` turns a market order into a limit order at the signal
+    price, so it only fills if the market comes back. Pending orders name
+    their own entry level and are only subject to the deadline.
+
+    The live quote is the one the price loop last polled (``quotes`` is
+    the TickIngestor), so watched symbols cost no terminal call on the
+    request path. Any other symbol, the usual case for a new entry, is
+    read from the terminal, waiting at most SIGNAL_QUOTE_TIMEOUT seconds.
+    Signals left without a quote skip the drift test and are counted as
+    unpriced.
+    """
+
+    def __init__(self, quotes, max_age=None, max_drift=None, action=None, quote_timeout=None):
+        self.quotes = quotes
+        self.max_age = max_age or float(os.getenv('SIGNAL_MAX_AGE', 10))
+        self.quote_timeout = quote_timeout or float(os.getenv('SIGNAL_QUOTE_TIMEOUT', 1))
+        self.max_drift = max_drift or float(os.getenv('SIGNAL_MAX_DRIFT', 0.002))
+        self.action = action or os.getenv('SIGNAL_STALE_ACTION', 'drop')
+        self.latency = StageLatency()
+        self._lock = threading.Lock()
+        self.counts = {'accepted': 0, 'dropped': 0, 'converted': 0, 'expired_in_fan_out': 0,
+                       'live_quotes': 0, 'unpriced': 0}
+
+    @staticmethod
+    def origin(signal):
+        return signal.get('sent_at') or signal.get('received_at')
+
+    def age(self, origin, now=None):
+        return ((now or time.time()) - origin) if origin else 0.0
+
+    def expired(self, origin, now=None):
+        return self.age(origin, now) > self.max_age
+
+    def drift(self, signal, now=None):
+        """Adverse drift of the live quote from the signal price, as a fraction; None without a quote."""
+        if not signal['price']:
+            return None
+        quote = self.quotes.quote(signal['symbol'])
+        if quote is None or (now or time.time()) - quote[2] > self.max_age:
+            # Not watched by the price loop, or not lately
+            quote = self.quotes.live_quote(signal['symbol'], self.quote_timeout)
+            with self._lock:
+                self.counts['live_quotes' if quote else 'unpriced'] += 1
+            if quote is None:
+                return None
+        bid, ask = quote[:2]
+        if is_buy(signal['order_type']):
+            return (ask - signal['price']) / signal['price']
+        return (signal['price'] - bid) / signal['price']
+
+    def check(self, signal, now=None):
+        """Returns (decision, reason): 'accept', 'drop' or 'convert'."""
+        reason = None
+        age = self.age(self.origin(signal), now)
+        if age > self.max_age:
+            reason = f"signal is {age:.1f}s old (limit {self.max_age:g}s)"
+        elif signal['order_type'] in MARKET_TYPES:
+            drift = self.drift(signal, now)
+            if drift is not None and drift > self.max_drift:
+                reason = f"price moved {drift:.3%} against the signal (limit {self.max_drift:.3%})"
+
+        if reason is None:
+            decision = 'accept'
+        elif self.action == 'convert' and signal['order_type'] in MARKET_TYPES:
+            decision = 'convert'
+        else:
+            decision = 'drop'
+        with self._lock:
+            self.counts[DECISION_COUNTS[decision]] += 1
+        if reason:
+            logger.warning(f"Stale {signal['symbol']} {signal['order_type']} signal ({decision}): {reason}")
+        return decision, reason
+
+    def expired_in_fan_out(self):
+        with self._lock:
+            self.counts['expired_in_fan_out'] += 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            'max_age_s': self.max_age,
+            'max_drift': self.max_drift,
+            'action': self.action,
+            'counts': counts,
+            'stages': self.latency.stats()
+        }
@@ -0,0 +1,93 @@
+import logging
+import os
+import threading
+import time
+
+from models import AccountGroup, MT5Account, RestrictedSymbol
+
+logger = logging.getLogger(__name__)
+
+ALL_STRATEGIES = '*'
+ROUTING_TABLES = ('mt5_account', 'account_group', 'restricted_symbol')
+
+
+def parse_strategies(value):
+    """'trend, Breakout' -> frozenset({'trend', 'breakout'}); empty means every strategy."""
+    strategies = frozenset(s.strip().lower() for s in (value or '').split(',') if s.strip())
+    return strategies or frozenset([ALL_STRATEGIES])
+
+
+class SignalRoutes:
+    """Precompiled (strategy, symbol) -> account ids for the order fan-out.
+
+    An account follows the strategies of its group; accounts without a
+    group, and groups listing '*' or nothing, follow every signal. Symbol
+    restrictions are folded in, so routing a signal is one dict lookup
+    instead of a query per account. The table is rebuilt whenever the
+    account, group or restriction tables commit a change in this process,
+    and every ROUTING_REFRESH_SECONDS to catch edits made by other workers.
+    """
+
+    def __init__(self, versions, refresh=None):
+        self.versions = versions
+        self.refresh = refresh or float(os.getenv('ROUTING_REFRESH_SECONDS', 60))
+        self._lock = threading.Lock()
+        self._built_version = None
+        self._built_at = 0.0
+        self._followers = {}
+        self._everything = ()
+        self._restricted = {}
+        self._routes = {}
+        self.rebuilds = 0
+
+    def rebuild(self, session):
+        accounts = session.query(MT5Account.id, MT5Account.group_id) \
+            .filter_by(is_active=True).order_by(MT5Account.id).all()
+        groups = {g.id: parse_strategies(g.strategies) for g in session.query(AccountGroup.id, AccountGroup.strategies)}
+        restricted = {}
+        for account_id, symbol in session.query(RestrictedSymbol.account_id, RestrictedSymbol.symbol):
+            restricted.setdefault(account_id, set()).add(symbol)
+
+        everything, followers = [], {}
+        for account_id, group_id in accounts:
+            strategies = groups.get(group_id, frozenset([ALL_STRATEGIES]))
+            if ALL_STRATEGIES in strategies:
+                everything.append(account_id)
+            for strategy in strategies - {ALL_STRATEGIES}:
+                followers.setdefault(strategy, []).append(account_id)
+
+        with self._lock:
+            self._everything = tuple(everything)
+            self._followers = {s: tuple(ids) for s, ids in followers.items()}
+            self._restricted = restricted
+            self._routes = {}
+            self.rebuilds += 1
+        logger.info(f"Routing table rebuilt: {len(accounts)} accounts, {len(followers)} strategies")
+
+    def _current(self, session):
+        version = self.versions.version(*ROUTING_TABLES)
+        if version != self._built_version or time.monotonic() - self._built_at >= self.refresh:
+            self.rebuild(session)
+            self._built_version, self._built_at = version, time.monotonic()
+
+    def accounts_for(self, session, strategy, symbol):
+        """Account ids that should receive a ``strategy`` signal on ``symbol``, in id order."""
+        self._current(session)
+        key = ((strategy or '').lower() or None, symbol)
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                candidates = self._everything + self._followers.get(key[0], ())
+                route = self._routes[key] = tuple(sorted(
+                    a for a in candidates if symbol not in self._restricted.get(a, ())
+                ))
+            return route
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rebuilds': self.rebuilds,
+                'strategies': sorted(self._followers),
+                'follow_all': len(self._everything),
+                'routes': {f"{strategy or '-'}:{symbol}": len(ids) for (strategy, symbol), ids in self._routes.items()}
+            }
@@ -0,0 +1,455 @@
+import gc
+import linecache
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Quote = namedtuple('Quote', 'time bid ask last volume time_msc')
+OrderResult = namedtuple('OrderResult', 'retcode order deal price volume comment request_id')
+AccountInfo = namedtuple('AccountInfo', 'login balance equity margin margin_free leverage currency')
+
+
+class SimulatedTime:
+    """Drop-in for the ``time`` module that runs the price loop on a simulated clock.
+
+    Sleeps on the driver thread advance the clock immediately, up to a
+    barrier set by the harness, which parks the loop while it injects an
+    event at that moment. Sleeps on any other thread wait until the clock
+    has moved that far, so periodic jobs keep their cadence relative to the
+    loop. Everything else is delegated to the real time module.
+    """
+
+    def __init__(self, start=None, driver=None):
+        self.now = start if start is not None else time.time()
+        self.driver = driver
+        self.driver_sleeps = 0
+        self.barrier = None
+        self.parked = False
+        self._advanced = threading.Condition()
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if threading.current_thread().name == self.driver:
+            with self._advanced:
+                while self.barrier is not None and self.now + seconds > self.barrier:
+                    self.parked = True
+                    self._advanced.notify_all()
+                    self._advanced.wait(0.05)
+                self.parked = False
+                self.now += seconds
+                self.driver_sleeps += 1
+                self._advanced.notify_all()
+            # Let request and writer threads run between ticks
+            time.sleep(0)
+            return
+        target = self.now + seconds
+        with self._advanced:
+            while self.now < target:
+                self._advanced.wait(0.05)
+
+    def hold(self, moment):
+        """Let the driver run until ``moment``, then park it there."""
+        with self._advanced:
+            self.barrier = moment
+            self.parked = False
+            self._advanced.notify_all()
+
+    def wait_parked(self):
+        with self._advanced:
+            while not self.parked:
+                self._advanced.wait(0.05)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class TickHistory:
+    """The last ``size`` stand-in ticks in preallocated arrays used as a ring.
+
+    Allocated once up front, so a long soak does not see the harness's own
+    history as memory growth.
+    """
+
+    __slots__ = ('msc', 'bid', 'ask', 'count', 'head')
+
+    def __init__(self, size):
+        self.msc = np.zeros(size, dtype=np.int64)
+        self.bid = np.zeros(size, dtype=np.float64)
+        self.ask = np.zeros(size, dtype=np.float64)
+        self.count = 0
+        self.head = 0
+
+    def append(self, msc, bid, ask):
+        i = self.head
+        self.msc[i], self.bid[i], self.ask[i] = msc, bid, ask
+        self.head = (i + 1) % len(self.msc)
+        self.count = min(self.count + 1, len(self.msc))
+
+    def last(self):
+        i = self.head - 1
+        return int(self.msc[i]), float(self.bid[i]), float(self.ask[i])
+
+    def ordered(self):
+        """(msc, bid, ask) arrays, oldest first."""
+        if self.count < len(self.msc):
+            return self.msc[:self.count], self.bid[:self.count], self.ask[:self.count]
+        return tuple(np.concatenate((a[self.head:], a[:self.head])) for a in (self.msc, self.bid, self.ask))
+
+
+class StandInTerminal:
+    """Deterministic stand-in for the MetaTrader5 module.
+
+    Quotes follow a seeded random walk with a few ticks per simulated
+    second, generated lazily up to the clock whenever a symbol is read;
+    every order fills at the requested price.
+    """
+
+    TRADE_ACTION_DEAL = 1
+    TRADE_ACTION_PENDING = 5
+    TRADE_ACTION_SLTP = 6
+    TRADE_ACTION_MODIFY = 7
+    TRADE_ACTION_REMOVE = 8
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    ORDER_TYPE_BUY_LIMIT = 2
+    ORDER_TYPE_SELL_LIMIT = 3
+    ORDER_TYPE_BUY_STOP = 4
+    ORDER_TYPE_SELL_STOP = 5
+    POSITION_TYPE_BUY = 0
+    POSITION_TYPE_SELL = 1
+    ORDER_TIME_GTC = 0
+    ORDER_FILLING_FOK = 0
+    ORDER_FILLING_IOC = 1
+    ORDER_FILLING_RETURN = 2
+    TRADE_RETCODE_DONE = 10009
+    COPY_TICKS_ALL = -1
+    COPY_TICKS_INFO = 1
+    COPY_TICKS_TRADE = 2
+    TIMEFRAME_M1 = 1
+    TIMEFRAME_M5 = 5
+    TIMEFRAME_H1 = 16385
+    TIMEFRAME_SECONDS = {TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_H1: 3600}
+
+    TICK_DTYPE = np.dtype([
+        ('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+        ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')
+    ])
+    RATES_DTYPE = np.dtype([
+        ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+        ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+    ])
+
+    def __init__(self, clock, symbols, seed=0, spread=0.0002, step=0.0001, ticks_per_second=3, history=100000,
+                 disconnects=False):
+        self.clock = clock
+        # Like the real package: after shutdown() every call fails until initialize() again
+        self.disconnects = disconnects
+        self.connected = False
+        self.spread = spread
+        self.step = step
+        self.ticks_per_second = ticks_per_second
+        self.history = history
+        self._random = random.Random(seed)
+        self._prices = {symbol: 1.0 + i * 0.25 for i, symbol in enumerate(symbols)}
+        self._generated_to = {}
+        self._ticks = {symbol: TickHistory(history) for symbol in symbols}
+        self._ticket = 100000
+        self._lock = threading.Lock()
+        self.orders = 0
+
+    def initialize(self, *args, **kwargs):
+        self.connected = True
+        return True
+
+    def _offline(self):
+        return self.disconnects and not self.connected
+
+    def login(self, *args, **kwargs):
+        return not self._offline()
+
+    def shutdown(self):
+        self.connected = False
+        return True
+
+    def last_error(self):
+        if self._offline():
+            return (-10004, 'No IPC connection')
+        return (1, 'Success')
+
+    def _advance(self, symbol):
+        now = int(self.clock.now)
+        second = self._generated_to.get(symbol, now - 1)
+        # Cap the catch-up so a long pause does not generate hours of ticks at once
+        second = max(second, now - 3600)
+        history = self._ticks[symbol]
+        while second < now:
+            second += 1
+            for i in range(self.ticks_per_second):
+                self._prices[symbol] = max(self.step, self._prices[symbol] + self._random.gauss(0, self.step / 2))
+                bid = round(self._prices[symbol], 5)
+                history.append(second * 1000 + i * (1000 // self.ticks_per_second), bid, round(bid + self.spread, 5))
+        self._generated_to[symbol] = second
+
+    def quote(self, symbol):
+        """The live quote for the harness itself, whatever the app left the connection in."""
+        with self._lock:
+            self._advance(symbol)
+            time_msc, bid, ask = self._ticks[symbol].last()
+        return Quote(time_msc // 1000, bid, ask, bid, 1, time_msc)
+
+    def symbol_info_tick(self, symbol):
+        if self._offline() or symbol not in self._prices:
+            return None
+        return self.quote(symbol)
+
+    symbol_info = symbol_info_tick
+
+    def copy_ticks_from(self, symbol, date_from, count, flags):
+        if self._offline() or symbol not in self._prices:
+            return None
+        since = int(date_from.timestamp() if isinstance(date_from, datetime) else date_from) * 1000
+        with self._lock:
+            self._advance(symbol)
+            msc, bid, ask = self._ticks[symbol].ordered()
+            start = int(np.searchsorted(msc, since, side='left'))
+            end = min(len(msc), start + count)
+            ticks = np.zeros(end - start, dtype=self.TICK_DTYPE)
+            ticks['time_msc'] = msc[start:end]
+            ticks['time'] = ticks['time_msc'] // 1000
+            ticks['bid'] = bid[start:end]
+            ticks['ask'] = ask[start:end]
+            ticks['flags'] = 6
+        return ticks
+
+    def copy_rates_from(self, symbol, timeframe, date_from, count):
+        """The last ``count`` bid bars opening at or before ``date_from``, built from the tick history."""
+        seconds = self.TIMEFRAME_SECONDS.get(timeframe)
+        if self._offline() or symbol not in self._prices or seconds is None:
+            return None
+        until = int(date_from.timestamp() if isinstance(date_from, datetime) else date_from)
+        with self._lock:
+            self._advance(symbol)
+            msc, bids, _ = self._ticks[symbol].ordered()
+            end = int(np.searchsorted(msc, (until // seconds + 1) * seconds * 1000, side='left'))
+            msc, bids = msc[:end].copy(), bids[:end].copy()
+
+        buckets = msc // 1000 // seconds * seconds
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]]) if len(msc) else np.array([], dtype=np.int64)
+        starts = starts[-count:]
+        rates = np.zeros(len(starts), dtype=self.RATES_DTYPE)
+        if len(starts):
+            bids = bids[starts[0]:]
+            offsets = starts - starts[0]
+            ends = np.r_[offsets[1:], len(bids)]
+            rates['time'] = buckets[starts]
+            rates['open'] = bids[offsets]
+            rates['high'] = np.maximum.reduceat(bids, offsets)
+            rates['low'] = np.minimum.reduceat(bids, offsets)
+            rates['close'] = bids[ends - 1]
+            rates['tick_volume'] = ends - offsets
+        return rates
+
+    def order_send(self, request):
+        if self._offline():
+            return None
+        with self._lock:
+            self._ticket += 1
+            self.orders += 1
+            ticket = self._ticket
+        return OrderResult(
+            self.TRADE_RETCODE_DONE, ticket, ticket, request.get('price', 0.0),
+            request.get('volume', 0.0), 'Request executed', ticket
+        )
+
+    def positions_get(self, *args, **kwargs):
+        return None if self._offline() else ()
+
+    def orders_get(self, *args, **kwargs):
+        return None if self._offline() else ()
+
+    def account_info(self):
+        if self._offline():
+            return None
+        return AccountInfo(0, 100000.0, 100000.0, 0.0, 100000.0, 100, 'USD')
+
+    def order_calc_margin(self, order_type, symbol, volume, price):
+        if self._offline():
+            return None
+        return volume * price * 1000
+
+
+class MemoryWatch:
+    """tracemalloc snapshots compared against a post-warmup baseline."""
+
+    def __init__(self, frames=25):
+        self.frames = frames
+        self.baseline = None
+        self.samples = []
+
+    def start(self):
+        tracemalloc.start(self.frames)
+
+    def _snapshot(self):
+        gc.collect()
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+
+    def sample(self, label):
+        snapshot = self._snapshot()
+        size = sum(stat.size for stat in snapshot.statistics('filename'))
+        if self.baseline is None:
+            self.baseline = snapshot
+            self.baseline_size = size
+        self.samples.append({'at': label, 'traced_mb': round(size / 1048576, 3)})
+        return snapshot, size - self.baseline_size
+
+    def top_growth(self, snapshot, limit=15):
+        """Growth grouped by the innermost frame in this project that led to the allocation."""
+        sites = {}
+        for stat in snapshot.compare_to(self.baseline, 'traceback'):
+            if stat.size_diff == 0:
+                continue
+            frames = stat.traceback
+            ours = [f for f in frames if f.filename.startswith(PROJECT_ROOT) and 'site-packages' not in f.filename]
+            frame = ours[-1] if ours else frames[-1]
+            site = sites.setdefault(f"{frame.filename}:{frame.lineno}", {
+                'size_diff_kb': 0.0, 'count_diff': 0, 'allocated_at': f"{frames[-1].filename}:{frames[-1].lineno}"
+            })
+            site['size_diff_kb'] += stat.size_diff / 1024
+            site['count_diff'] += stat.count_diff
+        ranked = sorted(sites.items(), key=lambda item: -item[1]['size_diff_kb'])
+        return [
+            dict(site=name, **dict(entry, size_diff_kb=round(entry['size_diff_kb'], 1)))
+            for name, entry in ranked[:limit] if entry['size_diff_kb'] > 0
+        ]
+
+    def stop(self):
+        tracemalloc.stop()
+
+
+def soak_signal(terminal, symbols, rng):
+    """A webhook payload with a pending order close enough to the market to trigger."""
+    symbol = rng.choice(symbols)
+    quote = terminal.quote(symbol)
+    order_type = rng.choice(('buy limit', 'sell limit', 'buy stop', 'sell stop'))
+    offset = rng.uniform(0.5, 3) * terminal.step
+    below = order_type in ('buy limit', 'sell stop')
+    price = quote.bid - offset if below else quote.ask + offset
+    risk = rng.uniform(5, 20) * terminal.step
+    if order_type.startswith('buy'):
+        stop_loss, take_profit = price - risk, price + risk
+    else:
+        stop_loss, take_profit = price + risk, price - risk
+    return {
+        'action': 'open',
+        'symbol': symbol,
+        'volume': 0.1,
+        'order_type': order_type,
+        'price': round(price, 5),
+        'stop_loss': round(stop_loss, 5),
+        'take_profit': round(take_profit, 5),
+        'sent_at': terminal.clock.now
+    }
+
+
+class SoakRunner:
+    """Drives the live price loop and webhook route for hours of simulated time."""
+
+    def __init__(self, trading_app, terminal, clock, symbols, hours=6.0, webhook_interval=60,
+                 sample_every=600, warmup=1800, threshold_mb=20.0, tradekey=None, seed=0):
+        self.trading_app = trading_app
+        self.terminal = terminal
+        self.clock = clock
+        self.symbols = symbols
+        self.duration = hours * 3600
+        self.webhook_interval = webhook_interval
+        self.sample_every = sample_every
+        self.warmup = warmup
+        self.threshold = threshold_mb * 1048576
+        self.tradekey = tradekey
+        self.rng = random.Random(seed)
+        self.memory = MemoryWatch()
+        self.webhooks = 0
+        self.webhook_errors = 0
+
+    def start_workers(self):
+        trading_app = self.trading_app
+        workers = (
+            (self.clock.driver, trading_app.price_update_thread, (trading_app.app,)),
+            ('soak-position-book', trading_app.position_book_thread, (trading_app.app,)),
+            ('soak-summary', trading_app.summary_thread, (trading_app.app,)),
+            ('soak-audit', trading_app.audit_writer.run, ()),
+        )
+        for name, target, args in workers:
+            threading.Thread(target=target, args=args, name=name, daemon=True).start()
+
+    def send_webhook(self, client):
+        payload = soak_signal(self.terminal, self.symbols, self.rng)
+        payload['tradekey'] = self.tradekey
+        response = client.post('/webhook', json=payload)
+        self.webhooks += 1
+        if response.status_code != 200 or response.get_json().get('status') != 'success':
+            self.webhook_errors += 1
+
+    def run(self):
+        started_real = time.perf_counter()
+        start = self.clock.now
+        end = start + self.duration
+        next_webhook = start + self.webhook_interval
+        next_sample = start + self.warmup
+        client = self.trading_app.app.test_client()
+
+        self.memory.start()
+        self.start_workers()
+        growth, snapshot = 0, None
+        while True:
+            moment = min(next_webhook, next_sample, end)
+            self.clock.hold(moment)
+            self.clock.wait_parked()
+            if moment >= next_webhook:
+                self.send_webhook(client)
+                next_webhook += self.webhook_interval
+            if moment >= next_sample:
+                hours = round((moment - start) / 3600, 2)
+                snapshot, growth = self.memory.sample(f"{hours}h")
+                logger.info(f"Soak at {hours}h simulated: traced growth {growth / 1048576:.2f} MB")
+                next_sample += self.sample_every
+            if moment >= end:
+                break
+
+        # Orders went out, so positions were open; a loop that saw no ticks was blind, not idle
+        blind = self.terminal.orders > 0 and self.trading_app.tick_ingestor.ticks == 0
+        report = {
+            'simulated_hours': round((self.clock.now - start) / 3600, 2),
+            'real_seconds': round(time.perf_counter() - started_real, 1),
+            'loop_iterations': self.clock.driver_sleeps,
+            'webhooks': self.webhooks,
+            'webhook_errors': self.webhook_errors,
+            'orders_sent': self.terminal.orders,
+            'ticks_ingested': self.trading_app.tick_ingestor.ticks,
+            'samples': self.memory.samples,
+            'growth_mb': round(growth / 1048576, 3),
+            'threshold_mb': round(self.threshold / 1048576, 3),
+            'database': self.trading_app.session_monitor.stats(),
+            'signals': self.trading_app.signal_guard.stats(),
+            'passed': growth <= self.threshold and not blind,
+            'top_growth': self.memory.top_growth(snapshot) if snapshot is not None else []
+        }
+        self.memory.stop()
+        return report
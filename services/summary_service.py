@@ -0,0 +1,102 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import Position, Webhook, Log
+
+ACTIVE_STATUSES = ('Open', 'Pending')
+
+
+class SummaryService:
+    """Live dashboard counters kept current by position and webhook events.
+
+    rebuild() seeds them from the database with a handful of aggregate
+    queries; afterwards every update is O(1), so /api/summary costs the same
+    however much history the tables hold.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_symbol = {}
+        self._day = None
+        self._signals_today = 0
+        self._errors_today = 0
+        self._realized_today = 0.0
+        self.version = 0
+        self.rebuilt_at = None
+
+    def _symbol(self, symbol):
+        counts = self._by_symbol.get(symbol)
+        if counts is None:
+            counts = self._by_symbol[symbol] = {'Open': 0, 'Pending': 0, 'Closed': 0}
+        return counts
+
+    def _roll_day(self, now=None):
+        today = (now or datetime.utcnow()).date()
+        if self._day != today:
+            self._day = today
+            self._signals_today = 0
+            self._errors_today = 0
+            self._realized_today = 0.0
+
+    def rebuild(self, session):
+        day_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+
+        status_counts = session.query(Position.symbol, Position.status, func.count(Position.id)) \
+            .filter(Position.status.in_(ACTIVE_STATUSES + ('Closed',))) \
+            .group_by(Position.symbol, Position.status).all()
+        signals = session.query(func.count(Webhook.id)).filter(Webhook.timestamp >= day_start).scalar()
+        errors = session.query(func.count(Log.id)).filter(Log.timestamp >= day_start, Log.level == 'ERROR').scalar()
+        realized = session.query(func.sum(Position.profit)) \
+            .filter(Position.status == 'Closed', Position.closed_at >= day_start).scalar()
+
+        with self._lock:
+            self._by_symbol = {}
+            for symbol, status, count in status_counts:
+                self._symbol(symbol)[status] = count
+            self._day = day_start.date()
+            self._signals_today = signals or 0
+            self._errors_today = errors or 0
+            self._realized_today = float(realized or 0)
+            self.version += 1
+            self.rebuilt_at = datetime.utcnow()
+
+    def position_changed(self, symbol, old_status, new_status, profit=None):
+        with self._lock:
+            self._roll_day()
+            counts = self._symbol(symbol)
+            if old_status in counts:
+                counts[old_status] = max(0, counts[old_status] - 1)
+            if new_status in counts:
+                counts[new_status] += 1
+            if new_status == 'Closed' and profit:
+                self._realized_today += profit
+            self.version += 1
+
+    def signal_received(self):
+        with self._lock:
+            self._roll_day()
+            self._signals_today += 1
+            self.version += 1
+
+    def error_logged(self):
+        with self._lock:
+            self._roll_day()
+            self._errors_today += 1
+            self.version += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._roll_day()
+            symbols = {s: dict(c) for s, c in self._by_symbol.items() if any(c.values())}
+            return {
+                'open': sum(c['Open'] for c in symbols.values()),
+                'pending': sum(c['Pending'] for c in symbols.values()),
+                'closed': sum(c['Closed'] for c in symbols.values()),
+                'by_symbol': symbols,
+                'signals_today': self._signals_today,
+                'errors_today': self._errors_today,
+                'realized_pnl_today': round(self._realized_today, 2),
+                'version': self.version
+            }
@@ -0,0 +1,193 @@
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+try:
+    import gevent
+    from gevent._hub_local import get_hub_if_exists
+    from gevent.event import Event
+except ImportError:  # pragma: no cover - the app always runs under gevent
+    gevent = None
+
+logger = logging.getLogger(__name__)
+
+
+class TerminalTimeout(Exception):
+    """A terminal call did not finish in time.
+
+    ``started`` is False when the call was still queued and has been
+    cancelled; True means it is still running on the terminal thread and
+    its outcome is unknown.
+    """
+
+    def __init__(self, message, started):
+        super().__init__(message)
+        self.started = started
+
+
+class TerminalExecutor:
+    """Runs MetaTrader5 calls on one dedicated native thread.
+
+    The MetaTrader5 package is a blocking C extension with a single,
+    process-wide terminal connection, so every call is serialized onto the
+    same thread. Greenlets waiting for a result yield to the gevent hub
+    instead of stalling it; native threads simply block.
+
+    Single calls go through attribute access (``terminal.symbol_info(...)``).
+    Multi-step sequences such as initialize/login/order_send/shutdown must
+    not interleave with other callers, so they run as one unit via
+    ``terminal.exclusive``. The per-account units end with shutdown(), so
+    anything else that reads the terminal must be a unit that calls
+    initialize() first.
+    """
+
+    def __init__(self, module):
+        self._module = module
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mt5')
+        self._thread_ident = None
+        self._stats_lock = threading.Lock()
+        self.pending = 0
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.timeouts = 0
+        self._busy_since = None
+
+    def _execute(self, fn, args, kwargs):
+        self._thread_ident = threading.get_ident()
+        started = time.perf_counter()
+        self._busy_since = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._busy_since = None
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self.pending -= 1
+                self.calls += 1
+                self.total_time += elapsed
+                self.max_time = max(self.max_time, elapsed)
+
+    def run(self, fn, *args, **kwargs):
+        return self._call(None, fn, args, kwargs)
+
+    def run_with_timeout(self, timeout, fn, *args, **kwargs):
+        """Like run(), but stop waiting after ``timeout`` seconds and raise TerminalTimeout.
+
+        A native call cannot be interrupted, so one that already started
+        keeps the terminal until it returns; see ``stalled``.
+        """
+        return self._call(timeout, fn, args, kwargs)
+
+    def _call(self, timeout, fn, args, kwargs):
+        # Already on the terminal thread (nested call): run inline to avoid deadlock
+        if threading.get_ident() == self._thread_ident:
+            return fn(*args, **kwargs)
+
+        with self._stats_lock:
+            self.pending += 1
+        # Carry the caller's context (Flask app context, scoped session) to the worker
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, self._execute, fn, args, kwargs)
+
+        hub = get_hub_if_exists() if gevent else None
+        if hub is None or gevent.getcurrent() is hub:
+            try:
+                return future.result(timeout)
+            except FutureTimeout:
+                raise self._timed_out(future, fn, timeout)
+
+        # Park this greenlet; the worker wakes the hub through a thread-safe async watcher
+        done = Event()
+        watcher = hub.loop.async_()
+        watcher.start(done.set)
+        try:
+            future.add_done_callback(lambda _: watcher.send())
+            if not done.wait(timeout) and not future.done():
+                raise self._timed_out(future, fn, timeout)
+        finally:
+            watcher.close()
+        return future.result()
+
+    def _timed_out(self, future, fn, timeout):
+        # A call that never started can be dropped; one in progress has to run out
+        cancelled = future.cancel()
+        with self._stats_lock:
+            self.timeouts += 1
+            if cancelled:
+                self.pending -= 1
+        name = getattr(fn, '__name__', 'call')
+        return TerminalTimeout(f"{name} timed out after {timeout}s", started=not cancelled)
+
+    def stalled(self, threshold):
+        """True while the current call has been running for more than ``threshold`` seconds."""
+        busy_since = self._busy_since
+        return busy_since is not None and time.monotonic() - busy_since > threshold
+
+    def exclusive(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return self.run(fn, *args, **kwargs)
+        return wrapper
+
+    def __getattr__(self, name):
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.run(attr, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'pending': self.pending,
+                'calls': self.calls,
+                'avg_ms': round(self.total_time / self.calls * 1000, 3) if self.calls else 0,
+                'max_ms': round(self.max_time * 1000, 3),
+                'timeouts': self.timeouts
+            }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task.
+
+    Anything that blocks the gevent hub shows up as lag, so this is the
+    number to watch while orders fan out.
+    """
+
+    def __init__(self, sleep, interval=None, warn_ms=None):
+        self.sleep = sleep
+        self.interval = interval or float(os.getenv('LOOP_LAG_INTERVAL', 0.5))
+        self.warn_ms = warn_ms or float(os.getenv('LOOP_LAG_WARN_MS', 200))
+        self.samples = deque(maxlen=600)
+        self.worst_ms = 0.0
+
+    def run(self):
+        while True:
+            started = time.perf_counter()
+            self.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - started - self.interval) * 1000)
+            self.samples.append(lag_ms)
+            self.worst_ms = max(self.worst_ms, lag_ms)
+            if lag_ms > self.warn_ms:
+                logger.warning(f"Event loop lag {lag_ms:.0f}ms")
+
+    def stats(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {'samples': 0}
+        return {
+            'samples': len(samples),
+            'last_ms': round(self.samples[-1], 3),
+            'p50_ms': round(samples[len(samples) // 2], 3),
+            'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+            'worst_ms': round(self.worst_ms, 3)
+        }
@@ -0,0 +1,185 @@
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+from services.terminal_service import TerminalTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class SymbolCursor:
+    __slots__ = ('symbol', 'last_msc', 'seen_at_last', 'interval', 'next_poll', 'quote', 'polled_at')
+
+    def __init__(self, symbol, interval, next_poll):
+        self.symbol = symbol
+        self.last_msc = None
+        # Ticks already consumed at last_msc; several can share a millisecond
+        self.seen_at_last = 0
+        self.interval = interval
+        self.next_poll = next_poll
+        # Latest (bid, ask) and when it was last confirmed by a poll
+        self.quote = None
+        self.polled_at = None
+
+
+class TickIngestor:
+    """Pulls every tick since a per-symbol cursor, polling each symbol on its own schedule.
+
+    In ``ticks`` mode one copy_ticks_from call per symbol returns everything
+    since the cursor, so SL/TP and activation levels are checked against
+    every quote, including extremes that came and went within a second.
+    ``poll`` mode (or a terminal without copy_ticks_from) falls back to
+    the latest quote only.
+
+    A symbol's interval halves while ticks keep arriving and grows by half
+    while it is quiet, between TICK_POLL_MIN and TICK_POLL_MAX seconds.
+    Symbols with positions are capped lower the more positions they carry,
+    since a late tick there means a late fill.
+
+    Each poll is one unit on the terminal thread that initializes the
+    terminal first: the per-account order and probe calls shut it down
+    when they finish.
+    """
+
+    def __init__(self, terminal, mt5_module, mode=None, min_interval=None, max_interval=None, batch=None):
+        self.terminal = terminal
+        self.mt5 = mt5_module
+        mode = mode or os.getenv('TICK_INGEST_MODE', 'ticks')
+        self.mode = 'ticks' if mode == 'ticks' and hasattr(mt5_module, 'copy_ticks_from') else 'poll'
+        self.min_interval = min_interval or float(os.getenv('TICK_POLL_MIN', 0.1))
+        self.max_interval = max_interval or float(os.getenv('TICK_POLL_MAX', 2.0))
+        self.batch = batch or int(os.getenv('TICK_INGEST_BATCH', 5000))
+        self._cursors = {}
+        self.polls = 0
+        self.ticks = 0
+
+    def sync(self, symbols, now):
+        for symbol in symbols:
+            if symbol not in self._cursors:
+                self._cursors[symbol] = SymbolCursor(symbol, self.min_interval, now)
+        for symbol in [s for s in self._cursors if s not in symbols]:
+            del self._cursors[symbol]
+
+    def due(self, now):
+        return [c.symbol for c in self._cursors.values() if c.next_poll <= now]
+
+    def sleep_time(self, now):
+        if not self._cursors:
+            return self.max_interval
+        wait = min(c.next_poll for c in self._cursors.values()) - now
+        return min(max(wait, 0.0), self.max_interval)
+
+    def fetch(self, symbol, positions, now):
+        """New ticks for ``symbol`` as (time_msc, bid, ask) tuples, oldest first."""
+        cursor = self._cursors[symbol]
+        self.polls += 1
+        ticks, full = self.terminal.run(self._read, cursor)
+        self.ticks += len(ticks)
+        if ticks:
+            cursor.quote = ticks[-1][1:]
+        cursor.polled_at = now
+        self._schedule(cursor, len(ticks), positions, now, full)
+        return ticks
+
+    def quote(self, symbol):
+        """(bid, ask, polled_at) of the last poll of a watched symbol, else None."""
+        cursor = self._cursors.get(symbol)
+        if cursor is None or cursor.quote is None:
+            return None
+        return cursor.quote + (cursor.polled_at,)
+
+    def live_quote(self, symbol, timeout):
+        """(bid, ask) read from the terminal now, for a symbol the loop does not watch.
+
+        None when the terminal has no quote for it, or is busy for longer
+        than ``timeout`` seconds; the caller is on a request path.
+        """
+        if self.terminal.stalled(timeout):
+            return None
+        try:
+            tick = self.terminal.run_with_timeout(timeout, self._read_live, symbol)
+        except TerminalTimeout:
+            return None
+        except Exception as e:
+            logger.warning(f"Live quote for {symbol} failed: {str(e)}")
+            return None
+        if tick is None or tick.bid <= 0 or tick.ask <= 0:
+            return None
+        return tick.bid, tick.ask
+
+    def _read_live(self, symbol):
+        if not self.mt5.initialize():
+            raise RuntimeError(f"MT5 initialization failed: {self.mt5.last_error()}")
+        return self.mt5.symbol_info_tick(symbol)
+
+    def _read(self, cursor):
+        if not self.mt5.initialize():
+            raise RuntimeError(f"MT5 initialization failed polling {cursor.symbol}: {self.mt5.last_error()}")
+        if self.mode == 'ticks':
+            return self._fetch_ticks(cursor)
+        return self._fetch_quote(cursor), False
+
+    def _fetch_quote(self, cursor):
+        tick = self.mt5.symbol_info_tick(cursor.symbol)
+        if tick is None or tick.time_msc == cursor.last_msc:
+            return []
+        cursor.last_msc = tick.time_msc
+        return [(tick.time_msc, tick.bid, tick.ask)]
+
+    def _fetch_ticks(self, cursor):
+        if cursor.last_msc is None:
+            # Start from the live quote; history before we watched the symbol is not ours to act on
+            tick = self.mt5.symbol_info_tick(cursor.symbol)
+            if tick is None:
+                return [], False
+            cursor.last_msc = tick.time_msc
+            cursor.seen_at_last = sys.maxsize
+            return [(tick.time_msc, tick.bid, tick.ask)], False
+
+        # copy_ticks_from takes whole seconds, so re-read the cursor's second and skip what we have
+        since = datetime.fromtimestamp(cursor.last_msc // 1000, tz=timezone.utc)
+        raw = self.mt5.copy_ticks_from(cursor.symbol, since, self.batch, self.mt5.COPY_TICKS_INFO)
+        if raw is None or len(raw) == 0:
+            return [], False
+
+        msc = raw['time_msc']
+        start = int(np.searchsorted(msc, cursor.last_msc, side='left'))
+        at_cursor = int(np.searchsorted(msc, cursor.last_msc, side='right')) - start
+        new = raw[start + min(at_cursor, cursor.seen_at_last):]
+        if len(new) == 0:
+            return [], len(raw) >= self.batch
+
+        last = int(new['time_msc'][-1])
+        if last == cursor.last_msc:
+            cursor.seen_at_last += len(new)
+        else:
+            cursor.seen_at_last = int(np.count_nonzero(new['time_msc'] == last))
+        cursor.last_msc = last
+
+        # Info ticks can carry a zero on the side that did not change
+        valid = (new['bid'] > 0) & (new['ask'] > 0)
+        ticks = list(zip(new['time_msc'][valid].tolist(), new['bid'][valid].tolist(), new['ask'][valid].tolist()))
+        return ticks, len(raw) >= self.batch
+
+    def _schedule(self, cursor, count, positions, now, full):
+        upper = self.max_interval if not positions else max(self.min_interval, self.max_interval / (1 + positions))
+        if full:
+            # The batch filled up; the rest is already waiting
+            interval = 0.0
+        elif count:
+            interval = max(self.min_interval, cursor.interval / 2)
+        else:
+            interval = max(self.min_interval, cursor.interval * 1.5)
+        cursor.interval = min(interval, upper)
+        cursor.next_poll = now + cursor.interval
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'polls': self.polls,
+            'ticks': self.ticks,
+            'intervals': {c.symbol: round(c.interval, 3) for c in self._cursors.values()}
+        }
@@ -0,0 +1,207 @@
+import logging
+import mmap
+import os
+import re
+import threading
+
+import numpy as np
+
+TICK_DTYPE = np.dtype([('time', '<f8'), ('bid', '<f8'), ('ask', '<f8')])
+HEADER_DTYPE = np.dtype('<u8')
+HEADER_FIELDS = 4  # magic, capacity, write count, reserved
+HEADER_SIZE = HEADER_FIELDS * HEADER_DTYPE.itemsize
+MAGIC = 0x5449434B52494E47  # "TICKRING"
+
+logger = logging.getLogger(__name__)
+
+
+def ring_size(capacity):
+    return HEADER_SIZE + capacity * TICK_DTYPE.itemsize
+
+
+class TickRingBuffer:
+    """Fixed-size ring of (time, bid, ask) records backed by a memory-mapped file.
+
+    There is a single writer (the price loop). Readers get NumPy views straight
+    onto the mapping; the write count is bumped only after a record is stored,
+    so a reader can tell which part of its snapshot was overwritten meanwhile.
+
+    Only the writer creates the file or changes its size. Readers map it
+    read-only and take the capacity from its header, so a reader started
+    with another TICK_BUFFER_SIZE cannot touch the writer's history.
+    """
+
+    def __init__(self, path, capacity=None, writable=True):
+        self.path = path
+        self.writable = writable
+        if writable:
+            self._prepare(path, capacity)
+            fd = os.open(path, os.O_RDWR)
+        else:
+            fd = os.open(path, os.O_RDONLY)
+        try:
+            self.inode = os.fstat(fd).st_ino
+            file_size = os.fstat(fd).st_size
+            if file_size < HEADER_SIZE:
+                raise ValueError(f"{path} is not a tick ring ({file_size} bytes)")
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self._mmap = mmap.mmap(fd, file_size, access=access)
+        finally:
+            os.close(fd)
+
+        self._header = np.ndarray((HEADER_FIELDS,), dtype=HEADER_DTYPE, buffer=self._mmap)
+        stored = int(self._header[1])
+        if self._header[0] != MAGIC or file_size != ring_size(stored):
+            error = f"{path} is not a tick ring" if self._header[0] != MAGIC else \
+                f"{path} does not match its header (capacity {stored}, {file_size} bytes)"
+            self._header = None
+            self._mmap.close()
+            raise ValueError(error)
+        self._ticks = np.ndarray((stored,), dtype=TICK_DTYPE, buffer=self._mmap, offset=HEADER_SIZE)
+        self.capacity = stored
+
+    @staticmethod
+    def _prepare(path, capacity):
+        """Create the file, or rebuild it at ``capacity`` keeping the newest records."""
+        current = None
+        if os.path.exists(path):
+            try:
+                current = TickRingBuffer(path, writable=False)
+            except ValueError:
+                current = None
+        if current is not None and current.capacity == capacity:
+            current.close()
+            return
+
+        # Build the new ring beside the old one; readers keep their mapping of the replaced file
+        tmp_path = path + '.tmp'
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, ring_size(capacity))
+            with mmap.mmap(fd, ring_size(capacity)) as mapped:
+                header = np.ndarray((HEADER_FIELDS,), dtype=HEADER_DTYPE, buffer=mapped)
+                ticks = np.ndarray((capacity,), dtype=TICK_DTYPE, buffer=mapped, offset=HEADER_SIZE)
+                kept = current.latest(capacity) if current is not None else np.empty(0, dtype=TICK_DTYPE)
+                ticks[:len(kept)] = kept
+                header[:] = (MAGIC, capacity, len(kept), 0)
+                del header, ticks
+        finally:
+            os.close(fd)
+        if current is not None:
+            logger.warning(f"Resized tick ring {path} from {current.capacity} to {capacity} records")
+            current.close()
+        os.replace(tmp_path, path)
+
+    @property
+    def count(self):
+        return int(self._header[2])
+
+    def append(self, time, bid, ask):
+        count = int(self._header[2])
+        self._ticks[count % self.capacity] = (time, bid, ask)
+        self._header[2] = count + 1
+
+    def last(self):
+        count = self.count
+        if count == 0:
+            return None
+        return self._ticks[(count - 1) % self.capacity]
+
+    def views(self, limit=None):
+        """Zero-copy views of the newest records, oldest first (at most two slices)."""
+        count = self.count
+        available = min(count, self.capacity)
+        if limit is not None:
+            available = min(available, limit)
+        if available == 0:
+            return []
+
+        end = count % self.capacity or self.capacity
+        start = end - available
+        if start >= 0:
+            return [self._ticks[start:end]]
+        return [self._ticks[start:], self._ticks[:end]]
+
+    def latest(self, limit=None):
+        count = self.count
+        snapshot = np.concatenate(self.views(limit)) if count else np.empty(0, dtype=TICK_DTYPE)
+
+        # Drop records the writer lapped while we were copying
+        overwritten = self.count - count
+        if overwritten > 0:
+            snapshot = snapshot[min(overwritten, len(snapshot)):]
+        return snapshot
+
+    def flush(self):
+        self._mmap.flush()
+
+    def close(self):
+        self._header = None
+        self._ticks = None
+        self._mmap.close()
+
+
+class TickRecorder:
+    def __init__(self, directory=None, capacity=None):
+        self.directory = directory or os.getenv('TICK_BUFFER_DIR', os.path.join('instance', 'ticks'))
+        self.capacity = capacity or int(os.getenv('TICK_BUFFER_SIZE', 86400))
+        self._buffers = {}
+        self._readers = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, symbol):
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_.-]', '_', symbol) + '.ticks')
+
+    def buffer(self, symbol):
+        """The writable ring for ``symbol``; only the price loop writes."""
+        ring = self._buffers.get(symbol)
+        if ring is None:
+            with self._lock:
+                ring = self._buffers.get(symbol)
+                if ring is None:
+                    ring = TickRingBuffer(self._path(symbol), self.capacity)
+                    self._buffers[symbol] = ring
+        return ring
+
+    def reader(self, symbol):
+        """A read-only view of the ring, or None when no writer has created it yet."""
+        ring = self._buffers.get(symbol)
+        if ring is not None:
+            return ring
+        path = self._path(symbol)
+        with self._lock:
+            ring = self._readers.get(symbol)
+            try:
+                inode = os.stat(path).st_ino
+            except FileNotFoundError:
+                return None
+            if ring is not None and ring.inode == inode:
+                return ring
+            # First read, or the writer rebuilt the file at another size
+            if ring is not None:
+                ring.close()
+            ring = self._readers[symbol] = TickRingBuffer(path, writable=False)
+        return ring
+
+    def record(self, symbol, time, bid, ask):
+        ring = self.buffer(symbol)
+        last = ring.last()
+        # Polling returns the same quote until the market moves; keep only changes
+        if last is not None and last['time'] == time and last['bid'] == bid and last['ask'] == ask:
+            return False
+        ring.append(time, bid, ask)
+        return True
+
+    def recent(self, symbol, limit=None):
+        ring = self.reader(symbol)
+        if ring is None:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return ring.latest(limit)
+
+    def symbols(self):
+        return sorted(name[:-len('.ticks')] for name in os.listdir(self.directory) if name.endswith('.ticks'))
+
+    def flush(self):
+        for ring in list(self._buffers.values()):
+            ring.flush()
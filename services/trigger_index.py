@@ -0,0 +1,149 @@
+from bisect import bisect_left, bisect_right, insort
+
+from services.position_rules import is_buy
+
+# A level either fires once price falls to it or once price rises to it
+FALLING = 'falling'
+RISING = 'rising'
+
+ACTIVATION_DIRECTIONS = {
+    'buy limit': FALLING,
+    'sell limit': RISING,
+    'buy stop': RISING,
+    'sell stop': FALLING,
+}
+
+
+def trigger_levels(position):
+    """(side, direction, level) for every level that can change the position's state.
+
+    Buy positions are checked against the bid and sell positions against the
+    ask, matching quote_price().
+    """
+    side = 'bid' if is_buy(position.type) else 'ask'
+    if position.status == 'Pending':
+        direction = ACTIVATION_DIRECTIONS.get((position.type or '').lower())
+        if direction and position.price_open:
+            return [(side, direction, position.price_open)]
+        return []
+
+    if position.status == 'Open':
+        levels = []
+        if position.sl:
+            levels.append((side, FALLING if side == 'bid' else RISING, position.sl))
+        if position.tp:
+            levels.append((side, RISING if side == 'bid' else FALLING, position.tp))
+        return levels
+
+    return []
+
+
+class SortedLevels:
+    __slots__ = ('levels', 'keys')
+
+    def __init__(self):
+        self.levels = []
+        self.keys = []
+
+    def add(self, level, key):
+        i = bisect_right(self.levels, level)
+        self.levels.insert(i, level)
+        self.keys.insert(i, key)
+
+    def remove(self, level, key):
+        i = bisect_left(self.levels, level)
+        while i < len(self.levels) and self.levels[i] == level:
+            if self.keys[i] == key:
+                del self.levels[i]
+                del self.keys[i]
+                return True
+            i += 1
+        return False
+
+    def at_or_above(self, price):
+        return self.keys[bisect_left(self.levels, price):]
+
+    def at_or_below(self, price):
+        return self.keys[:bisect_right(self.levels, price)]
+
+    def __len__(self):
+        return len(self.levels)
+
+
+class TriggerIndex:
+    """Per-symbol sorted activation/SL/TP levels, split by side.
+
+    A falling level has fired once price is at or below it, a rising level
+    once price is at or above it. Fired positions leave the index (or swap
+    their activation level for SL/TP), so everything still indexed lies on
+    the far side of the last price and a tick only has to look at the
+    levels it crossed: O(log n + k) per symbol.
+    """
+
+    def __init__(self):
+        self._books = {}
+        self._entries = {}
+        self._signatures = {}
+
+    def _levels(self, symbol, side, direction):
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = {
+                ('bid', FALLING): SortedLevels(), ('bid', RISING): SortedLevels(),
+                ('ask', FALLING): SortedLevels(), ('ask', RISING): SortedLevels(),
+            }
+        return book[(side, direction)]
+
+    @staticmethod
+    def signature(position):
+        return (position.symbol, position.type, position.status, position.price_open, position.sl, position.tp)
+
+    def add(self, position):
+        key = position.id
+        entries = []
+        for side, direction, level in trigger_levels(position):
+            self._levels(position.symbol, side, direction).add(level, key)
+            entries.append((position.symbol, side, direction, level))
+        self._entries[key] = entries
+        self._signatures[key] = self.signature(position)
+
+    def remove(self, key):
+        for symbol, side, direction, level in self._entries.pop(key, ()):
+            self._levels(symbol, side, direction).remove(level, key)
+        self._signatures.pop(key, None)
+
+    def update(self, position):
+        self.remove(position.id)
+        if position.status in ('Open', 'Pending'):
+            self.add(position)
+
+    def sync(self, positions):
+        """Bring the index in line with a set of active positions, touching only what changed."""
+        seen = set()
+        for position in positions:
+            seen.add(position.id)
+            if self._signatures.get(position.id) != self.signature(position):
+                self.update(position)
+        for key in [k for k in self._entries if k not in seen]:
+            self.remove(key)
+
+    def candidates(self, symbol, bid, ask):
+        book = self._books.get(symbol)
+        if book is None:
+            return []
+        keys = []
+        keys.extend(book[('bid', FALLING)].at_or_above(bid))
+        keys.extend(book[('bid', RISING)].at_or_below(bid))
+        keys.extend(book[('ask', FALLING)].at_or_above(ask))
+        keys.extend(book[('ask', RISING)].at_or_below(ask))
+        # A position with both SL and TP crossed in one jump appears twice
+        return list(dict.fromkeys(keys))
+
+    def symbols(self):
+        return [symbol for symbol, book in self._books.items() if any(len(levels) for levels in book.values())]
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
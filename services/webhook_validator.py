@@ -0,0 +1,132 @@
+import math
+import re
+from datetime import datetime
+
+ORDER_TYPES = frozenset(['buy', 'sell', 'buy limit', 'sell limit', 'buy stop', 'sell stop'])
+SYMBOL_PATTERN = re.compile(r'^[A-Za-z0-9._#!-]{1,20}$')
+STRATEGY_PATTERN = re.compile(r'^[a-z0-9._-]{1,50}$')
+
+
+class SignalValidationError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors))
+
+
+def _text(value):
+    if not isinstance(value, str):
+        raise ValueError('must be a string')
+    value = value.strip()
+    if not value:
+        raise ValueError('must not be empty')
+    return value
+
+
+def _number(value):
+    if isinstance(value, bool):
+        raise ValueError('must be a number')
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError('must be finite')
+    return number
+
+
+def _positive(value):
+    number = _number(value)
+    if number <= 0:
+        raise ValueError('must be positive')
+    return number
+
+
+def _non_negative(value):
+    number = _number(value)
+    if number < 0:
+        raise ValueError('must not be negative')
+    return number
+
+
+def _symbol(value):
+    value = _text(value)
+    if not SYMBOL_PATTERN.match(value):
+        raise ValueError('is not a valid symbol')
+    return value
+
+
+def _order_type(value):
+    value = _text(value).lower()
+    if value not in ORDER_TYPES:
+        raise ValueError(f"must be one of {', '.join(sorted(ORDER_TYPES))}")
+    return value
+
+
+def _strategy(value):
+    value = _text(value).lower()
+    if not STRATEGY_PATTERN.match(value):
+        raise ValueError('is not a valid strategy tag')
+    return value
+
+
+def _timestamp(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # TradingView {{timenow}} may arrive as epoch milliseconds
+        return datetime.utcfromtimestamp(value / 1000 if value > 1e11 else value)
+    return datetime.fromisoformat(_text(value).replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def _epoch(value):
+    # Kept as epoch seconds so it survives the JSON round trip through the dispatch queue
+    return (_timestamp(value) - datetime(1970, 1, 1)).total_seconds()
+
+
+# (payload key, signal key, converter, required, default)
+SIGNAL_FIELDS = (
+    ('tradekey', 'password', _text, False, None),
+    ('action', 'action', _text, False, None),
+    ('symbol', 'symbol', _symbol, True, None),
+    ('volume', 'volume', _positive, True, None),
+    ('order_type', 'order_type', _order_type, True, None),
+    ('price', 'price', _positive, True, None),
+    ('stop_loss', 'stop_loss', _non_negative, False, 0.0),
+    ('take_profit', 'take_profit', _non_negative, False, 0.0),
+    ('expiration', 'expiration', _timestamp, False, None),
+    ('strategy', 'strategy', _strategy, False, None),
+    ('sent_at', 'sent_at', _epoch, False, None),
+)
+
+
+def compile_schema(fields):
+    """Turn a field table into one validating function.
+
+    Lookups are resolved once here, so validating a payload is a single
+    pass over a tuple with no per-request schema interpretation.
+    """
+    plan = tuple(fields)
+    required = tuple(key for key, _, _, is_required, _ in plan if is_required)
+
+    def validate(payload):
+        if not isinstance(payload, dict):
+            raise SignalValidationError(['payload must be a JSON object'])
+
+        missing = [f"{key} is required" for key in required if payload.get(key) in (None, '')]
+        if missing:
+            raise SignalValidationError(missing)
+
+        signal = {}
+        errors = []
+        for key, name, convert, _, default in plan:
+            value = payload.get(key)
+            if value is None or value == '':
+                signal[name] = default
+                continue
+            try:
+                signal[name] = convert(value)
+            except (TypeError, ValueError) as e:
+                errors.append(f"{key} {e}" if str(e).startswith(('must', 'is ')) else f"{key} is invalid")
+        if errors:
+            raise SignalValidationError(errors)
+        return signal
+
+    return validate
+
+
+validate_signal = compile_schema(SIGNAL_FIELDS)
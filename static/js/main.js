@@ -107,6 +107,24 @@ socket.on('webhook_received', function(data) {
     }, 1000); // Delay to ensure toast is visible before reload
 });
 
+// Per-account fills arrive as each broker answers, then one summary per signal
+socket.on('order_result', function(data) {
+    if (data.status === 'filled') {
+        toastr.success(`${data.symbol} #${data.ticket} on ${data.login}: ${data.fill_price} (slippage ${data.slippage}, ${data.latency_ms} ms)`);
+    } else {
+        toastr.error(`${data.symbol} on ${data.login} ${data.status}: ${data.error || data.retcode}`);
+    }
+});
+
+socket.on('order_summary', function(data) {
+    const message = `${data.symbol}: ${data.filled}/${data.accounts} filled in ${data.duration_ms} ms`;
+    if (data.filled === data.accounts) {
+        toastr.info(message);
+    } else {
+        toastr.warning(`${message} (${data.rejected} rejected, ${data.failed} failed, ${data.skipped} skipped)`);
+    }
+});
+
 socket.on('price_update', function(data) {
     Object.entries(data.prices).forEach(([symbol, priceData]) => {
         document.querySelectorAll(`tr[id^="position-"]`).forEach(row => {
@@ -139,6 +157,22 @@ socket.on('price_update', function(data) {
     });
 });
 
+// Summary counters
+function refreshSummary() {
+    const cards = document.getElementById('summaryCards');
+    if (!cards) return;
+    fetch('/api/summary')
+        .then(response => response.json())
+        .then(data => {
+            cards.querySelectorAll('[data-summary]').forEach(el => {
+                el.textContent = data[el.dataset.summary];
+            });
+        })
+        .catch(error => console.error('Error:', error));
+}
+
+setInterval(refreshSummary, 10000);
+
 // View Webhook Details
 function viewWebhookDetails(webhookId) {
     fetch(`/api/webhook/${webhookId}`)
@@ -0,0 +1,49 @@
+import threading
+from types import SimpleNamespace
+
+from services.account_health import AccountHealth
+from services.account_snapshot_service import AccountSnapshotService
+from services.soak_service import SimulatedTime, StandInTerminal
+from services.terminal_service import TerminalExecutor
+
+
+class HangingLogins(StandInTerminal):
+    """Stand-in whose login blocks for the accounts in ``hung`` until released."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hung = set()
+        self.release = threading.Event()
+        self.logins = []
+
+    def login(self, login, *args, **kwargs):
+        self.logins.append(login)
+        if login in self.hung:
+            self.release.wait(5)
+        return super().login(login, *args, **kwargs)
+
+
+def make_service():
+    mt5 = HangingLogins(SimulatedTime(start=1_700_000_000), ['EURUSD'], disconnects=True)
+    terminal = TerminalExecutor(mt5)
+    health = AccountHealth(terminal, mt5, timeout=0.2)
+    accounts = [SimpleNamespace(id=i, login=f"acct{i}", password='x', server='Demo') for i in (1, 2)]
+    return mt5, health, AccountSnapshotService(terminal, mt5, health), accounts
+
+
+def test_hung_snapshot_login_trips_the_breaker_and_is_skipped_after():
+    mt5, health, snapshots, accounts = make_service()
+    mt5.hung.add('acct1')
+
+    snapshots.refresh_all(accounts)
+    assert health.stats()['accounts'][1]['state'] == 'open'
+    # The terminal was still stuck on acct1, so acct2 waited for the next round rather than queueing
+    assert 2 not in snapshots.snapshots()
+
+    mt5.release.set()
+    snapshots.terminal.run(lambda: None)
+    mt5.logins.clear()
+    snapshots.refresh_all(accounts)
+    assert mt5.logins == ['acct2']
+    assert 2 in snapshots.snapshots()
+    assert health.stats()['accounts'][2]['state'] == 'closed'
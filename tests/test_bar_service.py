@@ -0,0 +1,21 @@
+from services.bar_service import BarCache
+from services.soak_service import SimulatedTime, StandInTerminal
+from services.terminal_service import TerminalExecutor
+
+
+def test_backfill_reconnects_after_an_account_call_shut_the_terminal_down():
+    clock = SimulatedTime(start=1_700_000_000)
+    mt5 = StandInTerminal(clock, ['EURUSD'], disconnects=True)
+    mt5.quote('EURUSD')
+    clock.now += 600
+    cache = BarCache(TerminalExecutor(mt5), mt5, history=50)
+
+    # Never initialized, or shut down by the last order: the backfill still has to connect
+    first = cache.bars('EURUSD', '1m', now=clock.now)
+    assert len(first) >= 10
+
+    mt5.shutdown()
+    clock.now += 120
+    bars = cache.bars('EURUSD', '1m', now=clock.now)
+    assert bars[-1]['time'] == first[-1]['time'] + 120
+    assert cache.stats()['backfills'] == 2
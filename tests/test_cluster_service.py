@@ -0,0 +1,46 @@
+import os
+import socket
+import subprocess
+import sys
+
+from sqlalchemy import create_engine
+
+from models import Lease
+from services.cluster_service import LeaderLease
+
+
+def make_lease(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'lease.db'}")
+    Lease.__table__.create(engine)
+    return LeaderLease(lambda: engine, ttl=15)
+
+
+def test_step_down_keeps_the_lease_held_until_release(tmp_path):
+    lease = make_lease(tmp_path)
+    assert lease.renew()
+
+    lease.step_down()
+    assert not lease.is_leader
+    # Started orders may finish: no other worker can take the row over yet
+    assert lease.holds_lease
+    assert not lease.renew()
+
+    lease.release()
+    assert not lease.holds_lease
+
+
+def test_holder_alive_checks_the_process_on_this_host(tmp_path):
+    lease = make_lease(tmp_path)
+    host = socket.gethostname()
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        assert lease.holder_alive(lease.holder)
+        assert lease.holder_alive(f"{host}:{child.pid}:abcd1234")
+    finally:
+        child.kill()
+        child.wait()
+
+    assert not lease.holder_alive(f"{host}:{child.pid}:abcd1234")
+    # An earlier process that had our pid, and workers on other hosts, cannot be sending
+    assert not lease.holder_alive(f"{host}:{os.getpid()}:abcd1234")
+    assert not lease.holder_alive(f"elsewhere:{child.pid}:abcd1234")
@@ -0,0 +1,40 @@
+from sqlalchemy import create_engine, inspect, select
+
+from services.migrations import MIGRATIONS, check_query_plans, current_version, migrate, schema_version
+
+
+def make_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+
+def test_migrate_applies_every_step_once(tmp_path):
+    engine = make_engine(tmp_path)
+    numbers = [number for number, _, _ in MIGRATIONS]
+
+    assert migrate(engine) == numbers
+    # A second run, e.g. another worker starting, finds nothing to do
+    assert migrate(engine) == []
+
+    with engine.connect() as conn:
+        assert current_version(conn) == numbers[-1]
+        assert conn.execute(select(schema_version.c.version).order_by(schema_version.c.version)).scalars().all() == numbers
+
+
+def test_migrate_creates_hot_query_indexes(tmp_path):
+    engine = make_engine(tmp_path)
+    migrate(engine)
+
+    indexes = {index['name'] for table in ('position', 'trade_log', 'log') for index in inspect(engine).get_indexes(table)}
+    assert {'ix_position_status_symbol', 'ix_position_account_id', 'ix_trade_log_account_created',
+            'ix_log_timestamp_level'} <= indexes
+
+
+def test_hot_queries_use_their_index(tmp_path):
+    engine = make_engine(tmp_path)
+    migrate(engine)
+
+    results = check_query_plans(engine)
+
+    assert results
+    full_scans = [(r['query'], r['index'], r['plan']) for r in results if not r['uses_index']]
+    assert full_scans == []
@@ -0,0 +1,81 @@
+import json
+
+from services.order_journal import OrderJournal
+
+SECRET = 'not-for-disk'
+
+
+def make_journal(tmp_path):
+    return OrderJournal(path=str(tmp_path / 'order_journal.log'), fsync=False)
+
+
+def journal_text(journal):
+    with open(journal.path) as f:
+        return f.read()
+
+
+def test_credentials_never_reach_the_journal(tmp_path):
+    journal = make_journal(tmp_path)
+    signal = {'symbol': 'EURUSD', 'order_type': 'buy limit', 'password': SECRET, 'tradekey': SECRET}
+
+    journal.begin(1, [10, 11], signal=signal)
+    done = journal.begin(2, [10], signal=signal)
+    journal.complete(done)
+    assert SECRET not in journal_text(journal)
+
+    # Compaction rewrites the unfinished intents; the key must not come back with them
+    journal.compact()
+    text = journal_text(journal)
+    assert SECRET not in text
+    assert [json.loads(line)['signal'] for line in text.splitlines()] == [{'symbol': 'EURUSD', 'order_type': 'buy limit'}]
+    journal.close()
+
+
+def test_compaction_scrubs_credentials_from_older_journals(tmp_path):
+    path = tmp_path / 'order_journal.log'
+    path.write_text(json.dumps({
+        'type': 'intent', 'id': 'abc', 'position_id': 1, 'accounts': [10],
+        'signal': {'symbol': 'EURUSD', 'password': SECRET}, 'ts': 0
+    }) + '\n')
+
+    journal = make_journal(tmp_path)
+    journal.compact()
+
+    assert SECRET not in journal_text(journal)
+    assert journal.unfinished()[0]['signal'] == {'symbol': 'EURUSD'}
+    journal.close()
+
+
+def test_compaction_waits_for_fan_outs_other_workers_hold(tmp_path):
+    old = OrderJournal(path=str(tmp_path / 'order_journal.log'), fsync=False, holder='old')
+    new = OrderJournal(path=str(tmp_path / 'order_journal.log'), fsync=False, holder='new')
+    journal_id = old.begin(1, [10, 11])
+    old.sending(journal_id, 10)
+
+    # The old leader may still be appending; replacing the file now would lose its events
+    assert new.compact() is False
+
+    old.result(journal_id, 10, ok=True, ticket=7)
+    old.release(journal_id)
+    assert new.compact() is True
+    [entry] = new.unfinished()
+    assert entry['holder'] is None
+    assert entry['outcomes'] == {10: {'state': 'done', 'ticket': 7, 'retcode': None, 'error': None}}
+
+    new.claim(journal_id)
+    assert new.unfinished()[0]['holder'] == 'new'
+    old.close()
+    new.close()
+
+
+def test_writes_follow_a_file_another_worker_compacted(tmp_path):
+    first = OrderJournal(path=str(tmp_path / 'order_journal.log'), fsync=False, holder='first')
+    second = OrderJournal(path=str(tmp_path / 'order_journal.log'), fsync=False, holder='second')
+    first.complete(first.begin(1, [10]))
+    assert second.compact() is True
+
+    journal_id = first.begin(2, [10])
+    second.reload()
+    assert [entry['id'] for entry in second.unfinished()] == [journal_id]
+    first.close()
+    second.close()
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from services.replay_service import ReplayEngine
+
+START = datetime(2025, 1, 15, 9, 0)
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+def signal(order_type, price, stop_loss, take_profit, strategy=None):
+    payload = {'symbol': 'EURUSD', 'volume': 0.1, 'order_type': order_type, 'price': price,
+               'stop_loss': stop_loss, 'take_profit': take_profit}
+    if strategy:
+        payload['strategy'] = strategy
+    return payload
+
+
+def test_market_order_opens_at_once_and_closes_on_its_take_profit():
+    webhooks = [(at(0), signal('buy', 1.1000, 1.0950, 1.1050))]
+    ticks = [(at(1), 'EURUSD', 1.1010, 1.1012), (at(2), 'EURUSD', 1.1051, 1.1053)]
+
+    result = ReplayEngine().run(webhooks, ticks)
+
+    [position] = result.positions
+    assert position.opened_at == at(0)
+    assert position.status == 'Closed'
+    assert position.close_reason == 'Take Profit'
+    assert round(position.profit, 2) == 51.0
+
+
+def test_new_signal_cancels_only_its_own_strategy_pending_orders():
+    webhooks = [
+        (at(0), signal('buy limit', 1.0900, 1.0850, 1.1000, strategy='trend')),
+        (at(1), signal('sell limit', 1.1200, 1.1250, 1.1100, strategy='range')),
+        (at(2), signal('buy limit', 1.0950, 1.0900, 1.1050, strategy='trend')),
+    ]
+
+    result = ReplayEngine().run(webhooks, [])
+
+    assert [p.status for p in result.positions] == ['Cancelled', 'Pending', 'Pending']
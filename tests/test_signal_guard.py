@@ -0,0 +1,39 @@
+from services.signal_guard import SignalGuard
+from services.soak_service import SimulatedTime, StandInTerminal
+from services.terminal_service import TerminalExecutor
+from services.tick_ingest import TickIngestor
+
+
+def make_guard():
+    clock = SimulatedTime(start=1_700_000_000)
+    mt5 = StandInTerminal(clock, ['EURUSD'], disconnects=True)
+    ingestor = TickIngestor(TerminalExecutor(mt5), mt5)
+    return clock, mt5, SignalGuard(ingestor, max_age=10, max_drift=0.002, action='drop')
+
+
+def market_signal(symbol, order_type, price, now):
+    return {'symbol': symbol, 'order_type': order_type, 'price': price, 'sent_at': now}
+
+
+def test_unwatched_symbol_is_priced_from_the_terminal():
+    clock, mt5, guard = make_guard()
+    ask = mt5.quote('EURUSD').ask
+    # Nothing is open on EURUSD, so the price loop has never polled it; the last order shut the terminal down
+    mt5.shutdown()
+
+    decision, reason = guard.check(market_signal('EURUSD', 'buy', round(ask * 0.99, 5), clock.now), clock.now)
+    assert decision == 'drop'
+    assert 'moved' in reason
+
+    decision, _ = guard.check(market_signal('EURUSD', 'buy', ask, clock.now), clock.now)
+    assert decision == 'accept'
+    assert guard.stats()['counts']['live_quotes'] == 2
+    assert guard.stats()['counts']['unpriced'] == 0
+
+
+def test_symbol_without_a_quote_is_counted_unpriced():
+    clock, _, guard = make_guard()
+
+    decision, _ = guard.check(market_signal('XAUUSD', 'sell', 2000.0, clock.now), clock.now)
+    assert decision == 'accept'
+    assert guard.stats()['counts']['unpriced'] == 1
@@ -0,0 +1,35 @@
+from services.soak_service import SimulatedTime, StandInTerminal
+from services.terminal_service import TerminalExecutor
+from services.tick_ingest import TickIngestor
+
+
+def make_ingestor(mode):
+    clock = SimulatedTime(start=1_700_000_000)
+    mt5 = StandInTerminal(clock, ['EURUSD'], disconnects=True)
+    ingestor = TickIngestor(TerminalExecutor(mt5), mt5, mode=mode)
+    ingestor.sync(['EURUSD'], clock.now)
+    return clock, mt5, ingestor
+
+
+def test_stand_in_refuses_calls_after_shutdown():
+    _, mt5, _ = make_ingestor('ticks')
+    assert mt5.symbol_info_tick('EURUSD') is None
+
+    mt5.initialize()
+    assert mt5.symbol_info_tick('EURUSD') is not None
+    mt5.shutdown()
+    assert mt5.symbol_info_tick('EURUSD') is None
+    assert mt5.order_send({'price': 1.0, 'volume': 0.1}) is None
+
+
+def test_ingest_reconnects_after_an_account_call_shut_the_terminal_down():
+    for mode in ('ticks', 'poll'):
+        clock, mt5, ingestor = make_ingestor(mode)
+        assert ingestor.fetch('EURUSD', 1, clock.now)
+
+        for _ in range(3):
+            # What every per-account order, cancel and probe does when it finishes
+            mt5.shutdown()
+            clock.now += 1
+            assert ingestor.fetch('EURUSD', 1, clock.now), mode
+        assert ingestor.quote('EURUSD') is not None
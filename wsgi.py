@@ -0,0 +1,6 @@
+# Entry point for running several workers behind a WSGI server (serve.py runs a single one), e.g.
+#   gunicorn -k geventwebsocket.gunicorn.workers.GeventWebSocketWorker -w 4 wsgi:app
+# Set SOCKETIO_MESSAGE_QUEUE so Socket.IO events reach clients on every worker.
+from app import app, start_background_workers
+
+start_background_workers()